@@ -0,0 +1,76 @@
+'''
+This file benchmarks the parallel tokenization of Token.Tokenize against the serial master pattern engine. A flat OpenQASM 2.0
+file of cx, rz and h statements is generated, and it is tokenized with each number of workers up to the number of cores. The
+tokens of every run are checked against the serial ones, and the best time of the repeats and the speedup are printed.
+
+    python benchmarks/tokenize_parallel.py [-size MB] [-workers N [N ...]] [-repeat R]
+
+The package should be installed, e.g. with pip install -e ., or the root of the repository put on PYTHONPATH.
+'''
+from qsofinstr.IR.QASM2.qasm2_token import Token
+import argparse
+import os
+import tempfile
+import time
+
+# Write a flat file of about size_mb megabytes with no gate definitions
+def generate_flat_qasm(filename, size_mb, n_qubits=64):
+    lines = ["OPENQASM 2.0;\n", f"qreg q[{n_qubits}];\n"]
+    size = sum(len(line) for line in lines)
+    i = 0
+    while size < size_mb*(1 << 20):
+        if i % 3 == 0:
+            line = f"cx q[{i % n_qubits}],q[{(i+1) % n_qubits}];\n"
+        elif i % 3 == 1:
+            line = f"rz({(i % 100)/100}) q[{i % n_qubits}];\n"
+        else:
+            line = f"h q[{i % n_qubits}]; // statement {i}\n"
+        lines.append(line)
+        size += len(line)
+        i += 1
+    with open(filename, 'w') as file:
+        file.writelines(lines)
+    return i
+
+def tokens_of(token_buffer):
+    return [token_buffer[i] for i in range(len(token_buffer))]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the parallel tokenization of the OpenQASM 2.0 files')
+    parser.add_argument('-size', type=int, default=32, help='The size of the generated file in MB')
+    parser.add_argument('-workers', type=int, nargs='+', help='The numbers of workers to run, by default 1, 2, 4, ... up to the number of cores')
+    parser.add_argument('-repeat', type=int, default=3, help='The number of runs of each number of workers, the best one is reported')
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+    workers_list = args.workers
+    if workers_list is None:
+        workers_list = [1]
+        while workers_list[-1]*2 <= cores:
+            workers_list.append(workers_list[-1]*2)
+        if workers_list[-1] != cores:
+            workers_list.append(cores)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "flat.qasm")
+        n_statements = generate_flat_qasm(filename, args.size)
+        print(f"cores: {cores}, file: {os.path.getsize(filename)/(1 << 20):.1f} MB, statements: {n_statements}")
+        reference = None
+        serial_time = None
+        for workers in workers_list:
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                _, _, token_buffer, _ = Token.Tokenize(filename, engine="master", workers=workers)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            tokens = tokens_of(token_buffer)
+            if reference is None:
+                reference = tokens
+            elif tokens != reference:
+                raise SystemExit(f"The tokens of workers={workers} differ from the serial tokens")
+            if workers == 1:
+                serial_time = best
+            speedup = f"{serial_time/best:.2f}x" if serial_time is not None else "-"
+            print(f"workers={workers:<3d} {best:8.2f} s  speedup {speedup}  tokens {len(tokens)}")
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,9 @@
 from qsofinstr.quantumcircuit import Quantum_circuit
 from qsofinstr.hardware_specification import Specification
+from qsofinstr.IR.QASM2.qasm2_token import Token
+from qsofinstr.IR.QASM2.qasm2_cache import Cache
+from qsofinstr.IR.QASM2.qasm2_include import Include_resolver
+from qsofinstr.IR.QASM2.qasm2_parser import Parser
 import argparse
 import sys
 
@@ -15,6 +19,12 @@ def get_parser_qsofinstr():
     parser.add_argument('-instr', action='store_true', help='Compile the QSoF instruction files')
     parser.add_argument('-bin', action='store_true', help='Compile the instruction into the .bin file')
     parser.add_argument('-txt', action='store_true', help='Compile the instruction into the .txt file')
+    parser.add_argument('-tokenizer', type=str, choices=['master', 'mmap', 'legacy'], help='Set the tokenizer engine for the OpenQASM 2.0 files')
+    parser.add_argument('-stream', action='store_true', help='Tokenize the OpenQASM 2.0 file in chunks while parsing instead of reading it at once, and generate each statement into the circuit once parsed')
+    parser.add_argument('-workers', type=int, help='Tokenize the large OpenQASM 2.0 files with this number of processes, 1 (serial) by default, which only pays off on several cores')
+    parser.add_argument('-cache', type=str, metavar='DIR', help='Cache the tokens and the gate definitions of the OpenQASM 2.0 files in this directory')
+    parser.add_argument('-I', dest='include', action='append', metavar='DIR', help='Search this directory for the included OpenQASM 2.0 files, can be given several times')
+    parser.add_argument('-P', dest='param', action='append', metavar='NAME=VALUE', help='Compile with the free parameter NAME and bind it to VALUE, can be given several times')
     parser.add_argument('filename', type=str, help='The file to compile or process')
     return parser
 
@@ -24,9 +34,32 @@ def execute(args):
         Specification.Need = True
         if args.mode is not None:
             Specification.Mode = args.mode
+    if args.tokenizer is not None:
+        Token.Engine = args.tokenizer
+    if args.stream:
+        Token.Stream = True
+        Parser.Stream_circuit = True
+    if args.workers is not None:
+        Token.Workers = args.workers
+    if args.cache is not None:
+        Cache.Directory = args.cache
+    if args.include is not None:
+        Include_resolver.Search_paths = args.include
+    values = {}
+    if args.param is not None:
+        for param in args.param:
+            name, _, value = param.partition('=')
+            try:
+                values[name] = float(value)
+            except ValueError:
+                print("\033[91m" + f"Error: The value of the free parameter {name} must be a number" + "\033[0m")
+                sys.exit(1)
+        Parser.Symbols = list(values)
     QC = None
     if args.qasm2:
         QC = Quantum_circuit.from_qasm2(args.filename)
+        if values:
+            QC = QC.bind(values)
     if args.json:
         if not args.filename.lower().endswith('.json'):
             print("\033[91m" + "Error: Filename must end with .json when using -json flag" + "\033[0m")
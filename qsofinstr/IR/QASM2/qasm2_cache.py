@@ -0,0 +1,105 @@
+import qsofinstr
+from qsofinstr.IR.QASM2.qasm2_token import Token
+from qsofinstr.IR.QASM2 import qasm2_token
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+import tempfile
+
+# The on-disk cache of the tokenized and parsed OpenQASM 2.0 files. Each file is stored under the
+# hash of its content, the qsofinstr version, the tokenizer engine and the keyword table, so a changed
+# file or a new version of qsofinstr never picks up a stale entry
+CACHE_SUFFIX = ".qsofcache"
+# The format of the entries, which is part of the key and changed whenever the layout of the cached tokens changes
+CACHE_FORMAT = 4
+
+
+class Cache_entry(object):
+    def __init__(self, filename, file_str, TK, include_list):
+        self.filename = filename
+        self.file_str = file_str # The source of the file, only used for the error messages
+        self.token = TK
+        self.include_list = include_list
+        # The (token index, Gate/Opaque, gates called in the body) of each definition in the order of definition, None
+        # if the file is not parsed yet or has other statements than the gate and opaque definitions
+        self.definitions = None
+        # The included files which have to be loaded before the definitions
+        self.loaded = []
+
+
+class Cache:
+    Directory = None # The on-disk cache is disabled if no directory is set
+    # The entries of the included files loaded by this process, with the key (absolute path, mtime, size, engine, keyword table),
+    # so that a file included several times is only tokenized and parsed once. Only the Max_entries most recently used files are kept
+    Entries = OrderedDict()
+    Max_entries = 16
+    
+    # The hash of the keyword table, as the keywords registered at runtime change the tokens as well
+    @staticmethod
+    def keywords_fingerprint():
+        return hashlib.sha256(repr(sorted(qasm2_token.KEYWORDS.items())).encode()).hexdigest()
+    
+    @staticmethod
+    def file_key(filename):
+        stat = os.stat(filename)
+        return (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, Token.Engine, Cache.keywords_fingerprint())
+    
+    # Return the entry of the file loaded before in this process, or None
+    @staticmethod
+    def get_entry(file_key):
+        if file_key not in Cache.Entries:
+            return None
+        Cache.Entries.move_to_end(file_key)
+        return Cache.Entries[file_key]
+    
+    @staticmethod
+    def add_entry(file_key, key, entry):
+        Cache.Entries[file_key] = (key, entry)
+        Cache.Entries.move_to_end(file_key)
+        while len(Cache.Entries) > Cache.Max_entries:
+            Cache.Entries.popitem(last=False)
+    
+    @staticmethod
+    def key(data):
+        digest = hashlib.sha256()
+        digest.update(qsofinstr.__version__.encode())
+        digest.update(b"\0" + str(CACHE_FORMAT).encode())
+        digest.update(b"\0" + Token.Engine.encode() + b"\0")
+        digest.update(Cache.keywords_fingerprint().encode() + b"\0")
+        digest.update(data)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def path(key):
+        return os.path.join(Cache.Directory, key + CACHE_SUFFIX)
+    
+    # Return the key, the content of the file and the cached entry, the entry is None for a cache miss
+    @staticmethod
+    def load(filename):
+        with open(filename, "rb") as file:
+            data = file.read()
+        key = Cache.key(data)
+        try:
+            with open(Cache.path(key), "rb") as file:
+                entry = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            # A missing or broken entry is simply tokenized again
+            return key, data, None
+        return key, data, entry
+    
+    @staticmethod
+    def store(key, entry):
+        if Cache.Directory is None or key is None:
+            return
+        os.makedirs(Cache.Directory, exist_ok=True)
+        # Write to a temporary file first so that a concurrent compile never reads half an entry
+        fd, temp_path = tempfile.mkstemp(dir=Cache.Directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, Cache.path(key))
+        except OSError:
+            # The cache is only an optimization, so failing to write it is not an error
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
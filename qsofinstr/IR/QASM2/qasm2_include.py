@@ -0,0 +1,28 @@
+import os
+
+# The environment variable with the extra directories searched for the included files, separated like PATH
+INCLUDE_PATH_ENV = "QSOFINSTR_INCLUDE_PATH"
+
+
+class Include_resolver:
+    Search_paths = [] # The directories given on the command line, searched before the ones of INCLUDE_PATH_ENV
+    
+    @staticmethod
+    def search_paths():
+        paths = list(Include_resolver.Search_paths)
+        paths.extend(path for path in os.environ.get(INCLUDE_PATH_ENV, "").split(os.pathsep) if path)
+        return paths
+    
+    # Return the path of an included file, or None if it cannot be found. The file is first looked up relative
+    # to the current directory, and then in the search paths in order
+    @staticmethod
+    def resolve(filename):
+        if os.path.isfile(filename):
+            return filename
+        if os.path.isabs(filename):
+            return None
+        for directory in Include_resolver.search_paths():
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path):
+                return path
+        return None
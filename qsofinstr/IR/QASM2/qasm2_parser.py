@@ -1,9 +1,13 @@
 from qsofinstr.IR.QASM2.qasm2_token import Token
 from qsofinstr.IR.QASM2 import qasm2_token
+from qsofinstr.IR.QASM2.qasm2_cache import Cache, Cache_entry
+from qsofinstr.IR.QASM2.qasm2_include import Include_resolver
 # import quantumcircuit
 import qsofinstr.timeslice
+from qsofinstr.timeslice import Symbolic_parameter
 import math
-from collections import deque
+import operator
+from collections import OrderedDict, deque
 import os
 
 # Define the node kinds
@@ -65,6 +69,15 @@ ND_CCX = 54
 ND_OPAQUE_NOEXP = 55
 ND_OPAQUE_EXP = 56
 ND_CU1 = 57
+# The kinds of the operations recorded in the expansion of a gate
+OP_SINGLE_NO_PARAMETER = 0
+OP_SINGLE_WITH_PARAMETER = 1
+OP_CONTROLLED_NO_PARAMETER = 2
+OP_CONTROLLED_WITH_PARAMETER = 3
+OP_OPAQUE = 4
+OP_GATE = 5 # A call of another gate, which is only in the templates
+# The kinds of the statements kept in code when the statements are generated while parsing
+DECLARATION_KINDS = (ND_QREG_DEC, ND_CREG_DEC, ND_GATE_DEC, ND_OPAQUE)
 # Dictionary for binary operator precedences
 binop_precedence = {
     ",": -1,
@@ -151,6 +164,29 @@ class Gate:
     def add_filename(self, filename):
         self.filename = filename
 
+# The operations of a gate body expanded for one tuple of parameters, which stands in for the quantum circuit while the body
+# is generated. The qubits are the positions of the formal arguments, so the same expansion is replayed on the actual qubits
+# of every call, and the conditions are also given when replaying
+class Gate_expansion(object):
+    def __init__(self):
+        # The element is a tuple with the structure (op kind, gate name, target, controls, parameter)
+        self.ops = []
+    
+    def add_single_qubit_gate_no_parameter(self, gate_name, qubit_name, index=-1, if_creg=None, if_num=0, if_flag=False):
+        self.ops.append((OP_SINGLE_NO_PARAMETER, gate_name, qubit_name, None, None))
+    
+    def add_single_qubit_gate_with_parameter(self, gate_name, qubit_name, parameter, index=-1, if_creg=None, if_num=0, if_flag=False):
+        self.ops.append((OP_SINGLE_WITH_PARAMETER, gate_name, qubit_name, None, parameter))
+    
+    def add_controlled_gate_no_parameter(self, gate_name, control_qubit, target_qubit, target_index=-1, if_creg=None, if_num=0, if_flag=False):
+        self.ops.append((OP_CONTROLLED_NO_PARAMETER, gate_name, target_qubit, [qubit[0] for qubit in control_qubit], None))
+    
+    def add_controlled_gate_with_parameter(self, gate_name, control_qubit, target_qubit, parameter, target_index=-1, if_creg=None, if_num=0, if_flag=False):
+        self.ops.append((OP_CONTROLLED_WITH_PARAMETER, gate_name, target_qubit, [qubit[0] for qubit in control_qubit], parameter))
+    
+    def add_opaque(self, opaque_name, qubits, parameter, if_creg=None, if_num=0, if_flag=False):
+        self.ops.append((OP_OPAQUE, opaque_name, None, [qubit[0] for qubit in qubits], parameter))
+
 # The expressions would be represented as a list, where each element is a binary operation node
 class Explist(Node):
     def __init__(self, kind):
@@ -173,15 +209,42 @@ class Filesystem:
         self.token_idx = 0 # The index of the current token list
         self.PARSE_FINISH = False # The flag to indicate whether the parsing is finished
         self.include_dict = None # The dictionary for the include files of current file
+        self.include_list = None # The list of the include files given by the tokenizer
+        self.cache_key = None # The key of the file in the cache directory, None if the on-disk cache is disabled
+        self.cache = None # The cache entry of the file shared by the compilations in this process
+        self.definitions = [] # The definitions parsed so far for the cache entry, None if the file is not a library
+        self.cached_idx = 0 # The index of the next cached definition to register
+        self.calls = [] # The (token index, gate name) of the gates called in the gate body parsed last, kept with its definition
+        self.names = None # The names of the gates and opaques defined in the file, read from the tokens
+        # The name of every gate and opaque that could be found through the included files, with the file defining it as the element
+        self.index = None
+        self.index_includes = 0 # The number of the included files when the index is built
     
     def get_name(self):
         return self.name
     
     def set_include_dict(self, dic):
+        self.include_list = dic
         self.include_dict = {file: None for file in dic}
+    
+    def update_include_dict(self):
+        # The include files of a streamed file are only known once the tokenizer has scanned them
+        for file in self.include_list:
+            if file not in self.include_dict:
+                self.include_dict[file] = None
 
 
 class Parser(Token):
+    # The names of the free parameters, which can be used in the parameters of the operations outside the gate definitions and are kept
+    # symbolic in the circuit until it is bound to their values
+    Symbols = []
+    # Whether each statement is generated into the circuit as soon as it is parsed by compile, only the declarations are then kept in code
+    Stream_circuit = False
+    # The number of the expansions of the gates kept by each parser
+    Max_gate_expansions = 256
+    # The node kind given to the next native gate registered with register_native_gate
+    Next_node_kind = ND_CU1 + 1
+    
     def __init__(self, filenode):
         super().__init__() 
         self.design_name = os.path.splitext(os.path.basename(filenode.get_name()))[0]
@@ -217,8 +280,18 @@ class Parser(Token):
         self.GATE_name_support = ""
         # The current file node for parsing
         self.current_file = filenode
+        # The nodes of the included files by their absolute paths, so a file included several times is loaded once
+        self.file_nodes = {}
+        # The templates of the gate bodies compiled so far, with the gate name as the key
+        self.gate_templates = {}
+        # The expansions of the gates, with the key (gate name, tuple of the parameters), only the Max_gate_expansions most recently
+        # used are kept
+        self.gate_expansions = OrderedDict()
         self.gate_name_find = "" # The gate name that needs to be found
         self.file_need_find = filenode
+        self.main_file = filenode # The file node of the program compiled
+        # The included files whose statements are being parsed, which cannot be searched for a gate until they are finished
+        self.files_in_parse = []
         self.GATE_FOUND = True # The flag to indicate whether the gate is found
         # The dictionary for the multi-controlled qubits, where the key is the qubit name, and the element is the index of the qubit
         self.MULTI_CONTROL_QUBITS = {}
@@ -266,25 +339,25 @@ class Parser(Token):
         return node
     
     def expect(self, op):
-        if self.current_file.token[self.current_file.token_idx][self.kind_idx] != qasm2_token.TK_OPERATOR or self.current_file.token[self.current_file.token_idx][self.str_idx] != op:
-            Token.annotate_error(self.current_file.name, self.current_file.file_str, self.current_file.token[self.current_file.token_idx-1][self.idx_idx], "missing operator: "\
-                + op, self.current_file.token[self.current_file.token_idx-1][self.line_count_idx], self.current_file.token[self.current_file.token_idx-1][self.err_line_idx_idx])
+        if self.current_file.token.get_kind(self.current_file.token_idx) != qasm2_token.TK_OPERATOR or self.current_file.token.get_str(self.current_file.token_idx) != op:
+            Token.annotate_error(self.current_file.name, self.current_file.file_str, self.current_file.token.get_idx(self.current_file.token_idx-1), "missing operator: "\
+                + op)
         self.current_file.token_idx += 1
         
     def consume_operator_str(self, op):
-        if self.current_file.token[self.current_file.token_idx][self.kind_idx] != qasm2_token.TK_OPERATOR or self.current_file.token[self.current_file.token_idx][self.str_idx] != op:
+        if self.current_file.token.get_kind(self.current_file.token_idx) != qasm2_token.TK_OPERATOR or self.current_file.token.get_str(self.current_file.token_idx) != op:
             return False
         self.current_file.token_idx += 1
         return True
     
     def check_TK_kind(self, idx):
-        return self.current_file.token[idx][self.kind_idx]
+        return self.current_file.token.get_kind(idx)
 
     def check_operator_str(self, idx, str):
-        return self.current_file.token[idx][self.kind_idx] == qasm2_token.TK_OPERATOR and self.current_file.token[idx][self.str_idx] == str
+        return self.current_file.token.get_kind(idx) == qasm2_token.TK_OPERATOR and self.current_file.token.get_str(idx) == str
     
     def error_at(self, idx, message):
-        Token.annotate_error(self.current_file.name, self.current_file.file_str, self.current_file.token[idx][self.idx_idx], message, self.current_file.token[idx][self.line_count_idx], self.current_file.token[idx][self.err_line_idx_idx])
+        Token.annotate_error(self.current_file.name, self.current_file.file_str, self.current_file.token.get_idx(idx), message)
     
     def check_num_error(self, name):
         # Check whether the qreg or creg size is missing or wrong type is used
@@ -294,57 +367,185 @@ class Parser(Token):
             else:
                 self.error_at(self.current_file.token_idx, "The "+name+" should be a number")
         # Check whether the qreg or creg size is an integer
-        if self.current_file.token[self.current_file.token_idx][self.val_idx] != int(self.current_file.token[self.current_file.token_idx][self.val_idx]) or self.current_file.token[self.current_file.token_idx][self.exp_idx] != 0:
+        if self.current_file.token.get_val(self.current_file.token_idx) != int(self.current_file.token.get_val(self.current_file.token_idx)) or self.current_file.token.get_exp(self.current_file.token_idx) != 0:
             self.error_at(self.current_file.token_idx, "The "+name+" should be an integer")
     
     def get_next_token(self, i=1):
         self.current_file.token_idx += i
     
-    # Define the function for checking the included files if the gate declared is not defined in current file
-    def check_include_files_current(self, filenode):
-        # should iterate through all the child files layer by layer
-        for file in filenode.include_dict:
-            # if the file is not tokenized, first tokenize it
-            if filenode.include_dict[file] is None:
-                filename, file_str, TK, include_dic = Token.Tokenize(file)
-                file_node = Filesystem(filename, file_str, TK)
-                file_node.set_include_dict(include_dic)
-                filenode.include_dict[file] = file_node
-            # if the file is already completely parsed, then skip it
-            if filenode.include_dict[file].token[filenode.include_dict[file].token_idx][self.kind_idx] == qasm2_token.TK_EOF:
+    # Parse an included file until the gate searched is defined, the statements before the definition are parsed as well
+    def check_include_files_current(self, file_node):
+        # if the file is already completely parsed, then skip it
+        if file_node.token.get_kind(file_node.token_idx) == qasm2_token.TK_EOF:
+            return self.GATE_FOUND
+        # set the current filenode of the parser to this file
+        self.current_file = file_node
+        # if the definitions of the file are cached, they are registered without parsing
+        if file_node.cache.definitions is not None:
+            self.load_cached_definitions(file_node)
+        self.files_in_parse.append(file_node)
+        while (not self.GATE_FOUND) and (file_node.token.get_kind(file_node.token_idx) != qasm2_token.TK_EOF):
+            token_idx = file_node.token_idx
+            self.cache_statement(file_node, token_idx, self.statement())
+            if file_node.token.get_kind(file_node.token_idx) == qasm2_token.TK_EOF:
+                self.cache_definitions(file_node)
+        self.files_in_parse.pop()
+        return self.GATE_FOUND
+    
+    # Record the definitions of an included file while it is parsed, so that they can be stored in the cache
+    def cache_statement(self, file_node, token_idx, node):
+        calls = file_node.calls
+        file_node.calls = []
+        if file_node.definitions is None:
+            return
+        if node is None:
+            file_node.definitions = None
+        elif node.kind == ND_GATE_DEC:
+            file_node.definitions.append((token_idx+1, self.gates[node.str], calls))
+        elif node.kind == ND_OPAQUE:
+            file_node.definitions.append((token_idx+1, self.opaques[node.str], calls))
+        else:
+            # Only the files with nothing but gate and opaque definitions are libraries
+            file_node.definitions = None
+    
+    # Store the definitions of a completely parsed included file, the definitions could only be reused if
+    # the included files they depend on are also completely parsed libraries
+    def cache_definitions(self, file_node):
+        if file_node.definitions is None:
+            return
+        loaded = []
+        for file in file_node.include_dict:
+            child = file_node.include_dict[file]
+            if child is None:
                 continue
-            # parsing the file and if the gate definition is found, the while loop will be terminated
-            # set the current filenode of the parser to this file
-            self.current_file = filenode.include_dict[file]
-            while (not self.GATE_FOUND) and (filenode.include_dict[file].token[filenode.include_dict[file].token_idx][self.kind_idx] != qasm2_token.TK_EOF):
-                self.statement()
-            # if the gate is found, then return True
-            if self.GATE_FOUND:
-                return True
-        # if all the included files of current file are checked and the gate is not found, then return False
-        return False
-    
-    # The basic logic of searching the gate is to first check whether the gate is defined in the included files of current file,
-    # if not, then check whether the gate is defined in the included files of the included files of current file, and so on. So it's
-    # a recursive checking of the tree-structured filesystem layer by layer, that's because normally the gate used is defined in the 
-    # included files of the current file, so it's more efficient to check the included files of current file first. Based on this logic,
-    # Breadth-first search(BFS) algorithm is used here.
-    def check_included_files(self, filenode):
-        # starting from the current file
+            if child.cache.definitions is None:
+                return
+            loaded.append(file)
+        file_node.cache.definitions = file_node.definitions
+        file_node.cache.loaded = loaded
+        Cache.store(file_node.cache_key, file_node.cache)
+    
+    # Register the cached definitions of an included file without parsing it, the definitions are registered
+    # in order until the gate searched is found, just like the lazy parsing of the file
+    def load_cached_definitions(self, file_node, complete=False):
+        entry = file_node.cache
+        if file_node.cached_idx == 0:
+            # The gate bodies may use the gates of the included files, so those files are loaded first
+            gate_found_pre = self.GATE_FOUND
+            for file in entry.loaded:
+                if file_node.include_dict[file] is None:
+                    file_node.include_dict[file] = self.load_include(file)
+                child = file_node.include_dict[file]
+                if child.token.get_kind(child.token_idx) == qasm2_token.TK_EOF:
+                    continue
+                if child.cache.definitions is not None:
+                    self.load_cached_definitions(child, True)
+                else:
+                    # The included file is changed since the entry is stored, so it is parsed again
+                    self.current_file = child
+                    self.files_in_parse.append(child)
+                    while child.token.get_kind(child.token_idx) != qasm2_token.TK_EOF:
+                        token_idx = child.token_idx
+                        self.cache_statement(child, token_idx, self.statement())
+                    self.files_in_parse.pop()
+                    self.cache_definitions(child)
+            self.GATE_FOUND = gate_found_pre
+        self.current_file = file_node
+        self.files_in_parse.append(file_node)
+        while (complete or not self.GATE_FOUND) and file_node.cached_idx < len(entry.definitions):
+            token_idx, definition, calls = entry.definitions[file_node.cached_idx]
+            file_node.cached_idx += 1
+            if isinstance(definition, Gate):
+                if definition.name in self.gates:
+                    self.error_at(token_idx, "gate "+definition.name+f" already defined in {self.gates[definition.name].filename}")
+                # The gates called in the body could be defined by another program when the entry is stored, so they are checked
+                # and found in the included files of this program, just like when the body is parsed
+                for call_idx, name in calls:
+                    if name not in self.gates and name not in self.opaques:
+                        self.find_included_gate(name, call_idx)
+                self.gates[definition.name] = definition
+                if (not self.GATE_FOUND) and (self.gate_name_find == definition.name):
+                    self.GATE_FOUND = True
+            else:
+                if definition.name in self.opaques:
+                    self.error_at(token_idx, "opaque "+definition.name+" already defined")
+                self.opaques[definition.name] = definition
+        self.files_in_parse.pop()
+        # Skip the tokens of the registered definitions
+        if file_node.cached_idx < len(entry.definitions):
+            file_node.token_idx = entry.definitions[file_node.cached_idx][0]-1
+        else:
+            file_node.token_idx = len(file_node.token)-1
+    
+    # The names of the gates and opaques defined in a file, which are read from the tokens without parsing the file
+    @staticmethod
+    def defined_names(file_node):
+        if file_node.names is None:
+            TK = file_node.token
+            names = []
+            for i in range(len(TK)-1):
+                if TK.get_kind(i) in (qasm2_token.TK_GATE, qasm2_token.TK_OPAQUE) and TK.get_kind(i+1) == qasm2_token.TK_IDENT:
+                    names.append(TK.get_str(i+1))
+            file_node.names = names
+        return file_node.names
+    
+    # Build the index of the gates and opaques that could be found from a file. The included files are visited layer by layer with
+    # Breadth-first search(BFS), as normally the gate used is defined in the included files of current file, and the first file
+    # defining a name is the one kept. The index is built once per file, only the streamed file could have more included files later
+    def definition_index(self, filenode):
+        filenode.update_include_dict()
+        if filenode.index is not None and filenode.index_includes == len(filenode.include_dict):
+            return filenode.index
+        index = {}
         queue_file = deque([filenode])
-        
+        # A file included by several files is the same node, so it is only visited once
+        visited = {id(filenode)}
         while queue_file:
-            # pop the first element in the queue
             current_filenode = queue_file.popleft()
-            # visiting the current file
-            # if the gate is found, then directly return True
-            if self.check_include_files_current(current_filenode):
-                return True
-            # add the included files of current file to the queue
             for file in current_filenode.include_dict:
-                queue_file.append(current_filenode.include_dict[file])
-        # if all the files are checked and the gate is not found, then return False
-        return False
+                if current_filenode.include_dict[file] is None:
+                    # The missing qelib1.inc let through by the tokenizer has nothing to index
+                    if Include_resolver.resolve(file) is None:
+                        continue
+                    current_filenode.include_dict[file] = self.load_include(file)
+                file_node = current_filenode.include_dict[file]
+                if id(file_node) in visited:
+                    continue
+                visited.add(id(file_node))
+                queue_file.append(file_node)
+                for name in Parser.defined_names(file_node):
+                    if name not in index:
+                        index[name] = file_node
+        filenode.index = index
+        filenode.index_includes = len(filenode.include_dict)
+        return index
+    
+    # Find the gate that is not defined in current file, only the included file defining it is parsed, up to the definition.
+    # The gate bodies of an included file could use the gates of the other files included by the program, so the gate is
+    # first searched in the files that could be found from the program, and then in the files only found from current file
+    def check_included_files(self, filenode):
+        file_node = self.definition_index(self.main_file).get(self.gate_name_find)
+        if file_node is None or any(file_node is file for file in self.files_in_parse):
+            file_node = self.definition_index(filenode).get(self.gate_name_find)
+        if file_node is None or any(file_node is file for file in self.files_in_parse):
+            return False
+        return self.check_include_files_current(file_node)
+    
+    # Find the gate called at the token idx of current file in the included files, raise the error if it is not defined
+    def find_included_gate(self, name, idx):
+        gate_found_pre = self.GATE_FOUND
+        gate_name_find_pre = self.gate_name_find
+        self.GATE_FOUND = False
+        self.gate_name_find = name
+        file_need_find_pre = self.file_need_find
+        self.file_need_find = self.current_file
+        if not self.check_included_files(self.current_file):
+            self.current_file = self.file_need_find
+            self.error_at(idx, f"gate {name} not defined")
+        self.current_file = self.file_need_find
+        self.file_need_find = file_need_find_pre
+        self.GATE_FOUND = gate_found_pre
+        self.gate_name_find = gate_name_find_pre
         
             
     
@@ -425,74 +626,69 @@ class Parser(Token):
     #===========================================================================
     
     # Recursive descent parsing of program
-    def program(self):
-        while self.current_file.token[self.current_file.token_idx][self.kind_idx] != qasm2_token.TK_EOF:
-            self.code.append(self.statement())
+    # The statements are generated into the quantum circuit while parsing if it is given
+    def program(self, quantumcircuit=None):
+        while self.current_file.token.get_kind(self.current_file.token_idx) != qasm2_token.TK_EOF:
+            node_stmt = self.statement()
+            if quantumcircuit is None:
+                self.code.append(node_stmt)
+            else:
+                self.code_gen(node_stmt, quantumcircuit)
+                # The other statements are dropped once generated, so the memory does not grow with the number of statements
+                if node_stmt is not None and node_stmt.kind in DECLARATION_KINDS:
+                    self.code.append(node_stmt)
+            # The tokens of a streamed file are dropped once the statement is parsed, only the last one is kept for the error messages
+            if isinstance(self.current_file.token, qasm2_token.Token_stream):
+                self.current_file.token.release(self.current_file.token_idx-1)
 
-    # Recursive descent parsing of statement
+    # Recursive descent parsing of statement, the handler is looked up in STATEMENT_TABLE by the kind of the first token
     def statement(self):
-        if self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_QREG or self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CREG:
-            return self.decl()
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_GATE:
-            return self.gatedecl()
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_OPAQUE:
-            # Check whether the opaque is already defined
-            if self.current_file.token[self.current_file.token_idx+1][self.str_idx] in self.opaques:
-                self.error_at(self.current_file.token_idx+1, "opaque "+self.current_file.token[self.current_file.token_idx+1][self.str_idx]+" already defined")
-            # Check whether the opaque defined is supported by QSoF
-            if self.current_file.token[self.current_file.token_idx+1][self.str_idx] not in qsofinstr.timeslice.Opaque_Table:
-                self.error_at(self.current_file.token_idx+1, "opaque "+self.current_file.token[self.current_file.token_idx+1][self.str_idx]+" is not supported by QSoF")
-            if self.check_operator_str(self.current_file.token_idx+2, "("):
-                # Recursive descent parsing for 'opaque id (idlist) idlist ;'
-                if self.check_TK_kind(self.current_file.token_idx+3) == qasm2_token.TK_IDENT:
-                    name = self.current_file.token[self.current_file.token_idx+1][self.str_idx]
-                    self.get_next_token(3)
-                    opaque_instance = Opaque(name)
-                    params = self.idlist_param()
-                    opaque_instance.add_params(params)
-                    # Check whether the number of parameters is incorrect 
-                    if len(params) != qsofinstr.timeslice.Opaque_Table[name]:
-                        # Check whether the number of parameters is larger than the maximum number of parameters
-                        if len(params) > qsofinstr.timeslice.Opaque_Table[name]:
-                            self.error_at(self.current_file.token_idx-1, "The number of parameters exceeds the maximum number of parameters of opaque "+name)
-                        else:
-                            self.error_at(self.current_file.token_idx-1, "The number of parameters is less than the number of parameters required for opaque "+name)
-                    self.expect(")")
-                    args = self.idlist_qubit().qregs
-                    opaque_instance.add_args(args)
-                    self.expect(";")
-                    self.opaques[name] = opaque_instance
-                    node_stmt = Parser.create_node(ND_OPAQUE)
-                    node_stmt.add_str(name)
-                    self.MULTI_CONTROL_QUBITS.clear()
-                    return node_stmt
-                # Recursive descent parsing for 'opaque id () idlist ;'
-                elif self.check_operator_str(self.current_file.token_idx+3, ")"):
-                    self.get_next_token()
-                    name = self.current_file.token[self.current_file.token_idx][self.str_idx]
-                    # Check whether the opaque should have parameters
-                    if qsofinstr.timeslice.Opaque_Table[name] != 0:
-                        self.error_at(self.current_file.token_idx+2, "The number of parameters should be "+str(qsofinstr.timeslice.Opaque_Table[name]))
-                    self.get_next_token(3)
-                    opaque_instance = Opaque(name)
-                    args = self.idlist_qubit().qregs
-                    opaque_instance.add_args(args)
-                    self.expect(";")
-                    self.opaques[name] = opaque_instance
-                    node_stmt = Parser.create_node(ND_OPAQUE)
-                    node_stmt.add_str(name)
-                    self.MULTI_CONTROL_QUBITS.clear()
-                    return node_stmt
-                else:
-                    self.error_at(self.current_file.token_idx+3, "The parameters could only be identifiers or empty")
-            # Recursive descent parsing for 'opaque id idlist ;'
-            elif self.check_TK_kind(self.current_file.token_idx+2) == qasm2_token.TK_IDENT:
+        handler = Parser.STATEMENT_TABLE.get(self.check_TK_kind(self.current_file.token_idx))
+        # Recursive descent parsing for 'qop'
+        if handler is None:
+            return self.uop()
+        return handler(self)
+    
+    # Recursive descent parsing for 'opaque id idlist ; | opaque id () idlist ; | opaque id (idlist) idlist ;'
+    def opaquedecl(self):
+        # Check whether the opaque is already defined
+        if self.current_file.token.get_str(self.current_file.token_idx+1) in self.opaques:
+            self.error_at(self.current_file.token_idx+1, "opaque "+self.current_file.token.get_str(self.current_file.token_idx+1)+" already defined")
+        # Check whether the opaque defined is supported by QSoF
+        if self.current_file.token.get_str(self.current_file.token_idx+1) not in qsofinstr.timeslice.Opaque_Table:
+            self.error_at(self.current_file.token_idx+1, "opaque "+self.current_file.token.get_str(self.current_file.token_idx+1)+" is not supported by QSoF")
+        if self.check_operator_str(self.current_file.token_idx+2, "("):
+            # Recursive descent parsing for 'opaque id (idlist) idlist ;'
+            if self.check_TK_kind(self.current_file.token_idx+3) == qasm2_token.TK_IDENT:
+                name = self.current_file.token.get_str(self.current_file.token_idx+1)
+                self.get_next_token(3)
+                opaque_instance = Opaque(name)
+                params = self.idlist_param()
+                opaque_instance.add_params(params)
+                # Check whether the number of parameters is incorrect 
+                if len(params) != qsofinstr.timeslice.Opaque_Table[name]:
+                    # Check whether the number of parameters is larger than the maximum number of parameters
+                    if len(params) > qsofinstr.timeslice.Opaque_Table[name]:
+                        self.error_at(self.current_file.token_idx-1, "The number of parameters exceeds the maximum number of parameters of opaque "+name)
+                    else:
+                        self.error_at(self.current_file.token_idx-1, "The number of parameters is less than the number of parameters required for opaque "+name)
+                self.expect(")")
+                args = self.idlist_qubit().qregs
+                opaque_instance.add_args(args)
+                self.expect(";")
+                self.opaques[name] = opaque_instance
+                node_stmt = Parser.create_node(ND_OPAQUE)
+                node_stmt.add_str(name)
+                self.MULTI_CONTROL_QUBITS.clear()
+                return node_stmt
+            # Recursive descent parsing for 'opaque id () idlist ;'
+            elif self.check_operator_str(self.current_file.token_idx+3, ")"):
                 self.get_next_token()
-                name = self.current_file.token[self.current_file.token_idx][self.str_idx]
+                name = self.current_file.token.get_str(self.current_file.token_idx)
                 # Check whether the opaque should have parameters
                 if qsofinstr.timeslice.Opaque_Table[name] != 0:
-                    self.error_at(self.current_file.token_idx, "The number of parameters should be "+str(qsofinstr.timeslice.Opaque_Table[name]))
-                self.get_next_token(2)
+                    self.error_at(self.current_file.token_idx+2, "The number of parameters should be "+str(qsofinstr.timeslice.Opaque_Table[name]))
+                self.get_next_token(3)
                 opaque_instance = Opaque(name)
                 args = self.idlist_qubit().qregs
                 opaque_instance.add_args(args)
@@ -502,37 +698,55 @@ class Parser(Token):
                 node_stmt.add_str(name)
                 self.MULTI_CONTROL_QUBITS.clear()
                 return node_stmt
-            # Check for some errors
             else:
-                if self.check_operator_str(self.current_file.token_idx+2, ";"):
-                    self.error_at(self.current_file.token_idx+2, "The arguments cannot be empty")
-                elif self.check_operator_str(self.current_file.token_idx+2, ","):
-                    self.error_at(self.current_file.token_idx+2, "The opaque name cannot be empty")
-                else:
-                    self.error_at(self.current_file.token_idx+2, "The arguments or parameters cannot be this type")
-        # Recursive descent parsing for 'if (condition) qop'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_IF:
+                self.error_at(self.current_file.token_idx+3, "The parameters could only be identifiers or empty")
+        # Recursive descent parsing for 'opaque id idlist ;'
+        elif self.check_TK_kind(self.current_file.token_idx+2) == qasm2_token.TK_IDENT:
             self.get_next_token()
-            self.expect("(")
-            self.IF = True
-            condition = self.condition()
-            self.IF = False
-            self.expect(")")
-            if self.check_operator_str(self.current_file.token_idx, ";"):
-                self.error_at(self.current_file.token_idx, "The statement of if cannot be empty")
-            qop = self.qop()
-            node_stmt = Parser.create_node(ND_IF, condition, qop)
-            return node_stmt
-        # Recursive descent parsing for 'barrier idlist ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_BARRIER:
-            self.get_next_token()
-            args = self.idlist_qubit()
+            name = self.current_file.token.get_str(self.current_file.token_idx)
+            # Check whether the opaque should have parameters
+            if qsofinstr.timeslice.Opaque_Table[name] != 0:
+                self.error_at(self.current_file.token_idx, "The number of parameters should be "+str(qsofinstr.timeslice.Opaque_Table[name]))
+            self.get_next_token(2)
+            opaque_instance = Opaque(name)
+            args = self.idlist_qubit().qregs
+            opaque_instance.add_args(args)
             self.expect(";")
+            self.opaques[name] = opaque_instance
+            node_stmt = Parser.create_node(ND_OPAQUE)
+            node_stmt.add_str(name)
             self.MULTI_CONTROL_QUBITS.clear()
-            return Parser.create_node(ND_BARRIER, args)
-        # Recursive descent parsing for 'qop'
+            return node_stmt
+        # Check for some errors
         else:
-            return self.qop()
+            if self.check_operator_str(self.current_file.token_idx+2, ";"):
+                self.error_at(self.current_file.token_idx+2, "The arguments cannot be empty")
+            elif self.check_operator_str(self.current_file.token_idx+2, ","):
+                self.error_at(self.current_file.token_idx+2, "The opaque name cannot be empty")
+            else:
+                self.error_at(self.current_file.token_idx+2, "The arguments or parameters cannot be this type")
+    
+    # Recursive descent parsing for 'if (condition) qop'
+    def ifdecl(self):
+        self.get_next_token()
+        self.expect("(")
+        self.IF = True
+        condition = self.condition()
+        self.IF = False
+        self.expect(")")
+        if self.check_operator_str(self.current_file.token_idx, ";"):
+            self.error_at(self.current_file.token_idx, "The statement of if cannot be empty")
+        qop = self.qop()
+        node_stmt = Parser.create_node(ND_IF, condition, qop)
+        return node_stmt
+    
+    # Recursive descent parsing for 'barrier idlist ;'
+    def barrier(self):
+        self.get_next_token()
+        args = self.idlist_qubit()
+        self.expect(";")
+        self.MULTI_CONTROL_QUBITS.clear()
+        return Parser.create_node(ND_BARRIER, args)
     
     # Recursive descent parsing for 'condition := id == nninteger'
     def condition(self):
@@ -556,20 +770,20 @@ class Parser(Token):
             # otherwise, error happens
             else:
                 self.error_at(self.current_file.token_idx, "The value here should be a number")
-        condition_rhs = self.create_node_num(self.current_file.token[self.current_file.token_idx][self.val_idx])
+        condition_rhs = self.create_node_num(self.current_file.token.get_val(self.current_file.token_idx))
         # Check whether the size of the creg is 1 if it's not indexed
         if condition_lhs.cregs[0][1] == -1:
             # Check whether the value is out of range that can be represented by creg if the creg has size larger than 1
             if self.cregs[condition_lhs.cregs[0][0]] != 1:
-                if not (0 <= self.current_file.token[self.current_file.token_idx][self.val_idx] < 2**self.cregs[condition_lhs.cregs[0][0]]): 
+                if not (0 <= self.current_file.token.get_val(self.current_file.token_idx) < 2**self.cregs[condition_lhs.cregs[0][0]]): 
                     self.error_at(self.current_file.token_idx, f"This value cannot be represented by {self.cregs[condition_lhs.cregs[0][0]]} bits creg {condition_lhs.cregs[0][0]}")
             # Check whether the value is 0 or 1 if the creg has size 1
             else:
-                if self.current_file.token[self.current_file.token_idx][self.val_idx] not in [0, 1]:
+                if self.current_file.token.get_val(self.current_file.token_idx) not in [0, 1]:
                     self.error_at(self.current_file.token_idx, f"The value of the creg {condition_lhs.cregs[0][0]} should be 0 or 1")
         # Check whether the value is 0 or 1 if the creg is indexed
         else:
-            if self.current_file.token[self.current_file.token_idx][self.val_idx] not in [0, 1]:
+            if self.current_file.token.get_val(self.current_file.token_idx) not in [0, 1]:
                 self.error_at(self.current_file.token_idx, f"The value of the creg {condition_lhs.cregs[0][0]}[{condition_lhs.cregs[0][1]}] should be 0 or 1")
         self.get_next_token()
         node_condition = Parser.create_node(ND_EQUAL, condition_lhs, condition_rhs)
@@ -587,13 +801,13 @@ class Parser(Token):
                 else:
                     self.error_at(self.current_file.token_idx, "The qreg name cannot be this type")
             # Check whether the qreg name is already defined
-            if self.current_file.token[self.current_file.token_idx][self.str_idx] in self.qregs:
-                self.error_at(self.current_file.token_idx, "qreg "+self.current_file.token[self.current_file.token_idx][self.str_idx]+" already defined")
-            name = self.current_file.token[self.current_file.token_idx][self.str_idx]
+            if self.current_file.token.get_str(self.current_file.token_idx) in self.qregs:
+                self.error_at(self.current_file.token_idx, "qreg "+self.current_file.token.get_str(self.current_file.token_idx)+" already defined")
+            name = self.current_file.token.get_str(self.current_file.token_idx)
             self.get_next_token()
             self.expect("[")
             self.check_num_error("qreg size")
-            size = int(self.current_file.token[self.current_file.token_idx][self.val_idx])
+            size = int(self.current_file.token.get_val(self.current_file.token_idx))
             self.qregs[name] = size
             self.get_next_token()
             self.expect("]")
@@ -611,13 +825,13 @@ class Parser(Token):
                 else:
                     self.error_at(self.current_file.token_idx, "The creg name cannot be this type")
             # Check whether the creg name is already defined
-            if self.current_file.token[self.current_file.token_idx][self.str_idx] in self.cregs:
-                self.error_at(self.current_file.token_idx, "creg "+self.current_file.token[self.current_file.token_idx][self.str_idx]+" already defined")
-            name = self.current_file.token[self.current_file.token_idx][self.str_idx]
+            if self.current_file.token.get_str(self.current_file.token_idx) in self.cregs:
+                self.error_at(self.current_file.token_idx, "creg "+self.current_file.token.get_str(self.current_file.token_idx)+" already defined")
+            name = self.current_file.token.get_str(self.current_file.token_idx)
             self.get_next_token()
             self.expect("[")
             self.check_num_error("creg size")
-            size = int(self.current_file.token[self.current_file.token_idx][self.val_idx])
+            size = int(self.current_file.token.get_val(self.current_file.token_idx))
             self.cregs[name] = size
             self.get_next_token()
             self.expect("]")
@@ -652,10 +866,10 @@ class Parser(Token):
         if self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_IDENT and self.check_operator_str(self.current_file.token_idx+1, ","):
             self.error_at(self.current_file.token_idx, "The gate name is missing")
         # Check whether the gate is already defined 
-        if self.current_file.token[self.current_file.token_idx][self.str_idx] in self.gates:
-            self.error_at(self.current_file.token_idx, "gate "+self.current_file.token[self.current_file.token_idx][self.str_idx]+\
-                f" already defined in {self.gates[self.current_file.token[self.current_file.token_idx][self.str_idx]].filename}")
-        name = self.current_file.token[self.current_file.token_idx][self.str_idx] 
+        if self.current_file.token.get_str(self.current_file.token_idx) in self.gates:
+            self.error_at(self.current_file.token_idx, "gate "+self.current_file.token.get_str(self.current_file.token_idx)+\
+                f" already defined in {self.gates[self.current_file.token.get_str(self.current_file.token_idx)].filename}")
+        name = self.current_file.token.get_str(self.current_file.token_idx) 
         # Set the current gate name
         GATE_DEF_name_pre = self.GATE_DEF_name
         GATE_define_pre = self.GATE_define
@@ -705,58 +919,63 @@ class Parser(Token):
                 
     # Recursive descent parsing for 'qop := uop | measure argument -> argument ; | reset argument ;'
     def qop(self):
-        # Recursive descent parsing for 'measure argument -> argument ;'
-        if self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_MEASURE:
-            self.get_next_token()
-            # Check whether the argument is missing or wrong type is used 
-            if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
-                if self.check_operator_str(self.current_file.token_idx, "->"):
-                    self.error_at(self.current_file.token_idx, "The qreg argument is missing")
-                elif self.check_operator_str(self.current_file.token_idx, ";"):
-                    self.error_at(self.current_file.token_idx, "The qreg argument and the destination are missing")
-                else:
-                    self.error_at(self.current_file.token_idx, "The qreg argument cannot be this type")
-            self.MEASURE = True
-            node_lhs = self.argument()
-            self.expect("->")
-            # Check whether the destination is missing or wrong type is used
-            if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
-                if self.check_operator_str(self.current_file.token_idx, ";"):
-                    self.error_at(self.current_file.token_idx, "The creg destination is missing")
-                else:
-                    self.error_at(self.current_file.token_idx, "The creg destination cannot be this type")
-            node_rhs = self.argument_c()
-            # Check whether the qreg and creg are of the same size if they are not indexed
-            if node_lhs.qregs[0][1] == -1 and node_rhs.cregs[0][1] == -1:
-                if self.qregs[node_lhs.qregs[0][0]] != self.cregs[node_rhs.cregs[0][0]]:
-                    self.error_at(self.current_file.token_idx-1, "The qreg and creg should be of the same size for measurement")
-            # Check whether the qreg and creg are of the same size if only one of them is indexed
-            if node_lhs.qregs[0][1] == -1 and node_rhs.cregs[0][1] != -1:
-                if self.qregs[node_lhs.qregs[0][0]] != 1:
-                    self.error_at(self.current_file.token_idx-4, "Multiple qubits cannot be measured into a single bit")
-            if node_lhs.qregs[0][1] != -1 and node_rhs.cregs[0][1] == -1:
-                if self.cregs[node_rhs.cregs[0][0]] != 1:
-                    self.error_at(self.current_file.token_idx-1, "Single qubit cannot be measured into multiple bits")
-            self.MEASURE = False
-            self.expect(";")
-            node_qof = Parser.create_node(ND_MEASURE, node_lhs, node_rhs)
-            return node_qof
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_RESET:
-            self.get_next_token()
-            # Check whether the argument is missing or wrong type is used
-            if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
-                if self.check_operator_str(self.current_file.token_idx, ";"):
-                    self.error_at(self.current_file.token_idx, "The qreg argument is missing")
-                else:
-                    self.error_at(self.current_file.token_idx, "The qreg argument cannot be this type")
-            self.RESET = True
-            node_lhs = self.argument()
-            self.expect(";")
-            self.RESET = False
-            node_qof = Parser.create_node(ND_RESET, node_lhs)
-            return node_qof
-        else:
+        handler = Parser.QOP_TABLE.get(self.check_TK_kind(self.current_file.token_idx))
+        if handler is None:
             return self.uop()
+        return handler(self)
+    
+    # Recursive descent parsing for 'measure argument -> argument ;'
+    def measure(self):
+        self.get_next_token()
+        # Check whether the argument is missing or wrong type is used 
+        if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
+            if self.check_operator_str(self.current_file.token_idx, "->"):
+                self.error_at(self.current_file.token_idx, "The qreg argument is missing")
+            elif self.check_operator_str(self.current_file.token_idx, ";"):
+                self.error_at(self.current_file.token_idx, "The qreg argument and the destination are missing")
+            else:
+                self.error_at(self.current_file.token_idx, "The qreg argument cannot be this type")
+        self.MEASURE = True
+        node_lhs = self.argument()
+        self.expect("->")
+        # Check whether the destination is missing or wrong type is used
+        if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
+            if self.check_operator_str(self.current_file.token_idx, ";"):
+                self.error_at(self.current_file.token_idx, "The creg destination is missing")
+            else:
+                self.error_at(self.current_file.token_idx, "The creg destination cannot be this type")
+        node_rhs = self.argument_c()
+        # Check whether the qreg and creg are of the same size if they are not indexed
+        if node_lhs.qregs[0][1] == -1 and node_rhs.cregs[0][1] == -1:
+            if self.qregs[node_lhs.qregs[0][0]] != self.cregs[node_rhs.cregs[0][0]]:
+                self.error_at(self.current_file.token_idx-1, "The qreg and creg should be of the same size for measurement")
+        # Check whether the qreg and creg are of the same size if only one of them is indexed
+        if node_lhs.qregs[0][1] == -1 and node_rhs.cregs[0][1] != -1:
+            if self.qregs[node_lhs.qregs[0][0]] != 1:
+                self.error_at(self.current_file.token_idx-4, "Multiple qubits cannot be measured into a single bit")
+        if node_lhs.qregs[0][1] != -1 and node_rhs.cregs[0][1] == -1:
+            if self.cregs[node_rhs.cregs[0][0]] != 1:
+                self.error_at(self.current_file.token_idx-1, "Single qubit cannot be measured into multiple bits")
+        self.MEASURE = False
+        self.expect(";")
+        node_qof = Parser.create_node(ND_MEASURE, node_lhs, node_rhs)
+        return node_qof
+    
+    # Recursive descent parsing for 'reset argument ;'
+    def reset(self):
+        self.get_next_token()
+        # Check whether the argument is missing or wrong type is used
+        if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
+            if self.check_operator_str(self.current_file.token_idx, ";"):
+                self.error_at(self.current_file.token_idx, "The qreg argument is missing")
+            else:
+                self.error_at(self.current_file.token_idx, "The qreg argument cannot be this type")
+        self.RESET = True
+        node_lhs = self.argument()
+        self.expect(";")
+        self.RESET = False
+        node_qof = Parser.create_node(ND_RESET, node_lhs)
+        return node_qof
     
     # Recursive descent parsing for 'argument := id | id [nninteger]'
     def argument(self):
@@ -765,12 +984,12 @@ class Parser(Token):
             self.error_at(self.current_file.token_idx, "The qreg argument should be an identifier")
         # Check whether the argument is declared for the gate definition
         if self.GATE_define:
-            if not self.current_file.token[self.current_file.token_idx][self.str_idx] in self.gates[self.GATE_DEF_name].args:
-                self.error_at(self.current_file.token_idx, "The argument "+self.current_file.token[self.current_file.token_idx][self.str_idx]+" is not declared in gate "+self.GATE_DEF_name)
+            if not self.current_file.token.get_str(self.current_file.token_idx) in self.gates[self.GATE_DEF_name].args:
+                self.error_at(self.current_file.token_idx, "The argument "+self.current_file.token.get_str(self.current_file.token_idx)+" is not declared in gate "+self.GATE_DEF_name)
         # Check whether the argument is already defined 
-        if (not self.GATE_define) and (not self.current_file.token[self.current_file.token_idx][self.str_idx] in self.qregs):
-            self.error_at(self.current_file.token_idx, "qreg "+self.current_file.token[self.current_file.token_idx][self.str_idx]+" not defined")
-        name = self.current_file.token[self.current_file.token_idx][self.str_idx]
+        if (not self.GATE_define) and (not self.current_file.token.get_str(self.current_file.token_idx) in self.qregs):
+            self.error_at(self.current_file.token_idx, "qreg "+self.current_file.token.get_str(self.current_file.token_idx)+" not defined")
+        name = self.current_file.token.get_str(self.current_file.token_idx)
         self.get_next_token()
         # Check whether the argument is indexed
         if self.check_operator_str(self.current_file.token_idx, "["):
@@ -780,7 +999,7 @@ class Parser(Token):
             # Check whether the qreg size is missing or wrong type is used
             self.get_next_token()
             self.check_num_error("qreg index")
-            index = int(self.current_file.token[self.current_file.token_idx][self.val_idx])
+            index = int(self.current_file.token.get_val(self.current_file.token_idx))
             # Check whether the qreg index exceeds the size
             if index >= self.qregs[name]:
                 self.error_at(self.current_file.token_idx, "The qreg index exceeds the size")
@@ -802,16 +1021,16 @@ class Parser(Token):
         if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
             self.error_at(self.current_file.token_idx, "The creg argument should be an identifier")
         # Check whether the argument is already defined 
-        if not self.current_file.token[self.current_file.token_idx][self.str_idx] in self.cregs:
-            self.error_at(self.current_file.token_idx, "creg "+self.current_file.token[self.current_file.token_idx][self.str_idx]+" not defined")
-        name = self.current_file.token[self.current_file.token_idx][self.str_idx]
+        if not self.current_file.token.get_str(self.current_file.token_idx) in self.cregs:
+            self.error_at(self.current_file.token_idx, "creg "+self.current_file.token.get_str(self.current_file.token_idx)+" not defined")
+        name = self.current_file.token.get_str(self.current_file.token_idx)
         self.get_next_token()
         # Check whether the argument is indexed
         if self.check_operator_str(self.current_file.token_idx, "["):
             # Check whether the creg size is missing or wrong type is used
             self.get_next_token()
             self.check_num_error("creg index")
-            index = int(self.current_file.token[self.current_file.token_idx][self.val_idx])
+            index = int(self.current_file.token.get_val(self.current_file.token_idx))
             # Check whether the creg index exceeds the size
             if index >= self.cregs[name]:
                 self.error_at(self.current_file.token_idx, "The creg index exceeds the size")
@@ -959,216 +1178,75 @@ class Parser(Token):
         return node_uop
     
     def uop(self):
-        # Recursive descent parsing for 'U (explist) argument ;'
-        if self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_U:
-            node_uop = self.uop_with_explist_single(ND_U, "U")
-            return node_uop
-        # Recursive descent parsing for u1
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_U1:
-            node_uop = self.uop_with_explist_single(ND_U1, "U1")
-            return node_uop
-        # Recursive descent parsing for u2
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_U2:
-            node_uop = self.uop_with_explist_single(ND_U2, "U2")
-            return node_uop
-        # Recursive descent parsing for 'CX argument , argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CX:
-            node_uop = self.uop_without_explist_controlled(ND_CX, "CX")
-            return node_uop
-        # Recursive descent parsing for 'X argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_X:
-            node_uop = self.uop_without_explist_single(ND_X, "X")
-            return node_uop
-        # Recursive descent parsing for 'Y argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_Y:
-            node_uop = self.uop_without_explist_single(ND_Y, "Y")
-            return node_uop
-        # Recursive descent parsing for 'Z argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_Z:
-            node_uop = self.uop_without_explist_single(ND_Z, "Z")
-            return node_uop
-        # Recursive descent parsing for 'S argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_S:
-            node_uop = self.uop_without_explist_single(ND_S, "S") 
-            return node_uop
-        # Recursive descent parsing for 'T argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_T:
-            node_uop = self.uop_without_explist_single(ND_T, "T")
-            return node_uop
-        # Recursive descent parsing for 'RTHETA (explist) argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_RTHETA:
-            node_uop = self.uop_with_explist_single(ND_RTHETA, "RTHETA")
-            return node_uop
-        # Recursive descent parsing for 'RX (explist) argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_RX:
-            node_uop = self.uop_with_explist_single(ND_RX, "RX")
-            return node_uop
-        # Recursive descent parsing for 'RY (explist) argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_RY:
-            node_uop = self.uop_with_explist_single(ND_RY, "RY")
-            return node_uop
-        # Recursive descent parsing for 'RZ (explist) argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_RZ:
-            node_uop = self.uop_with_explist_single(ND_RZ, "RZ")
-            return node_uop
-        # Recursive descent parsing for 'H argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_H:
-            node_uop = self.uop_without_explist_single(ND_H, "H")
-            return node_uop
-        # Recursive descent parsing for 'CY argument, argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CY:
-            node_uop = self.uop_without_explist_controlled(ND_CY, "CY")
-            return node_uop
-        # Recursive descent parsing for 'CZ argument, argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CZ:
-            node_uop = self.uop_without_explist_controlled(ND_CZ, "CZ")
-            return node_uop
-        # Recursive descent parsing for 'CU (explist) argument, argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CU:
-            node_uop = self.uop_with_explist_controlled(ND_CU, "CU")
-            return node_uop
-        # Recursive descent parsing for 'CU1 (explist) argument, argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CU1:
-            node_uop = self.uop_with_explist_controlled(ND_CU1, "CU1")
-            return node_uop
-        # Recursive descent parsing for 'CS argument, argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CS:
-            node_uop = self.uop_without_explist_controlled(ND_CS, "CS")
-            return node_uop
-        # Recursive descent parsing for 'CT argument, argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CT:
-            node_uop = self.uop_without_explist_controlled(ND_CT, "CT")
-            return node_uop
-        # Recursive descent parsing for 'CRTHETA (explist) argument, argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CRTHETA:
-            node_uop = self.uop_with_explist_controlled(ND_CRTHETA, "CRTHETA")
-            return node_uop
-        # Recursive descent parsing for 'CRX (explist) argument, argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CRX:
-            node_uop = self.uop_with_explist_controlled(ND_CRX, "CRX")
-            return node_uop
-        # Recursive descent parsing for 'CRY (explist) argument, argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CRY:
-            node_uop = self.uop_with_explist_controlled(ND_CRY, "CRY")
-            return node_uop
-        # Recursive descent parsing for 'CRZ (explist) argument, argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CRZ:
-            node_uop = self.uop_with_explist_controlled(ND_CRZ, "CRZ")
-            return node_uop
-        # Recursive descent parsing for 'CH argument, argument ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CH:
-            node_uop = self.uop_without_explist_controlled(ND_CH, "CH")
-            return node_uop
-        # Recursive descent parsing for idle gate
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_ID:
-            node_uop = self.uop_without_explist_single(-1, "ID")
-            return
-        # Recursive descent parsing for sdg gate
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_SDG:
-            node_uop = self.uop_without_explist_single(ND_SDG, "SDG")
-            return node_uop
-        # Recursive descent parsing for tdg gate
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_TDG:
-            node_uop = self.uop_without_explist_single(ND_TDG, "TDG")
-            return node_uop
-        # Recursive descent parsing for ccx gate
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_CCX:
-            self.get_next_token()
-            # Check whether there are parameters
-            if self.check_operator_str(self.current_file.token_idx, "("):
-                self.error_at(self.current_file.token_idx, "The parameters of CCX are not allowed")
-            argument = self.idlist_qubit()
-            # Check whether the number of arguments is correct
-            if len(argument.qregs) != 3:
-                if len(argument.qregs) > 3:
-                    self.error_at(self.current_file.token_idx, "There should not be more than 2 control qubits for CCX")
-                else:
-                    self.error_at(self.current_file.token_idx, "There should not be less than 2 control qubits for CCX")
-            self.expect(";")
-            node_uop = Parser.create_node(ND_CCX, argument)
-            return node_uop
-        # Recursive descent parsing for 'id idlist ; | id () idlist ; | id (explist) idlist ;'
-        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_IDENT:
-            name = self.current_file.token[self.current_file.token_idx][self.str_idx]
-            # Check whether the gate is a gate declare or an opaque declare
-            Gate_declare_pre = self.GATE_declare
-            Opaque_declare_pre = self.OPAQUE_declare
-            ND_NOEXP_type = ND_GATE_NOEXP
-            ND_EXP_type = ND_GATE_EXP
-            if name in self.gates:
-                self.GATE_declare = True
-            elif name in self.opaques:
-                self.OPAQUE_declare = True
-                ND_NOEXP_type = ND_OPAQUE_NOEXP
-                ND_EXP_type = ND_OPAQUE_EXP
+        entry = Parser.UOP_TABLE.get(self.check_TK_kind(self.current_file.token_idx))
+        # Check for some errors
+        if entry is None:
+            if self.check_operator_str(self.current_file.token_idx, ";"):
+                self.error_at(self.current_file.token_idx, "The gate operation cannot be empty")
             else:
-                gate_found_pre = self.GATE_FOUND
-                gate_name_find_pre = self.gate_name_find
-                self.GATE_FOUND = False
-                self.gate_name_find = name
-                file_need_find_pre = self.file_need_find
-                self.file_need_find = self.current_file
-                if not self.check_included_files(self.current_file):
-                    self.current_file = self.file_need_find
-                    self.error_at(self.current_file.token_idx, f"gate {name} not defined")
-                self.current_file = self.file_need_find
-                self.file_need_find = file_need_find_pre
-                self.GATE_declare = True
-                self.GATE_FOUND = gate_found_pre
-                self.gate_name_find = gate_name_find_pre
-            
-            gate_name_pre = self.GATE_name 
-            self.GATE_name = name
+                self.error_at(self.current_file.token_idx, "The gate operation cannot be this type")
+        handler, kind, name = entry
+        return handler(self, kind, name)
+    
+    # Recursive descent parsing for idle gate, which is dropped
+    def uop_id(self, kind, name):
+        self.uop_without_explist_single(kind, name)
+    
+    # Recursive descent parsing for 'CCX argument, argument, argument ;'
+    def uop_ccx(self, kind, name):
+        self.get_next_token()
+        # Check whether there are parameters
+        if self.check_operator_str(self.current_file.token_idx, "("):
+            self.error_at(self.current_file.token_idx, "The parameters of CCX are not allowed")
+        argument = self.idlist_qubit()
+        # Check whether the number of arguments is correct
+        if len(argument.qregs) != 3:
+            if len(argument.qregs) > 3:
+                self.error_at(self.current_file.token_idx, "There should not be more than 2 control qubits for CCX")
+            else:
+                self.error_at(self.current_file.token_idx, "There should not be less than 2 control qubits for CCX")
+        self.expect(";")
+        node_uop = Parser.create_node(kind, argument)
+        return node_uop
+    
+    # Recursive descent parsing for 'id idlist ; | id () idlist ; | id (explist) idlist ;', kind and name are taken from the tokens
+    def uop_gate(self, kind, name):
+        name = self.current_file.token.get_str(self.current_file.token_idx)
+        # Check whether the gate is a gate declare or an opaque declare
+        Gate_declare_pre = self.GATE_declare
+        Opaque_declare_pre = self.OPAQUE_declare
+        ND_NOEXP_type = ND_GATE_NOEXP
+        ND_EXP_type = ND_GATE_EXP
+        # The gates called in a gate body are kept with the definition in the cache, as they have to be found again when it is loaded
+        if self.GATE_define and self.current_file.definitions is not None and self.current_file is not self.main_file:
+            self.current_file.calls.append((self.current_file.token_idx, name))
+        if name in self.gates:
+            self.GATE_declare = True
+        elif name in self.opaques:
+            self.OPAQUE_declare = True
+            ND_NOEXP_type = ND_OPAQUE_NOEXP
+            ND_EXP_type = ND_OPAQUE_EXP
+        else:
+            self.find_included_gate(name, self.current_file.token_idx)
+            self.GATE_declare = True
+        
+        gate_name_pre = self.GATE_name 
+        self.GATE_name = name
+        self.get_next_token()
+        if self.check_operator_str(self.current_file.token_idx, "("):
             self.get_next_token()
-            if self.check_operator_str(self.current_file.token_idx, "("):
-                self.get_next_token()
-                if self.check_operator_str(self.current_file.token_idx, ")"):
-                    self.expect(")")
-                    # Check whether the arguments are missing or wrong type is used
-                    if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
-                        if self.check_operator_str(self.current_file.token_idx, ";"):
-                            self.error_at(self.current_file.token_idx, "The arguments of the gate are missing")
-                        else:
-                            self.error_at(self.current_file.token_idx, "The arguments cannot be this type")
-                    args = self.idlist_qubit()
-                    self.expect(";")
-                    node_uop = Parser.create_node(ND_NOEXP_type, args)
-                    # Add the gate name to the node for later circuit generation
-                    node_uop.add_str(name)
-                    # Flip the GATE_declare flag to change the current state back to normal
-                    # self.GATE_declare = False
-                    # self.OPAQUE_declare = False
-                    self.GATE_declare = Gate_declare_pre
-                    self.OPAQUE_declare = Opaque_declare_pre
-                    self.GATE_name = gate_name_pre
-                    self.MULTI_CONTROL_QUBITS.clear()
-                    return node_uop
-                else:
-                    explist = self.explist()
-                    self.expect(")")
-                     # Check whether the arguments are missing or wrong type is used
-                    if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
-                        if self.check_operator_str(self.current_file.token_idx, ";"):
-                            self.error_at(self.current_file.token_idx, "The arguments of the gate are missing")
-                        else:
-                            self.error_at(self.current_file.token_idx, "The arguments cannot be this type")
-                    args = self.idlist_qubit()
-                    self.expect(";")
-                    node_uop = Parser.create_node(ND_EXP_type, explist, args)
-                    # Add the gate name to the node for later circuit generation
-                    node_uop.add_str(name)
-                    # Flip the GATE_declare flag to change the current state back to normal
-                    # self.GATE_declare = False
-                    # self.OPAQUE_declare = False
-                    self.GATE_declare = Gate_declare_pre
-                    self.OPAQUE_declare = Opaque_declare_pre
-                    self.GATE_name = gate_name_pre
-                    self.MULTI_CONTROL_QUBITS.clear()
-                    return node_uop
-            elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_IDENT:
+            if self.check_operator_str(self.current_file.token_idx, ")"):
+                self.expect(")")
+                # Check whether the arguments are missing or wrong type is used
+                if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
+                    if self.check_operator_str(self.current_file.token_idx, ";"):
+                        self.error_at(self.current_file.token_idx, "The arguments of the gate are missing")
+                    else:
+                        self.error_at(self.current_file.token_idx, "The arguments cannot be this type")
                 args = self.idlist_qubit()
                 self.expect(";")
                 node_uop = Parser.create_node(ND_NOEXP_type, args)
+                # Add the gate name to the node for later circuit generation
                 node_uop.add_str(name)
                 # Flip the GATE_declare flag to change the current state back to normal
                 # self.GATE_declare = False
@@ -1178,18 +1256,98 @@ class Parser(Token):
                 self.GATE_name = gate_name_pre
                 self.MULTI_CONTROL_QUBITS.clear()
                 return node_uop
-            # Check for some errors
             else:
-                if self.check_operator_str(self.current_file.token_idx, ","):
-                    self.error_at(self.current_file.token_idx, "The gate name cannot be empty")
-                else:
-                    self.error_at(self.current_file.token_idx, "The arguments cannot be this type")
+                explist = self.explist()
+                self.expect(")")
+                 # Check whether the arguments are missing or wrong type is used
+                if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
+                    if self.check_operator_str(self.current_file.token_idx, ";"):
+                        self.error_at(self.current_file.token_idx, "The arguments of the gate are missing")
+                    else:
+                        self.error_at(self.current_file.token_idx, "The arguments cannot be this type")
+                args = self.idlist_qubit()
+                self.expect(";")
+                node_uop = Parser.create_node(ND_EXP_type, explist, args)
+                # Add the gate name to the node for later circuit generation
+                node_uop.add_str(name)
+                # Flip the GATE_declare flag to change the current state back to normal
+                # self.GATE_declare = False
+                # self.OPAQUE_declare = False
+                self.GATE_declare = Gate_declare_pre
+                self.OPAQUE_declare = Opaque_declare_pre
+                self.GATE_name = gate_name_pre
+                self.MULTI_CONTROL_QUBITS.clear()
+                return node_uop
+        elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_IDENT:
+            args = self.idlist_qubit()
+            self.expect(";")
+            node_uop = Parser.create_node(ND_NOEXP_type, args)
+            node_uop.add_str(name)
+            # Flip the GATE_declare flag to change the current state back to normal
+            # self.GATE_declare = False
+            # self.OPAQUE_declare = False
+            self.GATE_declare = Gate_declare_pre
+            self.OPAQUE_declare = Opaque_declare_pre
+            self.GATE_name = gate_name_pre
+            self.MULTI_CONTROL_QUBITS.clear()
+            return node_uop
         # Check for some errors
         else:
-            if self.check_operator_str(self.current_file.token_idx, ";"):
-                self.error_at(self.current_file.token_idx, "The gate operation cannot be empty")
+            if self.check_operator_str(self.current_file.token_idx, ","):
+                self.error_at(self.current_file.token_idx, "The gate name cannot be empty")
             else:
-                self.error_at(self.current_file.token_idx, "The gate operation cannot be this type")
+                self.error_at(self.current_file.token_idx, "The arguments cannot be this type")
+    
+    # The handlers of the statements by the kind of the first token, the other kinds are parsed as uop
+    STATEMENT_TABLE = {
+        qasm2_token.TK_QREG: decl,
+        qasm2_token.TK_CREG: decl,
+        qasm2_token.TK_GATE: gatedecl,
+        qasm2_token.TK_OPAQUE: opaquedecl,
+        qasm2_token.TK_IF: ifdecl,
+        qasm2_token.TK_BARRIER: barrier,
+        qasm2_token.TK_MEASURE: measure,
+        qasm2_token.TK_RESET: reset,
+    }
+    # The handlers of the qop other than uop
+    QOP_TABLE = {
+        qasm2_token.TK_MEASURE: measure,
+        qasm2_token.TK_RESET: reset,
+    }
+    # The handlers of uop by the kind of the gate token, with the structure kind: (handler, node kind, name used in the error messages)
+    # The names are the canonical names in the keyword table shared with the tokenizer, a new native gate is added with register_native_gate
+    UOP_TABLE = {kind: (handler, node_kind, qasm2_token.KEYWORD_NAMES.get(kind)) for kind, (handler, node_kind) in {
+        qasm2_token.TK_U: (uop_with_explist_single, ND_U),
+        qasm2_token.TK_U1: (uop_with_explist_single, ND_U1),
+        qasm2_token.TK_U2: (uop_with_explist_single, ND_U2),
+        qasm2_token.TK_CX: (uop_without_explist_controlled, ND_CX),
+        qasm2_token.TK_X: (uop_without_explist_single, ND_X),
+        qasm2_token.TK_Y: (uop_without_explist_single, ND_Y),
+        qasm2_token.TK_Z: (uop_without_explist_single, ND_Z),
+        qasm2_token.TK_S: (uop_without_explist_single, ND_S),
+        qasm2_token.TK_T: (uop_without_explist_single, ND_T),
+        qasm2_token.TK_RTHETA: (uop_with_explist_single, ND_RTHETA),
+        qasm2_token.TK_RX: (uop_with_explist_single, ND_RX),
+        qasm2_token.TK_RY: (uop_with_explist_single, ND_RY),
+        qasm2_token.TK_RZ: (uop_with_explist_single, ND_RZ),
+        qasm2_token.TK_H: (uop_without_explist_single, ND_H),
+        qasm2_token.TK_CY: (uop_without_explist_controlled, ND_CY),
+        qasm2_token.TK_CZ: (uop_without_explist_controlled, ND_CZ),
+        qasm2_token.TK_CU: (uop_with_explist_controlled, ND_CU),
+        qasm2_token.TK_CU1: (uop_with_explist_controlled, ND_CU1),
+        qasm2_token.TK_CS: (uop_without_explist_controlled, ND_CS),
+        qasm2_token.TK_CT: (uop_without_explist_controlled, ND_CT),
+        qasm2_token.TK_CRTHETA: (uop_with_explist_controlled, ND_CRTHETA),
+        qasm2_token.TK_CRX: (uop_with_explist_controlled, ND_CRX),
+        qasm2_token.TK_CRY: (uop_with_explist_controlled, ND_CRY),
+        qasm2_token.TK_CRZ: (uop_with_explist_controlled, ND_CRZ),
+        qasm2_token.TK_CH: (uop_without_explist_controlled, ND_CH),
+        qasm2_token.TK_SDG: (uop_without_explist_single, ND_SDG),
+        qasm2_token.TK_TDG: (uop_without_explist_single, ND_TDG),
+        qasm2_token.TK_ID: (uop_id, -1),
+        qasm2_token.TK_CCX: (uop_ccx, ND_CCX),
+        qasm2_token.TK_IDENT: (uop_gate, None),
+    }.items()}
     
     # Recursive descent parsing for 'idlist := id | id [nninteger], idlist'
     def id_check_qubit(self, qreglist):
@@ -1198,12 +1356,12 @@ class Parser(Token):
             self.error_at(self.current_file.token_idx, "The type should be identifier")
         # Check whether the argument is already declared for the gate definition
         if self.GATE_define:
-            if not self.current_file.token[self.current_file.token_idx][self.str_idx] in self.gates[self.GATE_DEF_name].args:
-                self.error_at(self.current_file.token_idx, "The argument "+self.current_file.token[self.current_file.token_idx][self.str_idx]+" is not declared in gate "+self.GATE_DEF_name)
+            if not self.current_file.token.get_str(self.current_file.token_idx) in self.gates[self.GATE_DEF_name].args:
+                self.error_at(self.current_file.token_idx, "The argument "+self.current_file.token.get_str(self.current_file.token_idx)+" is not declared in gate "+self.GATE_DEF_name)
         # Check whether the qreg is already defined
-        if (not self.GATE_define) and (self.GATE_declare or self.OPAQUE_declare) and (not self.current_file.token[self.current_file.token_idx][self.str_idx] in self.qregs):
-            self.error_at(self.current_file.token_idx, "qreg "+self.current_file.token[self.current_file.token_idx][self.str_idx]+" not defined")
-        name = self.current_file.token[self.current_file.token_idx][self.str_idx]
+        if (not self.GATE_define) and (self.GATE_declare or self.OPAQUE_declare) and (not self.current_file.token.get_str(self.current_file.token_idx) in self.qregs):
+            self.error_at(self.current_file.token_idx, "qreg "+self.current_file.token.get_str(self.current_file.token_idx)+" not defined")
+        name = self.current_file.token.get_str(self.current_file.token_idx)
         self.get_next_token()
         # Check whether the argument is indexed
         if self.check_operator_str(self.current_file.token_idx, "["):
@@ -1212,7 +1370,7 @@ class Parser(Token):
                 self.error_at(self.current_file.token_idx, "The argument of gate definition cannot be indexed")
             self.get_next_token()
             self.check_num_error("qreg index")
-            idx = int(self.current_file.token[self.current_file.token_idx][self.val_idx])
+            idx = int(self.current_file.token.get_val(self.current_file.token_idx))
             # Check whether the qreg index exceeds the size
             if idx >= self.qregs[name]:
                 self.error_at(self.current_file.token_idx, "The qreg index exceeds the size")
@@ -1251,7 +1409,7 @@ class Parser(Token):
         # Check whether the argument is identifier
         if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_IDENT:
             self.error_at(self.current_file.token_idx, "The type should be identifier")
-        paramlist.append(self.current_file.token[self.current_file.token_idx][self.str_idx])
+        paramlist.append(self.current_file.token.get_str(self.current_file.token_idx))
         self.get_next_token()
     
     def idlist_param(self):
@@ -1272,16 +1430,33 @@ class Parser(Token):
     unaryop     := sin | cos | tan | exp | ln | sqrt'''
     
     # For binary operations, operator precedence parsing is applied
+    # The operations whose operands are all numbers are folded into a number while parsing
     # Recursive descent parsing for exp = ( "+" | "-" )? primary
     def exp(self):
         return self.binaryop()
+    
+    # Fold an operation into a ND_NUM node if its operands are numbers, the value is computed by the function of the operation in
+    # CODE_GEN_TABLE as in the code generation. An operation that cannot be computed is kept, so that the error is raised only if it is used
+    @staticmethod
+    def fold(node):
+        if node.left.kind != ND_NUM or (node.right is not None and node.right.kind != ND_NUM):
+            return node
+        function = Parser.CODE_GEN_TABLE[node.kind][1]
+        try:
+            if node.right is None:
+                val = function(node.left.val)
+            else:
+                val = function(node.left.val, node.right.val)
+        except (ArithmeticError, ValueError):
+            return node
+        return Parser.create_node_num(val)
         
     def exp_prim(self):
         if self.consume_operator_str("+"):
             return self.primary()
         if self.consume_operator_str("-"):
             node_exp = Parser.create_node(ND_SUB, self.create_node_num(0), self.primary())
-            return node_exp
+            return Parser.fold(node_exp)
         return self.primary()
     
     # Check for unary operators 
@@ -1312,24 +1487,26 @@ class Parser(Token):
     def primary(self):
         # Recursive descent parsing for real and nninteger
         if self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_NUM:
-            val = self.current_file.token[self.current_file.token_idx][self.val_idx]*(10**self.current_file.token[self.current_file.token_idx][self.exp_idx])
+            val = self.current_file.token.get_number(self.current_file.token_idx)
             node_primary = Parser.create_node_num(val)
             self.current_file.token_idx += 1
             return node_primary
         # Recursive descent parsing for pi
         elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_PI:
-            node_primary = Parser.create_node(ND_PI)
+            node_primary = Parser.create_node_num(Parser.CODE_GEN_TABLE[ND_PI][1])
             self.get_next_token()
             return node_primary
         # Recursive descent parsing for id
         elif self.check_TK_kind(self.current_file.token_idx) == qasm2_token.TK_IDENT:
             # Note! Here should be a check for whether the parameter is declared for this gate, this check will be in the code generation part
             node_primary = Parser.create_node(ND_IDENT)
-            node_primary.add_str(self.current_file.token[self.current_file.token_idx][self.str_idx])
-            # Check if the identifier of the parameter is already defined for gate definition
+            node_primary.add_str(self.current_file.token.get_str(self.current_file.token_idx))
+            # Check if the identifier of the parameter is already defined for gate definition, or is a free parameter otherwise
             if self.GATE_define:
-                if self.current_file.token[self.current_file.token_idx][self.str_idx] not in self.gates[self.GATE_DEF_name].params:
-                    self.error_at(self.current_file.token_idx, f"The parameter {self.current_file.token[self.current_file.token_idx][self.str_idx]} is not defined for gate {self.GATE_DEF_name}")
+                if self.current_file.token.get_str(self.current_file.token_idx) not in self.gates[self.GATE_DEF_name].params:
+                    self.error_at(self.current_file.token_idx, f"The parameter {self.current_file.token.get_str(self.current_file.token_idx)} is not defined for gate {self.GATE_DEF_name}")
+            elif self.current_file.token.get_str(self.current_file.token_idx) not in Parser.Symbols:
+                self.error_at(self.current_file.token_idx, f"The parameter {self.current_file.token.get_str(self.current_file.token_idx)} is not defined")
             self.get_next_token()
             return node_primary
         # Recursive descent parsing for "("binaryop")"
@@ -1344,7 +1521,7 @@ class Parser(Token):
             self.expect("(")
             node_primary = Parser.create_node(UnaryOp, self.exp())
             self.expect(")")
-            return node_primary
+            return Parser.fold(node_primary)
     
     # Operator precedence parsing for binaryop = exp "+" exp | exp "-" exp | exp "*" exp | exp "/" exp | exp "^" exp
     
@@ -1355,24 +1532,24 @@ class Parser(Token):
         if self.check_TK_kind(self.current_file.token_idx) != qasm2_token.TK_OPERATOR:
             self.error_at(self.current_file.token_idx, "This is not an operator")
         # Check whether the current operator is supported
-        if not self.current_file.token[self.current_file.token_idx][self.str_idx] in binop_precedence:
+        if not self.current_file.token.get_str(self.current_file.token_idx) in binop_precedence:
             self.error_at(self.current_file.token_idx, "This operator is not supported")
-        precedence = binop_precedence[self.current_file.token[self.current_file.token_idx][self.str_idx]]
+        precedence = binop_precedence[self.current_file.token.get_str(self.current_file.token_idx)]
         return precedence
     
     # Define the function to get the node kind of the current binary operator
     def get_binaryop(self):
         # Since this function will only be used after the precedence check, the current token must be an operator supported, so no need to check error
-        if self.current_file.token[self.current_file.token_idx][self.str_idx] == "+":
+        if self.current_file.token.get_str(self.current_file.token_idx) == "+":
             self.current_file.token_idx += 1
             return ND_ADD
-        elif self.current_file.token[self.current_file.token_idx][self.str_idx] == "-":
+        elif self.current_file.token.get_str(self.current_file.token_idx) == "-":
             self.get_next_token()
             return ND_SUB
-        elif self.current_file.token[self.current_file.token_idx][self.str_idx] == "*":
+        elif self.current_file.token.get_str(self.current_file.token_idx) == "*":
             self.get_next_token()
             return ND_MUL
-        elif self.current_file.token[self.current_file.token_idx][self.str_idx] == "/":
+        elif self.current_file.token.get_str(self.current_file.token_idx) == "/":
             self.get_next_token()
             return ND_DIV
         else:
@@ -1399,7 +1576,7 @@ class Parser(Token):
             if prec < next_prec:
                 rhs = self.ParseBinaryopRHS(prec+1, rhs)
             # Merge lhs/RHS
-            lhs = Parser.create_node(binaryop, lhs, rhs)
+            lhs = Parser.fold(Parser.create_node(binaryop, lhs, rhs))
     
     # Recursive descent parsing for binaryop
     def binaryop(self):
@@ -1442,8 +1619,8 @@ class Parser(Token):
         return node_explist
     
     # Define the Recursive descent parsing function
-    def Recursive_Descent_Parsing(self):
-        self.program()
+    def Recursive_Descent_Parsing(self, quantumcircuit=None):
+        self.program(quantumcircuit)
     
     #================================================================================================
     # End of Recursive descent parsing
@@ -1453,566 +1630,458 @@ class Parser(Token):
     # Circuit generation
     #================================================================================================
     
-    # Define the recursive function to generate the code for the node
+    # Define the recursive function to generate the code for the node, the handler is looked up in CODE_GEN_TABLE by the node kind
     def code_gen(self, node, quantumcircuit):
         if node is None:
             return
-        # return the val of the node if it is a number
+        # return the val of the node directly if it is a number, as the numbers are the most common leaves of the expressions
         if node.kind == ND_NUM:
             return node.val
-        # return the corresponding parameter value if it is an identifier
-        elif node.kind == ND_IDENT:
-            parameter_name = node.str
-            parameter_val = self.gates[self.GATE_DEF_name].params[parameter_name]
-            return parameter_val
-        # return the pi if it is a pi node
-        elif node.kind == ND_PI:
-            # return math.pi
-            return 3.14
-        # qubits added to circuit if ND_QREG_DEC is encountered
-        elif node.kind == ND_QREG_DEC:
-            qubit_name = node.str
-            size = self.qregs[qubit_name]
-            quantumcircuit.add_qubit(qubit_name, size)
-            quantumcircuit.add_qubit_max_time_slice(qubit_name, 0, size)
-            return
-        # classical bits added to circuit if ND_CREG_DEC is encountered
-        elif node.kind == ND_CREG_DEC:
-            cbit_name = node.str
-            size = self.cregs[cbit_name]
-            quantumcircuit.add_creg(cbit_name, size)
-            return
-        # the control and target qubits will be returned for both argument and idlist
-        elif node.kind == ND_QREG:
-            if node.controlled_with_parameter:
-                control_qreg = node.qregs
-                if self.GATE_define:
-                    for i in range(len(control_qreg)):
-                        control_qreg[i] = self.gates[self.GATE_DEF_name].args[control_qreg[i][0]]
-                target_qreg = self.code_gen(node.left, quantumcircuit)
-                return control_qreg, target_qreg
-            else:
-                qregs = []
-                if self.GATE_define:
-                    for i in range(len(node.qregs)):
-                        qregs.append(self.gates[self.GATE_DEF_name].args[node.qregs[i][0]])
-                    return qregs
-                else:
-                    return node.qregs
-        # creg node
-        elif node.kind == ND_CREG:
-            return node.cregs
-        # if the node is a gate declare node, skip it
-        elif node.kind == ND_GATE_DEC:
-            return
-        # if the node is a opaque declare node, skip it
-        elif node.kind == ND_OPAQUE:
-            return
-        #### the following code is for the single qubit gates without parameters ####
-        # X gate
-        elif node.kind == ND_X:
-            qubit = self.code_gen(node.left, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_no_parameter("x", qubit_name, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_no_parameter("x", qubit_name, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        # Y gate
-        elif node.kind == ND_Y:
-            qubit = self.code_gen(node.left, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_no_parameter("y", qubit_name, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_no_parameter("y", qubit_name, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        # Z gate
-        elif node.kind == ND_Z:
-            qubit = self.code_gen(node.left, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_no_parameter("z", qubit_name, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_no_parameter("z", qubit_name, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        # S gate
-        elif node.kind == ND_S:
-            qubit = self.code_gen(node.left, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_no_parameter("s", qubit_name, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_no_parameter("s", qubit_name, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        # T gate
-        elif node.kind == ND_T:
-            qubit = self.code_gen(node.left, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_no_parameter("t", qubit_name, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_no_parameter("t", qubit_name, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        # H gate
-        elif node.kind == ND_H:
-            qubit = self.code_gen(node.left, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_no_parameter("h", qubit_name, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_no_parameter("h", qubit_name, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        
-        ### The following code is for the single qubit gates with parameters ###
-        # Generate the parameters based on explist of Explist node
-        elif node.kind == ND_EXP_LIST:
-            params = []
-            for i in range(len(node.exps)):
-                params.append(self.code_gen(node.exps[i], quantumcircuit))
-            return params
-            
-        # RX gate
-        elif node.kind == ND_RX:
-            parameter = self.code_gen(node.left, quantumcircuit)
-            qubit = self.code_gen(node.right, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_with_parameter("rx", qubit_name, parameter, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_with_parameter("rx", qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        # RY gate
-        elif node.kind == ND_RY:
-            parameter = self.code_gen(node.left, quantumcircuit)
-            qubit = self.code_gen(node.right, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_with_parameter("ry", qubit_name, parameter, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_with_parameter("ry", qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        # RZ gate
-        elif node.kind == ND_RZ:
-            parameter = self.code_gen(node.left, quantumcircuit)
-            qubit = self.code_gen(node.right, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_with_parameter("rz", qubit_name, parameter, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_with_parameter("rz", qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        # RTHETA gate
-        elif node.kind == ND_RTHETA:
-            parameter = self.code_gen(node.left, quantumcircuit)
-            qubit = self.code_gen(node.right, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_with_parameter("rtheta", qubit_name, parameter, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_with_parameter("rtheta", qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        # U gate
-        elif node.kind == ND_U:
-            parameter = self.code_gen(node.left, quantumcircuit)
-            qubit = self.code_gen(node.right, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_with_parameter("u", qubit_name, parameter, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_with_parameter("u", qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        # U1 gate
-        elif node.kind == ND_U1:
-            parameter = [0, 0]
-            parameter.extend(self.code_gen(node.left, quantumcircuit))
-            qubit = self.code_gen(node.right, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_with_parameter("u", qubit_name, parameter, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_with_parameter("u", qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        
-        # U2 gate
-        elif node.kind == ND_U2:
-            parameter = [math.pi/2]
-            parameter.extend(self.code_gen(node.left, quantumcircuit))
-            qubit = self.code_gen(node.right, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_with_parameter("u", qubit_name, parameter, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_with_parameter("u", qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        
-        # Sdg gate
-        elif node.kind == ND_SDG:
-            parameter = [0, 0, -math.pi/2]
-            qubit = self.code_gen(node.left, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_with_parameter("u", qubit_name, parameter, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_with_parameter("u", qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        
-        # Tdg gate
-        elif node.kind == ND_TDG:
-            parameter = [0, 0, -math.pi/4]
-            qubit = self.code_gen(node.left, quantumcircuit)
-            qubit_name = qubit[0][0]
-            qubit_idx = qubit[0][1]
-            # If the qubit is not indexed and the size of qreg is not 1, loop through all the qubits
-            if qubit_idx == -1:
-                if self.qregs[qubit_name] != 1:
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qubit_name]):
-                        quantumcircuit.add_single_qubit_gate_with_parameter("u", qubit_name, parameter, i, self.IF_creg, self.IF_num, self.IF)
-                    return
-            quantumcircuit.add_single_qubit_gate_with_parameter("u", qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
-        
-        # The following code is for the controlled gates without parameters
-        # CX gate
-        elif node.kind == ND_CX:
-            control_qubit = self.code_gen(node.left, quantumcircuit)
-            target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_no_parameter("cx", control_qubit, target_name, target_idx, self.IF_creg, self.IF_num, self.IF)
-        
-        # CCX gate
-        elif node.kind == ND_CCX:
-            qubits = self.code_gen(node.left, quantumcircuit)
-            control_qubit = qubits[0:2]
-            target_name = qubits[2][0]
-            target_idx = qubits[2][1]
-            quantumcircuit.add_controlled_gate_no_parameter("cx", control_qubit, target_name, target_idx, self.IF_creg, self.IF_num, self.IF)
-        # CY gate
-        elif node.kind == ND_CY:
-            control_qubit = self.code_gen(node.left, quantumcircuit)
-            target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_no_parameter("cy", control_qubit, target_name, target_idx, self.IF_creg, self.IF_num, self.IF)
-        # CZ gate
-        elif node.kind == ND_CZ:
-            control_qubit = self.code_gen(node.left, quantumcircuit)
-            target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_no_parameter("cz", control_qubit, target_name, target_idx, self.IF_creg, self.IF_num, self.IF)
-        # CS gate
-        elif node.kind == ND_CS:
-            control_qubit = self.code_gen(node.left, quantumcircuit)
-            target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_no_parameter("cs", control_qubit, target_name, target_idx, self.IF_creg, self.IF_num, self.IF)
-        # CT gate
-        elif node.kind == ND_CT:
-            control_qubit = self.code_gen(node.left, quantumcircuit)
-            target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_no_parameter("ct", control_qubit, target_name, target_idx, self.IF_creg, self.IF_num, self.IF)
-        # CH gate
-        elif node.kind == ND_CH:
-            control_qubit = self.code_gen(node.left, quantumcircuit)
-            target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_no_parameter("ch", control_qubit, target_name, target_idx, self.IF_creg, self.IF_num, self.IF)
-        
-        ## The following code is for the controlled gates with parameters
-        # CRX gate
-        elif node.kind == ND_CRX:
-            parameter = self.code_gen(node.left, quantumcircuit)
-            control_qubit, target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_with_parameter("crx", control_qubit, target_name, parameter, target_idx, self.IF_creg, self.IF_num, self.IF)
-        # CRY gate
-        elif node.kind == ND_CRY:
-            parameter = self.code_gen(node.left, quantumcircuit)
-            control_qubit, target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_with_parameter("cry", control_qubit, target_name, parameter, target_idx, self.IF_creg, self.IF_num, self.IF)
-        # CRZ gate
-        elif node.kind == ND_CRZ:
-            parameter = self.code_gen(node.left, quantumcircuit)
-            control_qubit, target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_with_parameter("crz", control_qubit, target_name, parameter, target_idx, self.IF_creg, self.IF_num, self.IF)
-        # CRTHETA gate
-        elif node.kind == ND_CRTHETA:
-            parameter = self.code_gen(node.left, quantumcircuit)
-            control_qubit, target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_with_parameter("crtheta", control_qubit, target_name, parameter, target_idx, self.IF_creg, self.IF_num, self.IF)
-        # CU gate
-        elif node.kind == ND_CU:
-            parameter = self.code_gen(node.left, quantumcircuit)
-            control_qubit, target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_with_parameter("cu", control_qubit, target_name, parameter, target_idx, self.IF_creg, self.IF_num, self.IF)
-        # CU1 gate
-        elif node.kind == ND_CU1:
-            parameter = [0, 0]
-            parameter.extend(self.code_gen(node.left, quantumcircuit))
-            control_qubit, target_qubit = self.code_gen(node.right, quantumcircuit)
-            target_name = target_qubit[0][0]
-            target_idx = target_qubit[0][1]
-            quantumcircuit.add_controlled_gate_with_parameter("cu1", control_qubit, target_name, parameter, target_idx, self.IF_creg, self.IF_num, self.IF)
-            
-        ## The following code is for the gate definition
-        # Gate definition without parameters
-        elif node.kind == ND_GATE_NOEXP:
-            gate_name = node.str
-            arguments = self.code_gen(node.left, quantumcircuit)
-            # Update the values of the arguments of this gate to the corresponding keys
-            i = 0
-            for arg in self.gates[gate_name].args:
-                self.gates[gate_name].args[arg] = arguments[i]
-                i += 1
-            # Generate the circuit for the contents of the gate declared
-            Gate_def_name_original = self.GATE_DEF_name
-            Gate_def_flag_original = self.GATE_define
-            self.GATE_define = True
-            self.GATE_DEF_name = gate_name
-            for i in range(len(self.gates[gate_name].contents)):
-                self.code_gen(self.gates[gate_name].contents[i], quantumcircuit)
-            self.GATE_define = Gate_def_flag_original
-            self.GATE_DEF_name = Gate_def_name_original
-            return
-        
-        # Gate definition with parameters
-        elif node.kind == ND_GATE_EXP:
-            gate_name = node.str
-            explist = self.code_gen(node.left, quantumcircuit)
+        handler, data = Parser.CODE_GEN_TABLE[node.kind]
+        return handler(self, node, quantumcircuit, data)
+    
+    # return the constant of the node, which is the pi for now
+    def code_gen_constant(self, node, quantumcircuit, value):
+        return value
+    
+    # qubits added to circuit if ND_QREG_DEC is encountered
+    def code_gen_qreg_dec(self, node, quantumcircuit, data):
+        qubit_name = node.str
+        size = self.qregs[qubit_name]
+        quantumcircuit.add_qubit(qubit_name, size)
+        quantumcircuit.add_qubit_max_time_slice(qubit_name, 0, size)
+    
+    # classical bits added to circuit if ND_CREG_DEC is encountered
+    def code_gen_creg_dec(self, node, quantumcircuit, data):
+        cbit_name = node.str
+        size = self.cregs[cbit_name]
+        quantumcircuit.add_creg(cbit_name, size)
+    
+    # the control and target qubits will be returned for both argument and idlist
+    def code_gen_qreg(self, node, quantumcircuit, data):
+        # The qregs inside the gate bodies are compiled into the templates instead
+        if node.controlled_with_parameter:
+            target_qreg = self.code_gen(node.left, quantumcircuit)
+            return node.qregs, target_qreg
+        else:
+            return node.qregs
+    
+    # creg node
+    def code_gen_creg(self, node, quantumcircuit, data):
+        return node.cregs
+    
+    # the gate and opaque declare nodes are skipped
+    def code_gen_skip(self, node, quantumcircuit, data):
+        return
+    
+    # Generate the parameters based on explist of Explist node
+    def code_gen_explist(self, node, quantumcircuit, data):
+        params = []
+        for i in range(len(node.exps)):
+            params.append(self.code_gen(node.exps[i], quantumcircuit))
+        return params
+    
+    # The single qubit gates without parameters, where gate is the name of the gate in the circuit
+    def code_gen_single_no_parameter(self, node, quantumcircuit, gate):
+        qubit = self.code_gen(node.left, quantumcircuit)
+        qubit_name = qubit[0][0]
+        qubit_idx = qubit[0][1]
+        # If the qubit is not indexed and the size of qreg is not 1, apply the gate to all the qubits
+        if qubit_idx == -1:
+            if self.qregs[qubit_name] != 1:
+                quantumcircuit.add_single_qubit_gate_register(gate, qubit_name, None, self.IF_creg, self.IF_num, self.IF)
+                return
+        quantumcircuit.add_single_qubit_gate_no_parameter(gate, qubit_name, qubit_idx, self.IF_creg, self.IF_num, self.IF)
+    
+    # The single qubit gates with parameters, data is the name of the gate in the circuit and the parameters put before the explist,
+    # e.g. U1(lambda) is generated as U(0, 0, lambda)
+    def code_gen_single_with_parameter(self, node, quantumcircuit, data):
+        gate, prefix = data
+        parameter = self.code_gen(node.left, quantumcircuit)
+        if prefix:
+            parameter = list(prefix) + parameter
+        self.add_single_with_parameter(gate, self.code_gen(node.right, quantumcircuit), parameter, quantumcircuit)
+    
+    # The single qubit gates with the fixed parameters, e.g. Sdg is generated as U(0, 0, -pi/2)
+    def code_gen_single_fixed_parameter(self, node, quantumcircuit, data):
+        gate, parameter = data
+        self.add_single_with_parameter(gate, self.code_gen(node.left, quantumcircuit), list(parameter), quantumcircuit)
+    
+    def add_single_with_parameter(self, gate, qubit, parameter, quantumcircuit):
+        qubit_name = qubit[0][0]
+        qubit_idx = qubit[0][1]
+        # If the qubit is not indexed and the size of qreg is not 1, apply the gate to all the qubits
+        if qubit_idx == -1:
+            if self.qregs[qubit_name] != 1:
+                quantumcircuit.add_single_qubit_gate_register(gate, qubit_name, parameter, self.IF_creg, self.IF_num, self.IF)
+                return
+        quantumcircuit.add_single_qubit_gate_with_parameter(gate, qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
+    
+    # The controlled gates without parameters
+    def code_gen_controlled_no_parameter(self, node, quantumcircuit, gate):
+        control_qubit = self.code_gen(node.left, quantumcircuit)
+        target_qubit = self.code_gen(node.right, quantumcircuit)
+        target_name = target_qubit[0][0]
+        target_idx = target_qubit[0][1]
+        quantumcircuit.add_controlled_gate_no_parameter(gate, control_qubit, target_name, target_idx, self.IF_creg, self.IF_num, self.IF)
+    
+    # CCX gate, where all the qubits are in one idlist
+    def code_gen_ccx(self, node, quantumcircuit, gate):
+        qubits = self.code_gen(node.left, quantumcircuit)
+        control_qubit = qubits[0:2]
+        target_name = qubits[2][0]
+        target_idx = qubits[2][1]
+        quantumcircuit.add_controlled_gate_no_parameter(gate, control_qubit, target_name, target_idx, self.IF_creg, self.IF_num, self.IF)
+    
+    # The controlled gates with parameters, data is the same as the one of the single qubit gates with parameters
+    def code_gen_controlled_with_parameter(self, node, quantumcircuit, data):
+        gate, prefix = data
+        parameter = self.code_gen(node.left, quantumcircuit)
+        if prefix:
+            parameter = list(prefix) + parameter
+        control_qubit, target_qubit = self.code_gen(node.right, quantumcircuit)
+        target_name = target_qubit[0][0]
+        target_idx = target_qubit[0][1]
+        quantumcircuit.add_controlled_gate_with_parameter(gate, control_qubit, target_name, parameter, target_idx, self.IF_creg, self.IF_num, self.IF)
+    
+    # The gates defined, with or without parameters. The body is expanded once for each tuple of parameters and replayed on the
+    # qubits of every call, unless a whole qreg is passed, as the operations inside are then broadcast over the qreg
+    def code_gen_gate(self, node, quantumcircuit, data):
+        gate_name = node.str
+        if node.kind == ND_GATE_EXP:
+            params = tuple(self.code_gen(node.left, quantumcircuit))
             arguments = self.code_gen(node.right, quantumcircuit)
-            # Update the values of the arguments of this gate to the corresponding keys
-            i = 0
-            for param in self.gates[gate_name].params:
-                self.gates[gate_name].params[param] = explist[i]
-                i += 1
-            i = 0
-            for arg in self.gates[gate_name].args:
-                self.gates[gate_name].args[arg] = arguments[i]
-                i += 1
-            # Generate the circuit for the contents of the gate declared
-            Gate_def_name_original = self.GATE_DEF_name
-            Gate_def_flag_original = self.GATE_define
-            self.GATE_define = True
-            self.GATE_DEF_name = gate_name
-            for i in range(len(self.gates[gate_name].contents)):
-                self.code_gen(self.gates[gate_name].contents[i], quantumcircuit)
-            self.GATE_define = Gate_def_flag_original
-            self.GATE_DEF_name = Gate_def_name_original
-            return
-        
-        ## The following code is for the opaque definition
-        # Gate definition without parameters
-        elif node.kind == ND_OPAQUE_NOEXP:
-            opaque_name = node.str
+        else:
+            # A gate with parameters called without them uses the initial values of the parameters
+            params = tuple(self.gates[gate_name].params.values())
             arguments = self.code_gen(node.left, quantumcircuit)
-            # call the function to add the opaque gate to the quantum circuit\
-            quantumcircuit.add_opaque(opaque_name, arguments, [], self.IF_creg, self.IF_num, self.IF)
+        for argument in arguments:
+            if argument[1] == -1:
+                self.instantiate_gate(gate_name, params, arguments, quantumcircuit)
+                return
+        # The symbolic parameters are compared by their identity, so the expansions with them would never be used again
+        if any(isinstance(param, Symbolic_parameter) for param in params):
+            self.instantiate_gate(gate_name, params, arguments, quantumcircuit)
             return
-        
-        # Gate definition with parameters
-        elif node.kind == ND_OPAQUE_EXP:
-            opaque_name = node.str
+        key = (gate_name, params)
+        expansion = self.gate_expansions.get(key)
+        if expansion is None:
+            expansion = Gate_expansion()
+            # The formal arguments are bound to their positions, which never have the index -1
+            self.instantiate_gate(gate_name, params, [(i, None) for i in range(len(arguments))], expansion)
+            self.gate_expansions[key] = expansion
+            if len(self.gate_expansions) > Parser.Max_gate_expansions:
+                self.gate_expansions.popitem(last=False)
+        else:
+            self.gate_expansions.move_to_end(key)
+        self.replay_expansion(expansion, arguments, quantumcircuit)
+    
+    # Add the operations of the template of a gate to the circuit with the values of the parameters and the actual qubits
+    # The gates called inside are expanded in place with an explicit stack of (operations left, parameters, arguments) for each
+    # gate being expanded, so the depth of the nesting of the gates is not limited by the recursion limit
+    def instantiate_gate(self, gate_name, params, arguments, quantumcircuit):
+        stack = [(iter(self.gate_template(gate_name)), params, arguments)]
+        while stack:
+            ops, params, arguments = stack[-1]
+            for op, name, target, qubits, parameter in ops:
+                if parameter is not None:
+                    parameter = parameter(params)
+                if op == OP_SINGLE_NO_PARAMETER or op == OP_SINGLE_WITH_PARAMETER:
+                    qubit_name, qubit_idx = arguments[target]
+                    # If the qubit is not indexed and the size of qreg is not 1, apply the gate to all the qubits
+                    if qubit_idx == -1 and self.qregs[qubit_name] != 1:
+                        quantumcircuit.add_single_qubit_gate_register(name, qubit_name, parameter, self.IF_creg, self.IF_num, self.IF)
+                    elif op == OP_SINGLE_NO_PARAMETER:
+                        quantumcircuit.add_single_qubit_gate_no_parameter(name, qubit_name, qubit_idx, self.IF_creg, self.IF_num, self.IF)
+                    else:
+                        quantumcircuit.add_single_qubit_gate_with_parameter(name, qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
+                elif op == OP_CONTROLLED_NO_PARAMETER:
+                    target_name, target_idx = arguments[target]
+                    control_qubit = [arguments[qubit] for qubit in qubits]
+                    quantumcircuit.add_controlled_gate_no_parameter(name, control_qubit, target_name, target_idx, self.IF_creg, self.IF_num, self.IF)
+                elif op == OP_CONTROLLED_WITH_PARAMETER:
+                    target_name, target_idx = arguments[target]
+                    control_qubit = [arguments[qubit] for qubit in qubits]
+                    quantumcircuit.add_controlled_gate_with_parameter(name, control_qubit, target_name, parameter, target_idx, self.IF_creg, self.IF_num, self.IF)
+                elif op == OP_OPAQUE:
+                    quantumcircuit.add_opaque(name, [arguments[qubit] for qubit in qubits], parameter if parameter is not None else [], self.IF_creg, self.IF_num, self.IF)
+                else:
+                    if parameter is None:
+                        parameter = tuple(self.gates[name].params.values())
+                    # Expand the gate called before the rest of the operations of this gate
+                    stack.append((iter(self.gate_template(name)), parameter, [arguments[qubit] for qubit in qubits]))
+                    break
+            else:
+                stack.pop()
+    
+    # Lower the body of a gate into its template, a list of (op kind, gate name, target, qubits, parameter) where the target and
+    # qubits are the positions of the formal arguments, and parameter is None or the function evaluating the expressions of the
+    # operation from the values of the formal parameters. The body is compiled when the gate is first called, and the templates
+    # are kept by the parser since the Gate objects are pickled into the cache
+    def gate_template(self, gate_name):
+        template = self.gate_templates.get(gate_name)
+        if template is None:
+            gate = self.gates[gate_name]
+            args = {arg: i for i, arg in enumerate(gate.args)}
+            params = {param: i for i, param in enumerate(gate.params)}
+            # The id gates in the body are None
+            template = [Parser.compile_content(node, args, params) for node in gate.contents if node is not None]
+            self.gate_templates[gate_name] = template
+        return template
+    
+    # Compile an operation of a gate body, the kinds of the operations are found from the handlers of CODE_GEN_TABLE
+    @staticmethod
+    def compile_content(node, args, params):
+        handler, data = Parser.CODE_GEN_TABLE[node.kind]
+        if handler is Parser.code_gen_single_no_parameter:
+            return (OP_SINGLE_NO_PARAMETER, data, args[node.left.qregs[0][0]], None, None)
+        if handler is Parser.code_gen_single_with_parameter:
+            gate, prefix = data
+            return (OP_SINGLE_WITH_PARAMETER, gate, args[node.right.qregs[0][0]], None, Parser.compile_explist(node.left, params, prefix))
+        if handler is Parser.code_gen_single_fixed_parameter:
+            gate, parameter = data
+            return (OP_SINGLE_WITH_PARAMETER, gate, args[node.left.qregs[0][0]], None, lambda values: list(parameter))
+        if handler is Parser.code_gen_controlled_no_parameter:
+            controls = [args[qreg[0]] for qreg in node.left.qregs]
+            return (OP_CONTROLLED_NO_PARAMETER, data, args[node.right.qregs[0][0]], controls, None)
+        if handler is Parser.code_gen_ccx:
+            qregs = node.left.qregs
+            return (OP_CONTROLLED_NO_PARAMETER, data, args[qregs[2][0]], [args[qreg[0]] for qreg in qregs[0:2]], None)
+        if handler is Parser.code_gen_controlled_with_parameter:
+            gate, prefix = data
+            # The control qubits are in the right node, and the target qubit is in the left node of it
+            controls = [args[qreg[0]] for qreg in node.right.qregs]
+            return (OP_CONTROLLED_WITH_PARAMETER, gate, args[node.right.left.qregs[0][0]], controls, Parser.compile_explist(node.left, params, prefix))
+        # The gates and opaques called in the body
+        op = OP_GATE if handler is Parser.code_gen_gate else OP_OPAQUE
+        if node.kind == ND_GATE_EXP or node.kind == ND_OPAQUE_EXP:
+            return (op, node.str, None, [args[qreg[0]] for qreg in node.right.qregs], Parser.compile_explist(node.left, params, ()))
+        return (op, node.str, None, [args[qreg[0]] for qreg in node.left.qregs], None)
+    
+    # Compile an explist into the function giving the list of the values, with the constant parameters put before them
+    @staticmethod
+    def compile_explist(node, params, prefix):
+        exps = [Parser.compile_exp(exp, params) for exp in node.exps]
+        if prefix:
+            prefix = list(prefix)
+            return lambda values: prefix + [exp(values) for exp in exps]
+        return lambda values: [exp(values) for exp in exps]
+    
+    # Compile an expression into the function evaluating it from the values of the formal parameters
+    @staticmethod
+    def compile_exp(node, params):
+        if node.kind == ND_NUM:
+            value = node.val
+            return lambda values: value
+        if node.kind == ND_IDENT:
+            i = params[node.str]
+            return lambda values: values[i]
+        handler, data = Parser.CODE_GEN_TABLE[node.kind]
+        if handler is Parser.code_gen_constant:
+            return lambda values: data
+        if handler is Parser.code_gen_unaryop:
+            operand = Parser.compile_exp(node.left, params)
+            return lambda values: Parser.unaryop(data, operand(values))
+        lhs = Parser.compile_exp(node.left, params)
+        rhs = Parser.compile_exp(node.right, params)
+        return lambda values: data(lhs(values), rhs(values))
+    
+    # Add the operations of an expansion to the circuit with the actual qubits, the circuit could be the expansion of another gate
+    def replay_expansion(self, expansion, arguments, quantumcircuit):
+        for op, gate_name, target, controls, parameter in expansion.ops:
+            if op == OP_SINGLE_NO_PARAMETER:
+                qubit_name, qubit_idx = arguments[target]
+                quantumcircuit.add_single_qubit_gate_no_parameter(gate_name, qubit_name, qubit_idx, self.IF_creg, self.IF_num, self.IF)
+            elif op == OP_SINGLE_WITH_PARAMETER:
+                qubit_name, qubit_idx = arguments[target]
+                quantumcircuit.add_single_qubit_gate_with_parameter(gate_name, qubit_name, parameter, qubit_idx, self.IF_creg, self.IF_num, self.IF)
+            elif op == OP_CONTROLLED_NO_PARAMETER:
+                target_name, target_idx = arguments[target]
+                control_qubit = [arguments[control] for control in controls]
+                quantumcircuit.add_controlled_gate_no_parameter(gate_name, control_qubit, target_name, target_idx, self.IF_creg, self.IF_num, self.IF)
+            elif op == OP_CONTROLLED_WITH_PARAMETER:
+                target_name, target_idx = arguments[target]
+                control_qubit = [arguments[control] for control in controls]
+                quantumcircuit.add_controlled_gate_with_parameter(gate_name, control_qubit, target_name, parameter, target_idx, self.IF_creg, self.IF_num, self.IF)
+            else:
+                qubits = [arguments[qubit] for qubit in controls]
+                quantumcircuit.add_opaque(gate_name, qubits, parameter, self.IF_creg, self.IF_num, self.IF)
+    
+    # The opaques, with or without parameters
+    def code_gen_opaque(self, node, quantumcircuit, data):
+        opaque_name = node.str
+        if node.kind == ND_OPAQUE_EXP:
             explist = self.code_gen(node.left, quantumcircuit)
             arguments = self.code_gen(node.right, quantumcircuit)
-            # call the function to add the opaque gate to the quantum circuit
-            quantumcircuit.add_opaque(opaque_name, arguments, explist, self.IF_creg, self.IF_num, self.IF)
-            return
-        
-        ## The following code is for the measurement
-        elif node.kind == ND_MEASURE:
-            qregs = self.code_gen(node.left, quantumcircuit)
-            cregs = self.code_gen(node.right, quantumcircuit)
-            # Check whether the all the indexes of the qregs are mapped to the cregs
-            if qregs[0][1] == -1 and cregs[0][1] == -1:
-                if self.qregs[qregs[0][0]] != 1:
-                    # Locally store the name of the qreg and creg
-                    qreg_name = qregs[0][0]
-                    creg_name = cregs[0][0]
-                    # Remove the current element of qregs and cregs list
-                    qregs.pop()
-                    cregs.pop()
-                    # loop through all the qubits 
-                    for i in range(self.qregs[qreg_name]):
-                        qregs.append((qreg_name, i))
-                        cregs.append((creg_name, i))
-            # Add the measurement to the quantum circuit
-            quantumcircuit.add_measurement(qregs, cregs, self.IF_creg, self.IF_num, self.IF)
+        else:
+            explist = []
+            arguments = self.code_gen(node.left, quantumcircuit)
+        # call the function to add the opaque gate to the quantum circuit
+        quantumcircuit.add_opaque(opaque_name, arguments, explist, self.IF_creg, self.IF_num, self.IF)
+    
+    ## The following code is for the measurement
+    def code_gen_measure(self, node, quantumcircuit, data):
+        qregs = self.code_gen(node.left, quantumcircuit)
+        cregs = self.code_gen(node.right, quantumcircuit)
+        # Check whether the all the indexes of the qregs are mapped to the cregs
+        if qregs[0][1] == -1 and cregs[0][1] == -1:
+            if self.qregs[qregs[0][0]] != 1:
+                # Measure all the qubits of the qreg into the creg
+                quantumcircuit.add_measurement_register(qregs[0][0], cregs[0][0], self.IF_creg, self.IF_num, self.IF)
+                return
+        # Add the measurement to the quantum circuit
+        quantumcircuit.add_measurement(qregs, cregs, self.IF_creg, self.IF_num, self.IF)
+    
+    ## The following code is for the reset 
+    def code_gen_reset(self, node, quantumcircuit, data):
+        qregs = self.code_gen(node.left, quantumcircuit)
+        # Check whether the qreg is not indexed and the size of the qreg is not 1, if so, reset all the qubits
+        if qregs[0][1] == -1 and self.qregs[qregs[0][0]] != 1:
+            quantumcircuit.add_reset_register(qregs[0][0], self.IF_creg, self.IF_num, self.IF)
             return
-        
-        ## The following code is for the reset 
-        elif node.kind == ND_RESET:
-            qregs = self.code_gen(node.left, quantumcircuit)
-            # Check whether the qreg is not indexed and the size of the qreg is not 1, if so, reset all the qubits
-            if qregs[0][1] == -1 and self.qregs[qregs[0][0]] != 1:
-                # Locally store the name of the qreg
-                qreg_name = qregs[0][0]
-                # Remove the current element of qregs list
-                qregs.pop()
+        # Add the reset to the quantum circuit
+        quantumcircuit.add_reset(qregs, self.IF_creg, self.IF_num, self.IF)
+    
+    ## The following code is for the barrier
+    def code_gen_barrier(self, node, quantumcircuit, data):
+        qregs = self.code_gen(node.left, quantumcircuit)
+        # Check whether the qreg is not indexed and the size of the qreg is not 1, if so, reset all the qubits
+        length = len(qregs)
+        for i in range(length):
+            if qregs[i][1] == -1 and self.qregs[qregs[i][0]] != 1:
+                qreg_name = qregs[i][0]
+                qregs[i] = (qreg_name, 0)
                 # loop through all the qubits 
-                for i in range(self.qregs[qreg_name]):
-                    qregs.append((qreg_name, i))
-            # Add the reset to the quantum circuit
-            quantumcircuit.add_reset(qregs, self.IF_creg, self.IF_num, self.IF)
-            return
-        
-        ## The following code is for the barrier
-        elif node.kind == ND_BARRIER:
-            qregs = self.code_gen(node.left, quantumcircuit)
-            # Check whether the qreg is not indexed and the size of the qreg is not 1, if so, reset all the qubits
-            length = len(qregs)
-            for i in range(length):
-                if qregs[i][1] == -1 and self.qregs[qregs[i][0]] != 1:
-                    qreg_name = qregs[i][0]
-                    qregs[i] = (qreg_name, 0)
-                    # loop through all the qubits 
-                    for j in range(1, self.qregs[qreg_name]):
-                        qregs.append((qreg_name, j))
-            # Add the barrier to the quantum circuit
-            quantumcircuit.add_barrier(qregs)
-            return
-        
-        ## The following code is for the if
-        elif node.kind == ND_IF:
-            self.IF = True
-            condition_creg, condition_num = self.code_gen(node.left, quantumcircuit)
-            self.IF_creg = condition_creg[0]
-            self.IF_num = condition_num
-            self.code_gen(node.right, quantumcircuit)
-            self.IF = False
-            return
-        
-        ## The following part is for Unary operations
-        # sin
-        elif node.kind == ND_SIN:
-            exp = self.code_gen(node.left, quantumcircuit)
-            return math.sin(exp)
-        
-        # cos
-        elif node.kind == ND_COS:
-            exp = self.code_gen(node.left, quantumcircuit)
-            return math.cos(exp)
-        
-        # tan
-        elif node.kind == ND_TAN:
-            exp = self.code_gen(node.left, quantumcircuit)
-            return math.tan(exp)
-        
-        # exp
-        elif node.kind == ND_EXP:
-            exp = self.code_gen(node.left, quantumcircuit)
-            return math.exp(exp)
-        
-        # ln
-        elif node.kind == ND_LN:
-            exp = self.code_gen(node.left, quantumcircuit)
-            return math.log(exp)
-        
-        # sqrt
-        elif node.kind == ND_SQRT:
-            exp = self.code_gen(node.left, quantumcircuit)
-            return math.sqrt(exp)
-        
-        ## The following part is for binary operations
+                for j in range(1, self.qregs[qreg_name]):
+                    qregs.append((qreg_name, j))
+        # Add the barrier to the quantum circuit
+        quantumcircuit.add_barrier(qregs)
+    
+    ## The following code is for the if
+    def code_gen_if(self, node, quantumcircuit, data):
+        self.IF = True
+        condition_creg, condition_num = self.code_gen(node.left, quantumcircuit)
+        self.IF_creg = condition_creg[0]
+        self.IF_num = condition_num
+        self.code_gen(node.right, quantumcircuit)
+        self.IF = False
+    
+    # The free parameters, which are only found outside the gate definitions
+    def code_gen_symbol(self, node, quantumcircuit, data):
+        return Symbolic_parameter.free(node.str)
+    
+    ## The unary operations, where function is the math function applied
+    def code_gen_unaryop(self, node, quantumcircuit, function):
+        return Parser.unaryop(function, self.code_gen(node.left, quantumcircuit))
+    
+    # Apply a math function, which is kept in the expression if the value is symbolic
+    # The binary operations need no check, as the operators are defined for the symbolic parameters
+    @staticmethod
+    def unaryop(function, value):
+        try:
+            return function(value)
+        except TypeError:
+            if not isinstance(value, Symbolic_parameter):
+                raise
+            return Symbolic_parameter.apply(function, value)
+    
+    ## The binary operations, where function is the operator applied to the values of both sides
+    def code_gen_binaryop(self, node, quantumcircuit, function):
+        # first get the value of the left hand side
+        lhs = self.code_gen(node.left, quantumcircuit)
+        # then get the value of the right hand side
+        rhs = self.code_gen(node.right, quantumcircuit)
+        return function(lhs, rhs)
+    
+    # The handlers of the nodes by the node kind, with the structure kind: (handler, data passed to the handler)
+    CODE_GEN_TABLE = {
+        # return math.pi
+        ND_PI: (code_gen_constant, 3.14),
+        ND_IDENT: (code_gen_symbol, None),
+        ND_QREG_DEC: (code_gen_qreg_dec, None),
+        ND_CREG_DEC: (code_gen_creg_dec, None),
+        ND_QREG: (code_gen_qreg, None),
+        ND_CREG: (code_gen_creg, None),
+        ND_GATE_DEC: (code_gen_skip, None),
+        ND_OPAQUE: (code_gen_skip, None),
+        ND_EXP_LIST: (code_gen_explist, None),
+        ND_X: (code_gen_single_no_parameter, "x"),
+        ND_Y: (code_gen_single_no_parameter, "y"),
+        ND_Z: (code_gen_single_no_parameter, "z"),
+        ND_S: (code_gen_single_no_parameter, "s"),
+        ND_T: (code_gen_single_no_parameter, "t"),
+        ND_H: (code_gen_single_no_parameter, "h"),
+        ND_RX: (code_gen_single_with_parameter, ("rx", ())),
+        ND_RY: (code_gen_single_with_parameter, ("ry", ())),
+        ND_RZ: (code_gen_single_with_parameter, ("rz", ())),
+        ND_RTHETA: (code_gen_single_with_parameter, ("rtheta", ())),
+        ND_U: (code_gen_single_with_parameter, ("u", ())),
+        ND_U1: (code_gen_single_with_parameter, ("u", (0, 0))),
+        ND_U2: (code_gen_single_with_parameter, ("u", (math.pi/2,))),
+        ND_SDG: (code_gen_single_fixed_parameter, ("u", (0, 0, -math.pi/2))),
+        ND_TDG: (code_gen_single_fixed_parameter, ("u", (0, 0, -math.pi/4))),
+        ND_CX: (code_gen_controlled_no_parameter, "cx"),
+        ND_CY: (code_gen_controlled_no_parameter, "cy"),
+        ND_CZ: (code_gen_controlled_no_parameter, "cz"),
+        ND_CS: (code_gen_controlled_no_parameter, "cs"),
+        ND_CT: (code_gen_controlled_no_parameter, "ct"),
+        ND_CH: (code_gen_controlled_no_parameter, "ch"),
+        ND_CCX: (code_gen_ccx, "cx"),
+        ND_CRX: (code_gen_controlled_with_parameter, ("crx", ())),
+        ND_CRY: (code_gen_controlled_with_parameter, ("cry", ())),
+        ND_CRZ: (code_gen_controlled_with_parameter, ("crz", ())),
+        ND_CRTHETA: (code_gen_controlled_with_parameter, ("crtheta", ())),
+        ND_CU: (code_gen_controlled_with_parameter, ("cu", ())),
+        ND_CU1: (code_gen_controlled_with_parameter, ("cu1", (0, 0))),
+        ND_GATE_NOEXP: (code_gen_gate, None),
+        ND_GATE_EXP: (code_gen_gate, None),
+        ND_OPAQUE_NOEXP: (code_gen_opaque, None),
+        ND_OPAQUE_EXP: (code_gen_opaque, None),
+        ND_MEASURE: (code_gen_measure, None),
+        ND_RESET: (code_gen_reset, None),
+        ND_BARRIER: (code_gen_barrier, None),
+        ND_IF: (code_gen_if, None),
+        ND_SIN: (code_gen_unaryop, math.sin),
+        ND_COS: (code_gen_unaryop, math.cos),
+        ND_TAN: (code_gen_unaryop, math.tan),
+        ND_EXP: (code_gen_unaryop, math.exp),
+        ND_LN: (code_gen_unaryop, math.log),
+        ND_SQRT: (code_gen_unaryop, math.sqrt),
+        ND_ADD: (code_gen_binaryop, operator.add),
+        ND_SUB: (code_gen_binaryop, operator.sub),
+        ND_MUL: (code_gen_binaryop, operator.mul),
+        ND_DIV: (code_gen_binaryop, operator.truediv),
+        ND_POW: (code_gen_binaryop, operator.pow),
+        # == gives the creg and the number of the condition
+        ND_EQUAL: (code_gen_binaryop, lambda lhs, rhs: (lhs, rhs)),
+    }
+    # The forms of the native gates added with register_native_gate, with the structure form: (uop handler, code generation handler, follow)
+    NATIVE_GATE_FORMS = {
+        "single": (uop_without_explist_single, code_gen_single_no_parameter, qasm2_token.FOLLOW_SPACE),
+        "single_parameter": (uop_with_explist_single, code_gen_single_with_parameter, qasm2_token.FOLLOW_SPACE | qasm2_token.FOLLOW_PAREN),
+        "controlled": (uop_without_explist_controlled, code_gen_controlled_no_parameter, qasm2_token.FOLLOW_SPACE),
+        "controlled_parameter": (uop_with_explist_controlled, code_gen_controlled_with_parameter, qasm2_token.FOLLOW_SPACE | qasm2_token.FOLLOW_PAREN),
+    }
+    
+    # Add a native gate spelled word, which is generated as gate in the circuit. The word is added to the keyword table of the tokenizer,
+    # and the entries of UOP_TABLE and CODE_GEN_TABLE are made from the form. The gates with parameters take num_params parameters in the
+    # explist, and the parameters of prefix are put before them
+    @staticmethod
+    def register_native_gate(word, form, gate, num_params=0, prefix=()):
+        if form not in Parser.NATIVE_GATE_FORMS:
+            raise ValueError(f"Unknown form {form} of the native gate {word}")
+        uop_handler, code_gen_handler, follow = Parser.NATIVE_GATE_FORMS[form]
+        kind = Token.register_keyword(word, follow=follow)
+        node_kind = Parser.Next_node_kind
+        Parser.Next_node_kind += 1
+        name = qasm2_token.KEYWORD_NAMES[kind]
+        Parser.UOP_TABLE[kind] = (uop_handler, node_kind, name)
+        if form.endswith("_parameter"):
+            qsofinstr.timeslice.Param_Num_Table[name] = num_params
+            Parser.CODE_GEN_TABLE[node_kind] = (code_gen_handler, (gate, tuple(prefix)))
         else:
-            # first get the value of the left hand side
-            lhs = self.code_gen(node.left, quantumcircuit)
-            # then get the value of the right hand side
-            rhs = self.code_gen(node.right, quantumcircuit)
-            # add
-            if node.kind == ND_ADD:
-                return lhs + rhs
-        
-            # sub
-            if node.kind == ND_SUB:
-                return lhs - rhs
-        
-            # mul
-            if node.kind == ND_MUL:
-                return lhs * rhs
-        
-            # div
-            if node.kind == ND_DIV:
-                return lhs / rhs
-        
-            # pow
-            if node.kind == ND_POW:
-                return lhs ** rhs
-            
-            # ==
-            if node.kind == ND_EQUAL:
-                return lhs, rhs
-        
+            Parser.CODE_GEN_TABLE[node_kind] = (code_gen_handler, gate)
+        return kind
         
     ### Define the function to generate the quantum circuit
     def circuit_gen(self, quantumcircuit):
@@ -2024,16 +2093,61 @@ class Parser(Token):
     #================================================================================================
     # Compilation
     #================================================================================================
+    # Return the node of an included file, which is found through the search paths and shared by all the files including it
+    def load_include(self, file):
+        filepath = Include_resolver.resolve(file)
+        if filepath is None:
+            # The tokenizer only lets the missing qelib1.inc through, which fails here as before
+            filepath = file
+        if os.path.abspath(filepath) not in self.file_nodes:
+            self.file_nodes[os.path.abspath(filepath)] = Parser.load_file(filepath, shared=True)
+        return self.file_nodes[os.path.abspath(filepath)]
+    
+    # Tokenize a file into a node of the filesystem, the tokens are taken from the cache directory if it is enabled
+    # The entry of a shared file, which is an included file, is kept for the later compilations in this process
+    @staticmethod
+    def load_file(filepath, shared=False):
+        # The entry is shared with the earlier compilations in this process if the file is not modified since
+        file_key = Cache.file_key(filepath) if shared else None
+        cached = Cache.get_entry(file_key) if shared else None
+        if cached is not None:
+            key, entry = cached
+        elif Cache.Directory is None:
+            key = None
+            entry = Cache_entry(*Token.Tokenize(filepath))
+        else:
+            key, data, entry = Cache.load(filepath)
+            if entry is None:
+                filename, file_str, TK, include_dic = Token.Tokenize(filepath)
+                # The memory-mapped source is stored as the bytes it maps
+                entry = Cache_entry(filename, file_str if isinstance(file_str, str) else data, TK, include_dic)
+                Cache.store(key, entry)
+        if shared:
+            Cache.add_entry(file_key, key, entry)
+        file_node = Filesystem(filepath, entry.file_str, entry.token)
+        file_node.set_include_dict(entry.include_list)
+        file_node.cache_key = key
+        file_node.cache = entry
+        return file_node
+    
     @staticmethod
     def compile(filepath, quantumcircuit):
-        filename, file_str, TK, include_dic = Token.Tokenize(filepath)
-        file_node = Filesystem(filename, file_str, TK)
-        file_node.set_include_dict(include_dic)
+        if Token.Stream:
+            # The tokens are pulled from the file while parsing, and the source is only read again for the error messages
+            include_dic = []
+            TK = qasm2_token.Token_stream(Token.Tokenize_stream(filepath, include_file_list=include_dic))
+            file_node = Filesystem(filepath, qasm2_token.Lazy_source(filepath), TK)
+            file_node.set_include_dict(include_dic)
+        else:
+            file_node = Parser.load_file(filepath)
         parser = Parser(file_node)
         # Add the name for quantum circuit
         quantumcircuit.set_name(parser.get_name())
-        parser.Recursive_Descent_Parsing()
-        parser.circuit_gen(quantumcircuit)
+        if Parser.Stream_circuit:
+            parser.Recursive_Descent_Parsing(quantumcircuit)
+        else:
+            parser.Recursive_Descent_Parsing()
+            parser.circuit_gen(quantumcircuit)
         # return QC
     
 # filepath = "qsofinstr/test_instruction.qasm"
@@ -1,5 +1,12 @@
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+import mmap
+import os
+import re
 import sys
 from pathlib import Path
+from qsofinstr.IR.QASM2.qasm2_include import Include_resolver
 
 TK_OPERATOR = 0
 TK_NUM = 1
@@ -49,604 +56,1195 @@ TK_SDG = 44
 TK_TDG = 45
 TK_CCX = 46
 TK_CU1 = 47
+# The largest kind stored in the kind array of Token_buffer
+MAX_KIND = 0xFFFF
+
+# The characters for which str.isspace() is true in the ASCII range
+WHITESPACE = "\\t\\n\\x0b\\x0c\\r\\x1c-\\x1f "
+
+# The alternatives of the master pattern, the order follows the order of the checks in Tokenize_step
+MASTER_SPACE = r"(?P<space>[" + WHITESPACE + r"]+)"
+MASTER_COMMENT = r"(?P<comment>//[^\n]*)"
+# Any token touching a non-ASCII character is handed to Tokenize_step, since str.isalpha() and str.isdigit() accept more than [A-Za-z0-9]
+MASTER_UNICODE = r"(?P<unicode>(?:->|==|[A-Za-z0-9_.]*(?:[eE][+-][0-9]*)?)[^\x00-\x7f])"
+# The character following a word is captured without being consumed
+MASTER_WORD = r"(?P<word>[A-Za-z_][A-Za-z0-9_]*(?=(?P<follow>.)|))"
+MASTER_NUM = r"(?P<num>(?P<mantissa>(?:[0-9]|\.[0-9])[0-9.]*)(?:[eE](?:(?P<exp>[+-]?[0-9]+)|(?P<badexp>)))?)"
+MASTER_OP = r"(?P<op>->(?=[" + WHITESPACE + r"A-Za-z])|==(?=[" + WHITESPACE + r"0-9])|[;:,{}()\[\]+\-*/^])"
+MASTER_OTHER = r"(?P<other>.)"
+MASTER_PATTERN = re.compile("|".join((MASTER_SPACE, MASTER_COMMENT, MASTER_WORD, MASTER_NUM, MASTER_OP, MASTER_OTHER)), re.S)
+MASTER_PATTERN_UNICODE = re.compile("|".join((MASTER_SPACE, MASTER_COMMENT, MASTER_UNICODE, MASTER_WORD, MASTER_NUM, MASTER_OP, MASTER_OTHER)), re.S)
+# The master pattern for the memory mapped files, which always guards against non-ASCII bytes
+MASTER_PATTERN_BYTES = re.compile(MASTER_PATTERN_UNICODE.pattern.encode(), re.S)
+# The number of characters after a match that can change it, a match closer than this to the end of a chunk waits for the next chunk
+MASTER_LOOKAHEAD = 3
+# The files smaller than this are always tokenized in one process, as starting the workers costs more than it saves
+PARALLEL_MIN_SIZE = 1 << 20
+# The number of chunks given to each worker, so that a slow chunk does not keep the other workers idle
+PARALLEL_CHUNKS_PER_WORKER = 4
+
+# The class of the character following a keyword
+FOLLOW_SPACE = 1
+FOLLOW_PAREN = 2
+FOLLOW_QUOTE = 4
+FOLLOW_OTHER = 8
+FOLLOW_ANY = FOLLOW_SPACE | FOLLOW_PAREN | FOLLOW_QUOTE | FOLLOW_OTHER
+FOLLOW_CLASS = {c: FOLLOW_SPACE for c in "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f "}
+FOLLOW_CLASS["("] = FOLLOW_PAREN
+FOLLOW_CLASS["\""] = FOLLOW_QUOTE
+# The same classes for the bytes matched in the memory mapped files
+FOLLOW_CLASS.update({c.encode(): follow for c, follow in FOLLOW_CLASS.items()})
+
+# The table of the keywords and native gates, with the structure word: (kind, str, len, follow), where str is the canonical name
+# A keyword is only emitted if the following character belongs to one of the classes in follow, otherwise the word is an identifier
+# The kind None means the statement is handed to Tokenize_step
+# New native gates are added with Token.register_keyword instead of another comparison in the tokenizer
+KEYWORDS = {
+    "include": (None, "include", 7, FOLLOW_SPACE | FOLLOW_QUOTE),
+    "pi": (TK_PI, "pi", 2, FOLLOW_ANY),
+    "sin": (TK_SIN, "sin", 3, FOLLOW_SPACE | FOLLOW_PAREN),
+    "cos": (TK_COS, "cos", 3, FOLLOW_SPACE | FOLLOW_PAREN),
+    "tan": (TK_TAN, "tan", 3, FOLLOW_SPACE | FOLLOW_PAREN),
+    "exp": (TK_EXP, "exp", 3, FOLLOW_SPACE | FOLLOW_PAREN),
+    "ln": (TK_LN, "ln", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "sqrt": (TK_SQRT, "sqrt", 4, FOLLOW_SPACE | FOLLOW_PAREN),
+    "gate": (TK_GATE, "gate", 4, FOLLOW_SPACE),
+    "measure": (TK_MEASURE, "measure", 7, FOLLOW_SPACE),
+    "if": (TK_IF, "if", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "reset": (TK_RESET, "reset", 5, FOLLOW_SPACE),
+    "barrier": (TK_BARRIER, "barrier", 7, FOLLOW_SPACE),
+    "opaque": (TK_OPAQUE, "opaque", 6, FOLLOW_SPACE),
+    "qreg": (TK_QREG, "qreg", 4, FOLLOW_SPACE),
+    "creg": (TK_CREG, "creg", 4, FOLLOW_SPACE),
+    "id": (TK_ID, "id", 2, FOLLOW_SPACE),
+    "sdg": (TK_SDG, "sdg", 3, FOLLOW_SPACE),
+    "tdg": (TK_TDG, "tdg", 3, FOLLOW_SPACE),
+    "U": (TK_U, "U", 1, FOLLOW_SPACE | FOLLOW_PAREN),
+    "u3": (TK_U, "U", 1, FOLLOW_SPACE | FOLLOW_PAREN),
+    "u1": (TK_U1, "U1", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "u2": (TK_U2, "U2", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "X": (TK_X, "X", 1, FOLLOW_SPACE),
+    "x": (TK_X, "X", 1, FOLLOW_SPACE),
+    "Y": (TK_Y, "Y", 1, FOLLOW_SPACE),
+    "y": (TK_Y, "Y", 1, FOLLOW_SPACE),
+    "Z": (TK_Z, "Z", 1, FOLLOW_SPACE),
+    "z": (TK_Z, "Z", 1, FOLLOW_SPACE),
+    "S": (TK_S, "S", 1, FOLLOW_SPACE),
+    "s": (TK_S, "S", 1, FOLLOW_SPACE),
+    "T": (TK_T, "T", 1, FOLLOW_SPACE),
+    "t": (TK_T, "T", 1, FOLLOW_SPACE),
+    "RTHETA": (TK_RTHETA, "RTHETA", 6, FOLLOW_SPACE | FOLLOW_PAREN),
+    "RX": (TK_RX, "RX", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "rx": (TK_RX, "RX", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "RY": (TK_RY, "RY", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "ry": (TK_RY, "RY", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "RZ": (TK_RZ, "RZ", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "rz": (TK_RZ, "RZ", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "H": (TK_H, "H", 1, FOLLOW_SPACE),
+    "h": (TK_H, "H", 1, FOLLOW_SPACE),
+    "CX": (TK_CX, "CX", 2, FOLLOW_SPACE),
+    "cx": (TK_CX, "CX", 2, FOLLOW_SPACE),
+    "ccx": (TK_CCX, "CCX", 3, FOLLOW_SPACE),
+    "CY": (TK_CY, "CY", 2, FOLLOW_SPACE),
+    "cy": (TK_CY, "CY", 2, FOLLOW_SPACE),
+    "CZ": (TK_CZ, "CZ", 2, FOLLOW_SPACE),
+    "cz": (TK_CZ, "CZ", 2, FOLLOW_SPACE),
+    "CU": (TK_CU, "CU", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "cu3": (TK_CU, "CU", 2, FOLLOW_SPACE | FOLLOW_PAREN),
+    "cu1": (TK_CU1, "CU1", 3, FOLLOW_SPACE | FOLLOW_PAREN),
+    "CS": (TK_CS, "CS", 2, FOLLOW_SPACE),
+    "CT": (TK_CT, "CT", 2, FOLLOW_SPACE),
+    "CRTHETA": (TK_CRTHETA, "CRTHETA", 7, FOLLOW_SPACE | FOLLOW_PAREN),
+    "CRX": (TK_CRX, "CRX", 3, FOLLOW_SPACE | FOLLOW_PAREN),
+    "CRY": (TK_CRY, "CRY", 3, FOLLOW_SPACE | FOLLOW_PAREN),
+    "CRZ": (TK_CRZ, "CRZ", 3, FOLLOW_SPACE | FOLLOW_PAREN),
+    "crz": (TK_CRZ, "CRZ", 3, FOLLOW_SPACE | FOLLOW_PAREN),
+    "CH": (TK_CH, "CH", 2, FOLLOW_SPACE),
+    "ch": (TK_CH, "CH", 2, FOLLOW_SPACE),
+}
+# The canonical name of each keyword kind, shared with the parser
+KEYWORD_NAMES = {keyword[0]: keyword[1] for keyword in KEYWORDS.values() if keyword[0] is not None}
 
 
 class Token(object):
+    # The tokenizer engine used by Tokenize, "master" for the compiled master pattern, "mmap" for the master pattern over the memory mapped file,
+    # and "legacy" for the character-by-character scanner
+    Engine = "master"
+    # Whether the files are streamed through Tokenize_stream instead of being read into one string, and the number of characters read at a time
+    Stream = False
+    Chunk_size = 1 << 16
+    # The kind given to the next keyword registered without one
+    Next_kind = TK_CU1 + 1
+    # The number of processes used by Tokenize for the large files
+    Workers = 1
+    
     def __init__(self):
         self.qasm_str = ""
-        # The element is a tuple with the structure (kind, val, exp, len, str)
+        # The element is a tuple with the structure (kind, val, exp, len, str, idx)
         # The value is represented as scientific notation, therefore needs val and exp parts
-        self.Token = []    
+        # Only the offset of the token is kept, the line and column are resolved from it when an error is annotated
+        # The tokens are stored column by column in a Token_buffer, which still gives the tuples when indexed
+        self.Token = Token_buffer()
         self.name = ""   
-        self.line_count = 1
-        self.err_line_idx = 0
         self.kind_idx = 0
         self.val_idx = 1
         self.exp_idx = 2
         self.len_idx = 3
         self.str_idx = 4
-        self.line_count_idx = 5
-        self.err_line_idx_idx = 6
-        self.idx_idx = 7
+        self.idx_idx = 5
         # The list of the files
         self.include_file_list = []
+        # The offset of qasm_str in the file, which is only nonzero for the streaming tokenizer
+        self.base = 0
+        # The source of the whole file for the error annotation if qasm_str is only part of it
+        self.source = None
         
     def file2str(self, filename0):
         # root_dir = Path(__file__).resolve().parents[2]
         # filename = root_dir / filename0
         filename = Path(filename0).resolve()
         with open(filename, 'r') as file:
-            for line in file:
-            # Add the processed line to the contents string with a space
-                self.qasm_str += line 
+            self.qasm_str += file.read()
     
     @staticmethod
     def is_alnum(c):
         return (c.isalpha() and c.islower()) or (c.isalpha() and c.isupper()) or c == "_"
     
     @staticmethod
-    def Tokenize(filename):
+    def register_keyword(word, kind=None, string=None, follow=FOLLOW_SPACE | FOLLOW_PAREN):
+        # Add a keyword to the table used by all the tokenizer engines and return its kind, a new kind is allocated if none is given
+        if kind is None:
+            kind = Token.Next_kind
+            Token.Next_kind += 1
+        if not 0 <= kind <= MAX_KIND:
+            raise ValueError(f"The kind {kind} of the keyword {word} is out of the range 0 to {MAX_KIND} of the token buffer")
+        if string is None:
+            string = word
+        KEYWORDS[word] = (kind, string, len(string), follow)
+        KEYWORD_NAMES.setdefault(kind, string)
+        return kind
+    
+    @staticmethod
+    def Tokenize(filename, engine=None, workers=None):
+        if engine is None:
+            engine = Token.Engine
+        if workers is None:
+            workers = Token.Workers
+        if engine == "master":
+            if workers > 1:
+                return Token.Tokenize_parallel(filename, workers)
+            return Token.Tokenize_master(filename)
+        if engine == "mmap":
+            return Token.Tokenize_mmap(filename)
+        if engine == "legacy":
+            return Token.Tokenize_legacy(filename)
+        raise ValueError(f"Unknown tokenizer engine {engine}")
+    
+    @staticmethod
+    def Tokenize_master(filename):
+        TK = Token()
+        TK.file2str(filename)
+        TK.name = filename
+        i = Token.scan_master(TK, 0)
+        TK.Token.append((TK_EOF, 0, 0, 0, "EOF", i))
+        return TK.name, TK.qasm_str, TK.Token, TK.include_file_list
+    
+    @staticmethod
+    def Tokenize_parallel(filename, workers):
+        # Split the file at the ; outside the comments and tokenize the chunks with the master pattern in separate processes
+        # No token continues past a ;, so the tokens of the chunks are exactly the tokens of the whole file
+        TK = Token()
+        TK.file2str(filename)
+        TK.name = filename
+        if len(TK.qasm_str) < PARALLEL_MIN_SIZE:
+            i = Token.scan_master(TK, 0)
+            TK.Token.append((TK_EOF, 0, 0, 0, "EOF", i))
+            return TK.name, TK.qasm_str, TK.Token, TK.include_file_list
+        bounds = Token.split_statements(TK.qasm_str, workers*PARALLEL_CHUNKS_PER_WORKER)
+        chunks = [TK.qasm_str[start:end] for start, end in zip(bounds, bounds[1:])]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # The results are collected in the order of the chunks, so the token list does not depend on the scheduling
+            for tokens, include_file_list in executor.map(Token.Tokenize_chunk, [filename]*len(chunks), chunks, bounds):
+                TK.Token.extend(tokens)
+                TK.include_file_list.extend(include_file_list)
+        TK.Token.append((TK_EOF, 0, 0, 0, "EOF", len(TK.qasm_str)))
+        return TK.name, TK.qasm_str, TK.Token, TK.include_file_list
+    
+    @staticmethod
+    def Tokenize_chunk(filename, chunk, base):
+        # The worker of Tokenize_parallel, the chunk starts at offset base of the file, which is read again only to annotate an error
+        TK = Token()
+        TK.name = filename
+        TK.qasm_str = chunk
+        TK.base = base
+        TK.source = Lazy_source(filename)
+        Token.scan_master(TK, 0)
+        return TK.Token, TK.include_file_list
+    
+    @staticmethod
+    def split_statements(qasm_str, parts):
+        # Return the offsets splitting qasm_str into about parts chunks, each of them ending right after a ; which is not in a comment
+        # or in the quotes of an include
+        bounds = [0]
+        for k in range(1, parts):
+            i = qasm_str.find(";", max(len(qasm_str)*k//parts, bounds[-1]))
+            while i >= 0:
+                line_start = qasm_str.rfind("\n", 0, i) + 1
+                if qasm_str.find("//", line_start, i) < 0 and qasm_str.count("\"", line_start, i) % 2 == 0:
+                    break
+                i = qasm_str.find(";", i+1)
+            if i < 0:
+                break
+            bounds.append(i+1)
+        bounds.append(len(qasm_str))
+        return bounds
+    
+    @staticmethod
+    def Tokenize_mmap(filename):
+        # Scan the bytes of the memory mapped file without copying it into a string, the indices of the tokens are byte offsets
+        # The mapping is returned in place of the string of the file, wrapped in Mapped_source for the error annotation
+        TK = Token()
+        TK.name = filename
+        with open(Path(filename).resolve(), 'rb') as file:
+            # An empty file cannot be mapped
+            if os.fstat(file.fileno()).st_size == 0:
+                TK.qasm_str = b""
+            else:
+                TK.qasm_str = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        i = Token.scan_master(TK, 0)
+        TK.Token.append((TK_EOF, 0, 0, 0, "EOF", i))
+        return TK.name, Mapped_source(TK.qasm_str), TK.Token, TK.include_file_list
+    
+    @staticmethod
+    def scan_master(TK, i, final=True):
+        # Scan TK.qasm_str from index i with the master pattern, one match per token
+        # The produced tuples are identical to the ones of Tokenize_step, which is still used for OPENQASM, include and non-ASCII input
+        # TK.base is the offset of TK.qasm_str in the file, which is nonzero when the file is streamed in chunks
+        # If final is False, the scan stops before any token that may continue past the end of TK.qasm_str and returns its index
+        # TK.qasm_str can also be the bytes of a memory mapped file, whose matches are decoded to strings
+        qasm_str = TK.qasm_str
+        qasm_len = len(qasm_str)
+        base = TK.base
+        if isinstance(qasm_str, str):
+            decode = str
+            if qasm_str.isascii():
+                match = MASTER_PATTERN.match
+            else:
+                match = MASTER_PATTERN_UNICODE.match
+        else:
+            decode = bytes.decode
+            match = MASTER_PATTERN_BYTES.match
+        if final:
+            safe_len = qasm_len
+        else:
+            safe_len = qasm_len - MASTER_LOOKAHEAD
+        append = TK.Token.append
+        while i < qasm_len:
+            m = match(qasm_str, i)
+            group = m.lastgroup
+            end = m.end()
+            if end > safe_len:
+                break
+            if group == "op":
+                op = decode(m.group("op"))
+                append((TK_OPERATOR, 0, 0, len(op), op, base+i))
+            elif group == "word":
+                word = decode(m.group("word"))
+                keyword = KEYWORDS.get(word)
+                if (keyword is not None) and (FOLLOW_CLASS.get(m.group("follow"), FOLLOW_OTHER) & keyword[3]):
+                    if keyword[0] is None:
+                        if not (final or Token.statement_complete(qasm_str, i)):
+                            break
+                        end = Token.scan_step(TK, i)
+                    else:
+                        append((keyword[0], 0, 0, keyword[2], keyword[1], base+i))
+                elif word[:2] == "pi" and word[2].isdigit():
+                    # pi is not separated from the digits following it
+                    append((TK_PI, 0, 0, 2, "pi", base+i))
+                    end = i + 2
+                elif word[:8] == "OPENQASM":
+                    if not (final or Token.statement_complete(qasm_str, i)):
+                        break
+                    end = Token.scan_step(TK, i)
+                else:
+                    append((TK_IDENT, 0, 0, end-i, word, base+i))
+            elif group == "num":
+                num = m.group("num")
+                if m.end("mantissa") == end:
+                    # The lexeme without an exponent is converted as a whole
+                    append((TK_NUM, float(num), 0.0, end-i, decode(num), base+i))
+                else:
+                    if m.group("badexp") is not None:
+                        TK.error(m.start("badexp")-1, "Invalid number")
+                    exp = m.group("exp")
+                    append((TK_NUM, float(m.group("mantissa")), float(int(exp)), end-i, decode(num), base+i))
+            elif group == "unicode":
+                if not (final or Token.statement_complete(qasm_str, i)):
+                    break
+                end = Token.scan_step(TK, i)
+            elif group == "other":
+                TK.error(i, "Invalid character, cannot Tokenize!")
+            # Whitespace and comments are skipped without emitting a token
+            i = end
+        return i
+    
+    @staticmethod
+    def statement_complete(qasm_str, i):
+        # Check whether the statement starting at index i is terminated inside qasm_str, so that Tokenize_step cannot run past its end
+        semicolon = qasm_str.find(";", i)
+        return semicolon >= 0 and semicolon + MASTER_LOOKAHEAD <= len(qasm_str)
+    
+    @staticmethod
+    def scan_step(TK, i):
+        # Hand the token at index i to Tokenize_step, whose indices are relative to TK.qasm_str
+        if not isinstance(TK.qasm_str, str):
+            return Token.scan_step_mapped(TK, i)
+        if not TK.base:
+            return Token.Tokenize_step(TK, i)
+        # The tokens are collected apart to shift their indices to the offsets in the file
+        tokens = TK.Token
+        TK.Token = []
+        i = Token.Tokenize_step(TK, i)
+        for token in TK.Token:
+            tokens.append(token[:5] + (token[5]+TK.base,))
+        TK.Token = tokens
+        return i
+    
+    @staticmethod
+    def scan_step_mapped(TK, i):
+        # Tokenize_step only works on strings, so the lines from the current one to the end of the statement are decoded,
+        # and the character indices of the tokens produced are converted back to byte offsets
+        line_start = TK.qasm_str.rfind(b"\n", 0, i) + 1
+        line_end = TK.qasm_str.find(b";", i)
+        if line_end >= 0:
+            line_end = TK.qasm_str.find(b"\n", line_end)
+        if line_end < 0:
+            line_end = len(TK.qasm_str)
+        line_str = TK.qasm_str[line_start:line_end].decode()
+        step_TK = Token()
+        step_TK.name = TK.name
+        step_TK.qasm_str = line_str
+        step_TK.base = line_start
+        step_TK.source = Mapped_source(TK.qasm_str)
+        i = Token.Tokenize_step(step_TK, len(TK.qasm_str[line_start:i].decode()))
+        for token in step_TK.Token:
+            TK.Token.append(token[:5] + (line_start + len(line_str[:token[5]].encode()),))
+        TK.include_file_list.extend(step_TK.include_file_list)
+        return line_start + len(line_str[:i].encode())
+    
+    @staticmethod
+    def Tokenize_stream(filename, chunk_size=None, include_file_list=None):
+        # Generator version of Tokenize_master, which reads the file in chunks of chunk_size characters and yields the tokens one by one
+        # The buffer always starts at the next token to scan, the errors are annotated on the file which is read again for them,
+        # the memory used is therefore bounded by the chunk size plus the length of the longest statement
+        if chunk_size is None:
+            chunk_size = Token.Chunk_size
+        TK = Token()
+        TK.name = filename
+        TK.Token = []
+        TK.source = Lazy_source(filename)
+        # The include files are added to include_file_list as soon as they are scanned
+        if include_file_list is not None:
+            TK.include_file_list = include_file_list
+        i = 0
+        with open(Path(filename).resolve(), 'r') as file:
+            final = False
+            while not final:
+                chunk = file.read(chunk_size)
+                final = not chunk
+                # Drop the part that has been completely scanned
+                TK.qasm_str = TK.qasm_str[i:] + chunk
+                TK.base += i
+                i = Token.scan_master(TK, 0, final)
+                tokens = TK.Token
+                TK.Token = []
+                yield from tokens
+        yield (TK_EOF, 0, 0, 0, "EOF", TK.base+i)
+    
+    @staticmethod
+    def Tokenize_legacy(filename):
+        # The character-by-character scanner, kept as the reference engine
         TK = Token()
         TK.file2str(filename)
         TK.name = filename
         i = 0
         while i < len(TK.qasm_str):
-            # Skip whitespace
-            if TK.qasm_str[i].isspace() or TK.qasm_str[i] == "\t" or TK.qasm_str[i] == "\n":
-                if TK.qasm_str[i] == "\n":
-                    TK.line_count += 1
-                    TK.err_line_idx = i+1
+            i = Token.Tokenize_step(TK, i)
+        TK.Token.append((TK_EOF, 0, 0, 0, "EOF", i))
+        return TK.name, TK.qasm_str, TK.Token, TK.include_file_list
+    
+    @staticmethod
+    def Tokenize_step(TK, i):
+        # Scan a single token of TK.qasm_str starting from index i and return the index to continue from
+        # Skip whitespace
+        if TK.qasm_str[i].isspace() or TK.qasm_str[i] == "\t" or TK.qasm_str[i] == "\n":
+            i += 1
+            return i
+        # Check for a comment
+        if TK.qasm_str[i] == "/":
+            if TK.qasm_str[i+1] == "/":
+                i += 2
+                while (i < len(TK.qasm_str)) and TK.qasm_str[i] != "\n":
+                    i += 1
+                return i
+        # Get rid of OPENQASM 2.0
+        if TK.qasm_str[i]=="O" and TK.qasm_str[i+1]=="P" and TK.qasm_str[i+2]=="E" and TK.qasm_str[i+3]=="N" and TK.qasm_str[i+4]=="Q" and TK.qasm_str[i+5]=="A" and TK.qasm_str[i+6]=="S" and TK.qasm_str[i+7]=="M":
+            # Skip the spaces to find 2.0
+            i += 8
+            while (i < len(TK.qasm_str)) and TK.qasm_str[i].isspace():
                 i += 1
-                continue
-            # Check for a comment
-            if TK.qasm_str[i] == "/":
-                if TK.qasm_str[i+1] == "/":
-                    i += 2
-                    while (i < len(TK.qasm_str)) and TK.qasm_str[i] != "\n":
-                        i += 1
-                    continue
-            # Get rid of OPENQASM 2.0
-            if TK.qasm_str[i]=="O" and TK.qasm_str[i+1]=="P" and TK.qasm_str[i+2]=="E" and TK.qasm_str[i+3]=="N" and TK.qasm_str[i+4]=="Q" and TK.qasm_str[i+5]=="A" and TK.qasm_str[i+6]=="S" and TK.qasm_str[i+7]=="M":
-                # Skip the spaces to find 2.0
-                i += 8
-                while (i < len(TK.qasm_str)) and TK.qasm_str[i].isspace():
+            # Check for 2.0
+            if len(TK.qasm_str) - i < 2:
+                TK.error(i, "The version of OpenQASM should be 2.0")
+            if (TK.qasm_str[i] != "2") and (TK.qasm_str[i+1] != ".") and (TK.qasm_str[i+2] != "0"):
+                TK.error(i, "The version of OpenQASM should be 2.0")
+            i += 2
+            # Check for missing ; if the current token index is at the end of the file
+            if i == len(TK.qasm_str)-1:
+                TK.error(i, "Expect ;")
+            # Skip the spaces to find ;
+            i += 1
+            while (i < len(TK.qasm_str)) and TK.qasm_str[i].isspace():
+                i += 1
+            # Check for ;
+            if TK.qasm_str[i] != ";":
+                TK.error(i, "Expect ;")
+            i += 1
+            return i
+            
+        # Check for include files
+        if TK.qasm_str[i]=="i"and TK.qasm_str[i+1]=="n"and TK.qasm_str[i+2]=="c"and TK.qasm_str[i+3]=="l"and TK.qasm_str[i+4]=="u"and TK.qasm_str[i+5]=="d"and TK.qasm_str[i+6]=="e":
+            if TK.qasm_str[i+7].isspace() or TK.qasm_str[i+7]=="\"":
+                i += 7
+                # Skip whitespaces
+                while (i < len(TK.qasm_str)) and (TK.qasm_str[i].isspace()):
                     i += 1
-                # Check for 2.0
-                if len(TK.qasm_str) - i < 2:
-                    TK.annotate_error(TK.name, TK.qasm_str, i, "The version of OpenQASM should be 2.0", TK.line_count, TK.err_line_idx)
-                if (TK.qasm_str[i] != "2") and (TK.qasm_str[i+1] != ".") and (TK.qasm_str[i+2] != "0"):
-                    TK.annotate_error(TK.name, TK.qasm_str, i, "The version of OpenQASM should be 2.0", TK.line_count, TK.err_line_idx)
-                i += 2
-                # Check for missing ; if the current token index is at the end of the file
-                if i == len(TK.qasm_str)-1:
-                    TK.annotate_error(TK.name, TK.qasm_str, i, "Expect ;", TK.line_count, TK.err_line_idx)
-                # Skip the spaces to find ;
+                # Check for "
+                if TK.qasm_str[i] != "\"":
+                    TK.error(i, "Expect \"")
+                i += 1
+                # Get the filename
+                filename = ""
+                file_i = i
+                while (i < len(TK.qasm_str)) and (TK.qasm_str[i] != "\""):
+                    filename += TK.qasm_str[i]
+                    i += 1
+                # Check whether the file exists in the current directory or the search paths
+                if Include_resolver.resolve(filename) is None:
+                    # Skip the include "qelib1.inc";
+                    if filename != "qelib1.inc":
+                        TK.error(file_i, "File not found")
                 i += 1
-                while (i < len(TK.qasm_str)) and TK.qasm_str[i].isspace():
+                # Skip whitespaces
+                while (i < len(TK.qasm_str)) and (TK.qasm_str[i].isspace()):
                     i += 1
                 # Check for ;
                 if TK.qasm_str[i] != ";":
-                    TK.annotate_error(TK.name, TK.qasm_str, i, "Expect ;", TK.line_count, TK.err_line_idx)
+                    TK.error(i, "Expect ;")
                 i += 1
-                continue
-            
-            # Check for include files
-            if TK.qasm_str[i]=="i"and TK.qasm_str[i+1]=="n"and TK.qasm_str[i+2]=="c"and TK.qasm_str[i+3]=="l"and TK.qasm_str[i+4]=="u"and TK.qasm_str[i+5]=="d"and TK.qasm_str[i+6]=="e":
-                if TK.qasm_str[i+7].isspace() or TK.qasm_str[i+7]=="\"":
-                    i += 7
-                    # Skip whitespaces
-                    while (i < len(TK.qasm_str)) and (TK.qasm_str[i].isspace()):
-                        i += 1
-                    # Check for "
-                    if TK.qasm_str[i] != "\"":
-                        TK.annotate_error(TK.name, TK.qasm_str, i, "Expect \"", TK.line_count, TK.err_line_idx)
-                    i += 1
-                    # Get the filename
-                    filename = ""
-                    file_i = i
-                    while (i < len(TK.qasm_str)) and (TK.qasm_str[i] != "\""):
-                        filename += TK.qasm_str[i]
-                        i += 1
-                    # Check whether the file exists
-                    file_path = Path(filename)
-                    if not file_path.exists():
-                        # Skip the include "qelib1.inc";
-                        if filename != "qelib1.inc":
-                            TK.annotate_error(TK.name, TK.qasm_str, file_i, "File not found", TK.line_count, TK.err_line_idx)
-                    i += 1
-                    # Skip whitespaces
-                    while (i < len(TK.qasm_str)) and (TK.qasm_str[i].isspace()):
-                        i += 1
-                    # Check for ;
-                    if TK.qasm_str[i] != ";":
-                        TK.annotate_error(TK.name, TK.qasm_str, i, "Expect ;", TK.line_count, TK.err_line_idx)
-                    i += 1
-                    # Add the file to the list
-                    TK.include_file_list.append(filename)
-                    continue
+                # Add the file to the list
+                TK.include_file_list.append(filename)
+                return i
                     
-            # Check for ;
-            if TK.qasm_str[i] == ";":
-                TK.Token.append((TK_OPERATOR, 0, 0, 1, ";", TK.line_count, TK.err_line_idx, i))
+        # Check for ;
+        if TK.qasm_str[i] == ";":
+            TK.Token.append((TK_OPERATOR, 0, 0, 1, ";", i))
+            i += 1
+            return i
+            
+        # Check for : this is for separate the control qubits and target qubit of multi-qubit controlled gates
+        if TK.qasm_str[i] == ":":
+            TK.Token.append((TK_OPERATOR, 0, 0, 1, ":", i))
+            i += 1
+            return i
+            
+        # Check for ,
+        if TK.qasm_str[i] == ",":
+            TK.Token.append((TK_OPERATOR, 0, 0, 1, ",", i))
+            i += 1
+            return i
+            
+        # Check for {
+        if TK.qasm_str[i] == "{":
+            TK.Token.append((TK_OPERATOR, 0, 0, 1, "{", i))
+            i += 1
+            return i
+            
+        # Check for }
+        if TK.qasm_str[i] == "}":
+            TK.Token.append((TK_OPERATOR, 0, 0, 1, "}", i))
+            i += 1
+            return i
+            
+        # Check for ->
+        if TK.qasm_str[i] == "-" and TK.qasm_str[i+1] == ">":
+            if TK.qasm_str[i+2].isspace() or (TK.is_alnum(TK.qasm_str[i+2]) and TK.qasm_str[i+2] != "_"):
+                TK.Token.append((TK_OPERATOR, 0, 0, 2, "->", i))
+                i += 2
+                return i
+            
+        # Check for ==
+        if TK.qasm_str[i] == "=" and TK.qasm_str[i+1] == "=":
+            if TK.qasm_str[i+2].isspace() or TK.qasm_str[i+2].isdigit():
+                TK.Token.append((TK_OPERATOR, 0, 0, 2, "==", i))
+                i += 2
+                return i
+            
+        # Check for some operators
+        if TK.qasm_str[i] == "+" or TK.qasm_str[i] == "-" or TK.qasm_str[i] == "*" or TK.qasm_str[i] == "/" or TK.qasm_str[i] == "^" or TK.qasm_str[i] == "(" or TK.qasm_str[i] == ")":
+            TK.Token.append((TK_OPERATOR, 0, 0, 1, TK.qasm_str[i], i))
+            i += 1
+            return i
+            
+        # Check for []
+        if TK.qasm_str[i] == "[" or TK.qasm_str[i] == "]":
+            TK.Token.append((TK_OPERATOR, 0, 0, 1, TK.qasm_str[i], i))
+            i += 1
+            return i
+            
+        # Check for +
+        if TK.qasm_str[i] == "+":
+            if TK.qasm_str[i+1].isspace() or TK.qasm_str[i+1].isdigit() or TK.qasm_str[i+1] == ".":
+                TK.Token.append((TK_OPERATOR, 0, 0, 1, "+", i))
                 i += 1
-                continue
+                return i
             
-            # Check for : this is for separate the control qubits and target qubit of multi-qubit controlled gates
-            if TK.qasm_str[i] == ":":
-                TK.Token.append((TK_OPERATOR, 0, 0, 1, ":", TK.line_count, TK.err_line_idx, i))
+        # Check for -
+        if TK.qasm_str[i] == "-":
+            if TK.qasm_str[i+1].isspace() or TK.qasm_str[i+1].isdigit() or TK.qasm_str[i+1] == ".":
+                TK.Token.append((TK_OPERATOR, 0, 0, 1, "-", i))
                 i += 1
-                continue
+                return i
             
-            # Check for ,
-            if TK.qasm_str[i] == ",":
-                TK.Token.append((TK_OPERATOR, 0, 0, 1, ",", TK.line_count, TK.err_line_idx, i))
+        # Check for *
+        if TK.qasm_str[i] == "*":
+            if TK.qasm_str[i+1].isspace() or TK.qasm_str[i+1].isdigit() or TK.qasm_str[i+1] == ".":
+                TK.Token.append((TK_OPERATOR, 0, 0, 1, "*", i))
                 i += 1
-                continue
+                return i
             
-            # Check for {
-            if TK.qasm_str[i] == "{":
-                TK.Token.append((TK_OPERATOR, 0, 0, 1, "{", TK.line_count, TK.err_line_idx, i))
+        # Check for /
+        if TK.qasm_str[i] == "/":
+            if TK.qasm_str[i+1].isspace() or TK.qasm_str[i+1].isdigit() or TK.qasm_str[i+1] == ".":
+                TK.Token.append((TK_OPERATOR, 0, 0, 1, "/", i))
                 i += 1
-                continue
+                return i
             
-            # Check for }
-            if TK.qasm_str[i] == "}":
-                TK.Token.append((TK_OPERATOR, 0, 0, 1, "}", TK.line_count, TK.err_line_idx, i))
+        # Check for ^
+        if TK.qasm_str[i] == "^":
+            if TK.qasm_str[i+1].isspace() or TK.qasm_str[i+1].isdigit() or TK.qasm_str[i+1] == ".":
+                TK.Token.append((TK_OPERATOR, 0, 0, 1, "^", i))
                 i += 1
-                continue
+                return i
             
-            # Check for ->
-            if TK.qasm_str[i] == "-" and TK.qasm_str[i+1] == ">":
-                if TK.qasm_str[i+2].isspace() or (TK.is_alnum(TK.qasm_str[i+2]) and TK.qasm_str[i+2] != "_"):
-                    TK.Token.append((TK_OPERATOR, 0, 0, 2, "->", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for pi
+        if TK.qasm_str[i] == "p" and TK.qasm_str[i+1] == "i":
+            if not TK.is_alnum(TK.qasm_str[i+2]):
+                TK.Token.append((TK_PI, 0, 0, 2, "pi", i))
+                i += 2
+                return i
             
-            # Check for ==
-            if TK.qasm_str[i] == "=" and TK.qasm_str[i+1] == "=":
-                if TK.qasm_str[i+2].isspace() or TK.qasm_str[i+2].isdigit():
-                    TK.Token.append((TK_OPERATOR, 0, 0, 2, "==", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for sin
+        if TK.qasm_str[i] == "s" and TK.qasm_str[i+1] == "i" and TK.qasm_str[i+2] == "n":
+            if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_SIN, 0, 0, 3, "sin", i))
+                i += 3
+                return i
+            
+        # Check for cos
+        if TK.qasm_str[i] == "c" and TK.qasm_str[i+1] == "o" and TK.qasm_str[i+2] == "s":
+            if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_COS, 0, 0, 3, "cos", i))
+                i += 3
+                return i
+            
+        # Check for tan
+        if TK.qasm_str[i] == "t" and TK.qasm_str[i+1] == "a" and TK.qasm_str[i+2] == "n":
+            if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_TAN, 0, 0, 3, "tan", i))
+                i += 3
+                return i
+            
+        # Check for exp
+        if TK.qasm_str[i] == "e" and TK.qasm_str[i+1] == "x" and TK.qasm_str[i+2] == "p":
+            if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_EXP, 0, 0, 3, "exp", i))
+                i += 3
+                return i
+            
+        # Check for ln
+        if TK.qasm_str[i] == "l" and TK.qasm_str[i+1] == "n":
+            if TK.qasm_str[i+2] == "(" or TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_LN, 0, 0, 2, "ln", i))
+                i += 2
+                return i
+            
+        # Check for sqrt
+        if TK.qasm_str[i] == "s" and TK.qasm_str[i+1] == "q" and TK.qasm_str[i+2] == "r" and TK.qasm_str[i+3] == "t":
+            if TK.qasm_str[i+4] == "(" or TK.qasm_str[i+4].isspace():
+                TK.Token.append((TK_SQRT, 0, 0, 4, "sqrt", i))
+                i += 4
+                return i
+            
+        # Check for gate
+        if TK.qasm_str[i] == "g" and TK.qasm_str[i+1] == "a" and TK.qasm_str[i+2] == "t" and TK.qasm_str[i+3] == "e":
+            if TK.qasm_str[i+4].isspace():
+                TK.Token.append((TK_GATE, 0, 0, 4, "gate", i))
+                i += 4
+                return i
+            
+        # Check for measure 
+        if TK.qasm_str[i] == "m" and TK.qasm_str[i+1] == "e" and TK.qasm_str[i+2] == "a" and TK.qasm_str[i+3] == "s" and TK.qasm_str[i+4] == "u" and TK.qasm_str[i+5] == "r" and TK.qasm_str[i+6] == "e":
+            if TK.qasm_str[i+7].isspace():
+                TK.Token.append((TK_MEASURE, 0, 0, 7, "measure", i))
+                i += 7
+                return i
+            
+        # Check for if
+        if TK.qasm_str[i] == "i" and TK.qasm_str[i+1] == "f":
+            if TK.qasm_str[i+2].isspace() or TK.qasm_str[i+2] == "(":
+                TK.Token.append((TK_IF, 0, 0, 2, "if", i))
+                i += 2
+                return i
+            
+        # Check for reset
+        if TK.qasm_str[i] == "r" and TK.qasm_str[i+1] == "e" and TK.qasm_str[i+2] == "s" and TK.qasm_str[i+3] == "e" and TK.qasm_str[i+4] == "t":
+            if TK.qasm_str[i+5].isspace():
+                TK.Token.append((TK_RESET, 0, 0, 5, "reset", i))
+                i += 5
+                return i
+            
+        # Check for barrier
+        if TK.qasm_str[i] == "b" and TK.qasm_str[i+1] == "a" and TK.qasm_str[i+2] == "r" and TK.qasm_str[i+3] == "r" and TK.qasm_str[i+4] == "i" and TK.qasm_str[i+5] == "e" and TK.qasm_str[i+6] == "r":
+            if TK.qasm_str[i+7].isspace():
+                TK.Token.append((TK_BARRIER, 0, 0, 7, "barrier", i))
+                i += 7
+                return i
+            
+        # Check for opaque
+        if TK.qasm_str[i] == "o" and TK.qasm_str[i+1] == "p" and TK.qasm_str[i+2] == "a" and TK.qasm_str[i+3] == "q" and TK.qasm_str[i+4] == "u" and TK.qasm_str[i+5] == "e":
+            if TK.qasm_str[i+6].isspace():
+                TK.Token.append((TK_OPAQUE, 0, 0, 6, "opaque", i))
+                i += 6
+                return i
+            
+        # Check for qreg
+        if TK.qasm_str[i] == "q" and TK.qasm_str[i+1] == "r" and TK.qasm_str[i+2] == "e" and TK.qasm_str[i+3] == "g":
+            if TK.qasm_str[i+4].isspace():
+                TK.Token.append((TK_QREG, 0, 0, 4, "qreg", i))
+                i += 4
+                return i
+            
+        # Check for creg
+        if TK.qasm_str[i] == "c" and TK.qasm_str[i+1] == "r" and TK.qasm_str[i+2] == "e" and TK.qasm_str[i+3] == "g":
+            if TK.qasm_str[i+4].isspace():
+                TK.Token.append((TK_CREG, 0, 0, 4, "creg", i))
+                i += 4
+                return i
+            
+        # Check for id
+        if TK.qasm_str[i] == "i" and TK.qasm_str[i+1] == "d":
+            if TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_ID, 0, 0, 2, "id", i))
+                i += 2
+                return i
+            
+        # Check for sdg
+        if TK.qasm_str[i] == "s" and TK.qasm_str[i+1] == "d" and TK.qasm_str[i+2] == "g":
+            if TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_SDG, 0, 0, 3, "sdg", i))
+                i += 3
+                return i
+            
+        # Check for tdg
+        if TK.qasm_str[i] == "t" and TK.qasm_str[i+1] == "d" and TK.qasm_str[i+2] == "g":
+            if TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_TDG, 0, 0, 3, "tdg", i))
+                i += 3
+                return i
+            
+        # Check for U
+        if TK.qasm_str[i] == "U":
+            if (TK.qasm_str[i+1] == "(") or (TK.qasm_str[i+1].isspace()):
+                TK.Token.append((TK_U, 0, 0, 1, "U", i))
+                i += 1
+                return i
+            
+        # Check for U3
+        if TK.qasm_str[i] == "u" and TK.qasm_str[i+1] == "3":
+            if (TK.qasm_str[i+2] == "(") or (TK.qasm_str[i+2].isspace()):
+                TK.Token.append((TK_U, 0, 0, 1, "U", i))
+                i += 2
+                return i
+            
+        # Check for U1
+        if TK.qasm_str[i] == "u" and TK.qasm_str[i+1] == "1":
+            if (TK.qasm_str[i+2] == "(") or (TK.qasm_str[i+2].isspace()):
+                TK.Token.append((TK_U1, 0, 0, 2, "U1", i))
+                i += 2
+                return i
             
-            # Check for some operators
-            if TK.qasm_str[i] == "+" or TK.qasm_str[i] == "-" or TK.qasm_str[i] == "*" or TK.qasm_str[i] == "/" or TK.qasm_str[i] == "^" or TK.qasm_str[i] == "(" or TK.qasm_str[i] == ")":
-                TK.Token.append((TK_OPERATOR, 0, 0, 1, TK.qasm_str[i], TK.line_count, TK.err_line_idx, i))
+        # Check for U2
+        if TK.qasm_str[i] == "u" and TK.qasm_str[i+1] == "2":
+            if (TK.qasm_str[i+2] == "(") or (TK.qasm_str[i+2].isspace()):
+                TK.Token.append((TK_U2, 0, 0, 2, "U2", i))
+                i += 2
+                return i
+            
+        # Check for X
+        if TK.qasm_str[i] == "X" or TK.qasm_str[i] == "x":
+            if TK.qasm_str[i+1].isspace():
+                TK.Token.append((TK_X, 0, 0, 1, "X", i))
                 i += 1
-                continue
+                return i
             
-            # Check for []
-            if TK.qasm_str[i] == "[" or TK.qasm_str[i] == "]":
-                TK.Token.append((TK_OPERATOR, 0, 0, 1, TK.qasm_str[i], TK.line_count, TK.err_line_idx, i))
+        # Check for Y
+        if TK.qasm_str[i] == "Y" or TK.qasm_str[i] == "y":
+            if TK.qasm_str[i+1].isspace():
+                TK.Token.append((TK_Y, 0, 0, 1, "Y", i))
                 i += 1
-                continue
+                return i
             
-            # Check for +
-            if TK.qasm_str[i] == "+":
-                if TK.qasm_str[i+1].isspace() or TK.qasm_str[i+1].isdigit() or TK.qasm_str[i+1] == ".":
-                    TK.Token.append((TK_OPERATOR, 0, 0, 1, "+", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
+        # Check for Z
+        if TK.qasm_str[i] == "Z" or TK.qasm_str[i] == "z":
+            if TK.qasm_str[i+1].isspace():
+                TK.Token.append((TK_Z, 0, 0, 1, "Z", i))
+                i += 1
+                return i
             
-            # Check for -
-            if TK.qasm_str[i] == "-":
-                if TK.qasm_str[i+1].isspace() or TK.qasm_str[i+1].isdigit() or TK.qasm_str[i+1] == ".":
-                    TK.Token.append((TK_OPERATOR, 0, 0, 1, "-", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
+        # Check for S
+        if TK.qasm_str[i] == "S" or TK.qasm_str[i] == "s":
+            if TK.qasm_str[i+1].isspace():
+                TK.Token.append((TK_S, 0, 0, 1, "S", i))
+                i += 1
+                return i
             
-            # Check for *
-            if TK.qasm_str[i] == "*":
-                if TK.qasm_str[i+1].isspace() or TK.qasm_str[i+1].isdigit() or TK.qasm_str[i+1] == ".":
-                    TK.Token.append((TK_OPERATOR, 0, 0, 1, "*", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
+        # Check for T
+        if TK.qasm_str[i] == "T" or TK.qasm_str[i] == "t":
+            if TK.qasm_str[i+1].isspace():
+                TK.Token.append((TK_T, 0, 0, 1, "T", i))
+                i += 1
+                return i
             
-            # Check for /
-            if TK.qasm_str[i] == "/":
-                if TK.qasm_str[i+1].isspace() or TK.qasm_str[i+1].isdigit() or TK.qasm_str[i+1] == ".":
-                    TK.Token.append((TK_OPERATOR, 0, 0, 1, "/", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
+        # Check for Rtheta
+        if TK.qasm_str[i] == "R" and TK.qasm_str[i+1] == "T" and TK.qasm_str[i+2] == "H" and TK.qasm_str[i+3] == "E" and TK.qasm_str[i+4] == "T" and TK.qasm_str[i+5] == "A":
+            if TK.qasm_str[i+6] == "(" or TK.qasm_str[i+6].isspace():
+                TK.Token.append((TK_RTHETA, 0, 0, 6, "RTHETA", i))
+                i += 6
+                return i
             
-            # Check for ^
-            if TK.qasm_str[i] == "^":
-                if TK.qasm_str[i+1].isspace() or TK.qasm_str[i+1].isdigit() or TK.qasm_str[i+1] == ".":
-                    TK.Token.append((TK_OPERATOR, 0, 0, 1, "^", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
+        # Check for RX
+        if (TK.qasm_str[i] == "R" and TK.qasm_str[i+1] == "X") or (TK.qasm_str[i]=="r" and TK.qasm_str[i+1]=="x"):
+            if TK.qasm_str[i+2] == "(" or TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_RX, 0, 0, 2, "RX", i))
+                i += 2
+                return i
             
-            # Check for pi
-            if TK.qasm_str[i] == "p" and TK.qasm_str[i+1] == "i":
-                if not TK.is_alnum(TK.qasm_str[i+2]):
-                    TK.Token.append((TK_PI, 0, 0, 2, "pi", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
-            
-            # Check for sin
-            if TK.qasm_str[i] == "s" and TK.qasm_str[i+1] == "i" and TK.qasm_str[i+2] == "n":
-                if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_SIN, 0, 0, 3, "sin", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for cos
-            if TK.qasm_str[i] == "c" and TK.qasm_str[i+1] == "o" and TK.qasm_str[i+2] == "s":
-                if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_COS, 0, 0, 3, "cos", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for tan
-            if TK.qasm_str[i] == "t" and TK.qasm_str[i+1] == "a" and TK.qasm_str[i+2] == "n":
-                if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_TAN, 0, 0, 3, "tan", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for exp
-            if TK.qasm_str[i] == "e" and TK.qasm_str[i+1] == "x" and TK.qasm_str[i+2] == "p":
-                if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_EXP, 0, 0, 3, "exp", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for ln
-            if TK.qasm_str[i] == "l" and TK.qasm_str[i+1] == "n":
-                if TK.qasm_str[i+2] == "(" or TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_LN, 0, 0, 2, "ln", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
-            
-            # Check for sqrt
-            if TK.qasm_str[i] == "s" and TK.qasm_str[i+1] == "q" and TK.qasm_str[i+2] == "r" and TK.qasm_str[i+3] == "t":
-                if TK.qasm_str[i+4] == "(" or TK.qasm_str[i+4].isspace():
-                    TK.Token.append((TK_SQRT, 0, 0, 4, "sqrt", TK.line_count, TK.err_line_idx, i))
-                    i += 4
-                    continue
-            
-            # Check for gate
-            if TK.qasm_str[i] == "g" and TK.qasm_str[i+1] == "a" and TK.qasm_str[i+2] == "t" and TK.qasm_str[i+3] == "e":
-                if TK.qasm_str[i+4].isspace():
-                    TK.Token.append((TK_GATE, 0, 0, 4, "gate", TK.line_count, TK.err_line_idx, i))
-                    i += 4
-                    continue
-            
-            # Check for measure 
-            if TK.qasm_str[i] == "m" and TK.qasm_str[i+1] == "e" and TK.qasm_str[i+2] == "a" and TK.qasm_str[i+3] == "s" and TK.qasm_str[i+4] == "u" and TK.qasm_str[i+5] == "r" and TK.qasm_str[i+6] == "e":
-                if TK.qasm_str[i+7].isspace():
-                    TK.Token.append((TK_MEASURE, 0, 0, 7, "measure", TK.line_count, TK.err_line_idx, i))
-                    i += 7
-                    continue
-            
-            # Check for if
-            if TK.qasm_str[i] == "i" and TK.qasm_str[i+1] == "f":
-                if TK.qasm_str[i+2].isspace() or TK.qasm_str[i+2] == "(":
-                    TK.Token.append((TK_IF, 0, 0, 2, "if", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
-            
-            # Check for reset
-            if TK.qasm_str[i] == "r" and TK.qasm_str[i+1] == "e" and TK.qasm_str[i+2] == "s" and TK.qasm_str[i+3] == "e" and TK.qasm_str[i+4] == "t":
-                if TK.qasm_str[i+5].isspace():
-                    TK.Token.append((TK_RESET, 0, 0, 5, "reset", TK.line_count, TK.err_line_idx, i))
-                    i += 5
-                    continue
-            
-            # Check for barrier
-            if TK.qasm_str[i] == "b" and TK.qasm_str[i+1] == "a" and TK.qasm_str[i+2] == "r" and TK.qasm_str[i+3] == "r" and TK.qasm_str[i+4] == "i" and TK.qasm_str[i+5] == "e" and TK.qasm_str[i+6] == "r":
-                if TK.qasm_str[i+7].isspace():
-                    TK.Token.append((TK_BARRIER, 0, 0, 7, "barrier", TK.line_count, TK.err_line_idx, i))
-                    i += 7
-                    continue
-            
-            # Check for opaque
-            if TK.qasm_str[i] == "o" and TK.qasm_str[i+1] == "p" and TK.qasm_str[i+2] == "a" and TK.qasm_str[i+3] == "q" and TK.qasm_str[i+4] == "u" and TK.qasm_str[i+5] == "e":
-                if TK.qasm_str[i+6].isspace():
-                    TK.Token.append((TK_OPAQUE, 0, 0, 6, "opaque", TK.line_count, TK.err_line_idx, i))
-                    i += 6
-                    continue
-            
-            # Check for qreg
-            if TK.qasm_str[i] == "q" and TK.qasm_str[i+1] == "r" and TK.qasm_str[i+2] == "e" and TK.qasm_str[i+3] == "g":
-                if TK.qasm_str[i+4].isspace():
-                    TK.Token.append((TK_QREG, 0, 0, 4, "qreg", TK.line_count, TK.err_line_idx, i))
-                    i += 4
-                    continue
-            
-            # Check for creg
-            if TK.qasm_str[i] == "c" and TK.qasm_str[i+1] == "r" and TK.qasm_str[i+2] == "e" and TK.qasm_str[i+3] == "g":
-                if TK.qasm_str[i+4].isspace():
-                    TK.Token.append((TK_CREG, 0, 0, 4, "creg", TK.line_count, TK.err_line_idx, i))
-                    i += 4
-                    continue
-            
-            # Check for id
-            if TK.qasm_str[i] == "i" and TK.qasm_str[i+1] == "d":
-                if TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_ID, 0, 0, 2, "id", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
-            
-            # Check for sdg
-            if TK.qasm_str[i] == "s" and TK.qasm_str[i+1] == "d" and TK.qasm_str[i+2] == "g":
-                if TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_SDG, 0, 0, 3, "sdg", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for tdg
-            if TK.qasm_str[i] == "t" and TK.qasm_str[i+1] == "d" and TK.qasm_str[i+2] == "g":
-                if TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_TDG, 0, 0, 3, "tdg", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for U
-            if TK.qasm_str[i] == "U":
-                if (TK.qasm_str[i+1] == "(") or (TK.qasm_str[i+1].isspace()):
-                    TK.Token.append((TK_U, 0, 0, 1, "U", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
+        # Check for RY
+        if (TK.qasm_str[i] == "R" and TK.qasm_str[i+1] == "Y") or (TK.qasm_str[i]=="r" and TK.qasm_str[i+1]=="y"):
+            if TK.qasm_str[i+2] == "(" or TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_RY, 0, 0, 2, "RY", i))
+                i += 2
+                return i
             
-            # Check for U3
-            if TK.qasm_str[i] == "u" and TK.qasm_str[i+1] == "3":
-                if (TK.qasm_str[i+2] == "(") or (TK.qasm_str[i+2].isspace()):
-                    TK.Token.append((TK_U, 0, 0, 1, "U", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for RZ
+        if (TK.qasm_str[i] == "R" and TK.qasm_str[i+1] == "Z") or (TK.qasm_str[i]=="r" and TK.qasm_str[i+1]=="z"):
+            if TK.qasm_str[i+2] == "(" or TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_RZ, 0, 0, 2, "RZ", i))
+                i += 2
+                return i
             
-            # Check for U1
-            if TK.qasm_str[i] == "u" and TK.qasm_str[i+1] == "1":
-                if (TK.qasm_str[i+2] == "(") or (TK.qasm_str[i+2].isspace()):
-                    TK.Token.append((TK_U1, 0, 0, 2, "U1", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for H
+        if TK.qasm_str[i] == "H" or TK.qasm_str[i] == "h":
+            if TK.qasm_str[i+1].isspace():
+                TK.Token.append((TK_H, 0, 0, 1, "H", i))
+                i += 1
+                return i
             
-            # Check for U2
-            if TK.qasm_str[i] == "u" and TK.qasm_str[i+1] == "2":
-                if (TK.qasm_str[i+2] == "(") or (TK.qasm_str[i+2].isspace()):
-                    TK.Token.append((TK_U2, 0, 0, 2, "U2", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for CX
+        if (TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "X") or (TK.qasm_str[i]=="c" and TK.qasm_str[i+1]=="x"):
+            if TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_CX, 0, 0, 2, "CX", i))
+                i += 2
+                return i
             
-            # Check for X
-            if TK.qasm_str[i] == "X" or TK.qasm_str[i] == "x":
-                if TK.qasm_str[i+1].isspace():
-                    TK.Token.append((TK_X, 0, 0, 1, "X", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
+        # Check for CCX 
+        if TK.qasm_str[i] == "c" and TK.qasm_str[i+1] == "c" and TK.qasm_str[i+2] == "x":
+            if TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_CCX, 0, 0, 3, "CCX", i))
+                i += 3
+                return i
             
-            # Check for Y
-            if TK.qasm_str[i] == "Y" or TK.qasm_str[i] == "y":
-                if TK.qasm_str[i+1].isspace():
-                    TK.Token.append((TK_Y, 0, 0, 1, "Y", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
+        # Check for CY
+        if (TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "Y") or (TK.qasm_str[i]=="c" and TK.qasm_str[i+1]=="y"):
+            if TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_CY, 0, 0, 2, "CY", i))
+                i += 2
+                return i
             
-            # Check for Z
-            if TK.qasm_str[i] == "Z" or TK.qasm_str[i] == "z":
-                if TK.qasm_str[i+1].isspace():
-                    TK.Token.append((TK_Z, 0, 0, 1, "Z", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
+        # Check for CZ
+        if (TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "Z") or (TK.qasm_str[i]=="c" and TK.qasm_str[i+1]=="z"):
+            if TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_CZ, 0, 0, 2, "CZ", i))
+                i += 2
+                return i
             
-            # Check for S
-            if TK.qasm_str[i] == "S" or TK.qasm_str[i] == "s":
-                if TK.qasm_str[i+1].isspace():
-                    TK.Token.append((TK_S, 0, 0, 1, "S", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
+        # Check for CU
+        if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "U":
+            if TK.qasm_str[i+2] == "(" or TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_CU, 0, 0, 2, "CU", i))
+                i += 2
+                return i
             
-            # Check for T
-            if TK.qasm_str[i] == "T" or TK.qasm_str[i] == "t":
-                if TK.qasm_str[i+1].isspace():
-                    TK.Token.append((TK_T, 0, 0, 1, "T", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
-            
-            # Check for Rtheta
-            if TK.qasm_str[i] == "R" and TK.qasm_str[i+1] == "T" and TK.qasm_str[i+2] == "H" and TK.qasm_str[i+3] == "E" and TK.qasm_str[i+4] == "T" and TK.qasm_str[i+5] == "A":
-                if TK.qasm_str[i+6] == "(" or TK.qasm_str[i+6].isspace():
-                    TK.Token.append((TK_RTHETA, 0, 0, 6, "RTHETA", TK.line_count, TK.err_line_idx, i))
-                    i += 6
-                    continue
-            
-            # Check for RX
-            if (TK.qasm_str[i] == "R" and TK.qasm_str[i+1] == "X") or (TK.qasm_str[i]=="r" and TK.qasm_str[i+1]=="x"):
-                if TK.qasm_str[i+2] == "(" or TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_RX, 0, 0, 2, "RX", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for cu3
+        if TK.qasm_str[i] == "c" and TK.qasm_str[i+1] == "u" and TK.qasm_str[i+2] == "3":
+            if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_CU, 0, 0, 2, "CU", i))
+                i += 3
+                return i
             
-            # Check for RY
-            if (TK.qasm_str[i] == "R" and TK.qasm_str[i+1] == "Y") or (TK.qasm_str[i]=="r" and TK.qasm_str[i+1]=="y"):
-                if TK.qasm_str[i+2] == "(" or TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_RY, 0, 0, 2, "RY", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for cu1
+        if TK.qasm_str[i] == "c" and TK.qasm_str[i+1] == "u" and TK.qasm_str[i+2] == "1":
+            if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_CU1, 0, 0, 3, "CU1", i))
+                i += 3
+                return i
             
-            # Check for RZ
-            if (TK.qasm_str[i] == "R" and TK.qasm_str[i+1] == "Z") or (TK.qasm_str[i]=="r" and TK.qasm_str[i+1]=="z"):
-                if TK.qasm_str[i+2] == "(" or TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_RZ, 0, 0, 2, "RZ", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for CS
+        if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "S":
+            if TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_CS, 0, 0, 2, "CS", i))
+                i += 2
+                return i
             
-            # Check for H
-            if TK.qasm_str[i] == "H" or TK.qasm_str[i] == "h":
-                if TK.qasm_str[i+1].isspace():
-                    TK.Token.append((TK_H, 0, 0, 1, "H", TK.line_count, TK.err_line_idx, i))
-                    i += 1
-                    continue
+        # Check for CT
+        if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "T":
+            if TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_CT, 0, 0, 2, "CT", i))
+                i += 2
+                return i
             
-            # Check for CX
-            if (TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "X") or (TK.qasm_str[i]=="c" and TK.qasm_str[i+1]=="x"):
-                if TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_CX, 0, 0, 2, "CX", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
-            
-            # Check for CCX 
-            if TK.qasm_str[i] == "c" and TK.qasm_str[i+1] == "c" and TK.qasm_str[i+2] == "x":
-                if TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_CCX, 0, 0, 3, "CCX", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for CY
-            if (TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "Y") or (TK.qasm_str[i]=="c" and TK.qasm_str[i+1]=="y"):
-                if TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_CY, 0, 0, 2, "CY", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for CRtheta
+        if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "R" and TK.qasm_str[i+2] == "T" and TK.qasm_str[i+3] == "H" and TK.qasm_str[i+4] == "E" and TK.qasm_str[i+5] == "T" and TK.qasm_str[i+6] == "A":
+            if TK.qasm_str[i+7] == "(" or TK.qasm_str[i+7].isspace():
+                TK.Token.append((TK_CRTHETA, 0, 0, 7, "CRTHETA", i))
+                i += 7
+                return i
             
-            # Check for CZ
-            if (TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "Z") or (TK.qasm_str[i]=="c" and TK.qasm_str[i+1]=="z"):
-                if TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_CZ, 0, 0, 2, "CZ", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for CRX
+        if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "R" and TK.qasm_str[i+2] == "X":
+            if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_CRX, 0, 0, 3, "CRX", i))
+                i += 3
+                return i
             
-            # Check for CU
-            if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "U":
-                if TK.qasm_str[i+2] == "(" or TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_CU, 0, 0, 2, "CU", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
-            
-            # Check for cu3
-            if TK.qasm_str[i] == "c" and TK.qasm_str[i+1] == "u" and TK.qasm_str[i+2] == "3":
-                if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_CU, 0, 0, 2, "CU", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for cu1
-            if TK.qasm_str[i] == "c" and TK.qasm_str[i+1] == "u" and TK.qasm_str[i+2] == "1":
-                if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_CU1, 0, 0, 3, "CU1", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for CS
-            if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "S":
-                if TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_CS, 0, 0, 2, "CS", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for CRY
+        if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "R" and TK.qasm_str[i+2] == "Y":
+            if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_CRY, 0, 0, 3, "CRY", i))
+                i += 3
+                return i
             
-            # Check for CT
-            if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "T":
-                if TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_CT, 0, 0, 2, "CT", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
-            
-            # Check for CRtheta
-            if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "R" and TK.qasm_str[i+2] == "T" and TK.qasm_str[i+3] == "H" and TK.qasm_str[i+4] == "E" and TK.qasm_str[i+5] == "T" and TK.qasm_str[i+6] == "A":
-                if TK.qasm_str[i+7] == "(" or TK.qasm_str[i+7].isspace():
-                    TK.Token.append((TK_CRTHETA, 0, 0, 7, "CRTHETA", TK.line_count, TK.err_line_idx, i))
-                    i += 7
-                    continue
-            
-            # Check for CRX
-            if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "R" and TK.qasm_str[i+2] == "X":
-                if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_CRX, 0, 0, 3, "CRX", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for CRY
-            if TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "R" and TK.qasm_str[i+2] == "Y":
-                if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_CRY, 0, 0, 3, "CRY", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for CRZ
-            if (TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "R" and TK.qasm_str[i+2] == "Z") or (TK.qasm_str[i]=="c" and TK.qasm_str[i+1]=="r" and TK.qasm_str[i+2]=="z"):
-                if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
-                    TK.Token.append((TK_CRZ, 0, 0, 3, "CRZ", TK.line_count, TK.err_line_idx, i))
-                    i += 3
-                    continue
-            
-            # Check for CH
-            if (TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "H") or (TK.qasm_str[i]=="c" and TK.qasm_str[i+1]=="h"):
-                if TK.qasm_str[i+2].isspace():
-                    TK.Token.append((TK_CH, 0, 0, 2, "CH", TK.line_count, TK.err_line_idx, i))
-                    i += 2
-                    continue
+        # Check for CRZ
+        if (TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "R" and TK.qasm_str[i+2] == "Z") or (TK.qasm_str[i]=="c" and TK.qasm_str[i+1]=="r" and TK.qasm_str[i+2]=="z"):
+            if TK.qasm_str[i+3] == "(" or TK.qasm_str[i+3].isspace():
+                TK.Token.append((TK_CRZ, 0, 0, 3, "CRZ", i))
+                i += 3
+                return i
+            
+        # Check for CH
+        if (TK.qasm_str[i] == "C" and TK.qasm_str[i+1] == "H") or (TK.qasm_str[i]=="c" and TK.qasm_str[i+1]=="h"):
+            if TK.qasm_str[i+2].isspace():
+                TK.Token.append((TK_CH, 0, 0, 2, "CH", i))
+                i += 2
+                return i
             
-            # Check for ident
-            if TK.is_alnum(TK.qasm_str[i]):
-                ident = TK.qasm_str[i]
-                err_i = i
+        # Check for ident
+        if TK.is_alnum(TK.qasm_str[i]):
+            ident = TK.qasm_str[i]
+            err_i = i
+            i += 1
+            while (i < len(TK.qasm_str))and(TK.is_alnum(TK.qasm_str[i]) or TK.qasm_str[i].isdigit()):
+                ident += TK.qasm_str[i]
                 i += 1
-                while (i < len(TK.qasm_str))and(TK.is_alnum(TK.qasm_str[i]) or TK.qasm_str[i].isdigit()):
-                    ident += TK.qasm_str[i]
-                    i += 1
-                TK.Token.append((TK_IDENT, 0, 0, len(ident), ident, TK.line_count, TK.err_line_idx, err_i))
-                continue
-            
-            # Check for number
-            if TK.qasm_str[i].isdigit() or (TK.qasm_str[i] == "." and TK.qasm_str[i+1].isdigit()):
-                i_init = i
-                num = ""
-                exp = 0
-                while TK.qasm_str[i].isdigit() or TK.qasm_str[i] == ".":
-                    num += TK.qasm_str[i]
+            # The keywords registered at runtime have no comparison above, so they are looked up in the keyword table
+            keyword = KEYWORDS.get(ident)
+            if (keyword is not None) and (keyword[0] is not None) and (FOLLOW_CLASS.get(TK.qasm_str[i:i+1], FOLLOW_OTHER) & keyword[3]):
+                TK.Token.append((keyword[0], 0, 0, keyword[2], keyword[1], err_i))
+                return i
+            TK.Token.append((TK_IDENT, 0, 0, len(ident), ident, err_i))
+            return i
+            
+        # Check for number
+        if TK.qasm_str[i].isdigit() or (TK.qasm_str[i] == "." and TK.qasm_str[i+1].isdigit()):
+            i_init = i
+            num = ""
+            exp = 0
+            while TK.qasm_str[i].isdigit() or TK.qasm_str[i] == ".":
+                num += TK.qasm_str[i]
+                i += 1
+            if TK.qasm_str[i] == "e" or TK.qasm_str[i] == "E":
+                if TK.qasm_str[i+1] == "+" and TK.qasm_str[i+2].isdigit():
+                    i += 2
+                    while TK.qasm_str[i].isdigit():
+                        exp = 10*exp + int(TK.qasm_str[i])
+                        i += 1
+                elif TK.qasm_str[i+1] == "-" and TK.qasm_str[i+2].isdigit():
+                    i += 2
+                    while TK.qasm_str[i].isdigit():
+                        exp = 10*exp - int(TK.qasm_str[i])
+                        i += 1
+                elif TK.qasm_str[i+1].isdigit():
                     i += 1
-                if TK.qasm_str[i] == "e" or TK.qasm_str[i] == "E":
-                    if TK.qasm_str[i+1] == "+" and TK.qasm_str[i+2].isdigit():
-                        i += 2
-                        while TK.qasm_str[i].isdigit():
-                            exp = 10*exp + int(TK.qasm_str[i])
-                            i += 1
-                    elif TK.qasm_str[i+1] == "-" and TK.qasm_str[i+2].isdigit():
-                        i += 2
-                        while TK.qasm_str[i].isdigit():
-                            exp = 10*exp - int(TK.qasm_str[i])
-                            i += 1
-                    elif TK.qasm_str[i+1].isdigit():
+                    while TK.qasm_str[i].isdigit():
+                        exp = 10*exp + int(TK.qasm_str[i])
                         i += 1
-                        while TK.qasm_str[i].isdigit():
-                            exp = 10*exp + int(TK.qasm_str[i])
-                            i += 1
-                    else:
-                        TK.annotate_error(TK.name, TK.qasm_str, i, "Invalid number", TK.line_count, TK.err_line_idx)
-                TK.Token.append((TK_NUM, float(num), float(exp), i-i_init, TK.qasm_str[i_init:i], TK.line_count, TK.err_line_idx, i_init))
-                continue
+                else:
+                    TK.error(i, "Invalid number")
+            TK.Token.append((TK_NUM, float(num), float(exp), i-i_init, TK.qasm_str[i_init:i], i_init))
+            return i
             
-            # raise Exception("Invalid character, cannot Tokenize!")
-            TK.annotate_error(TK.name, TK.qasm_str, i, "Invalid character, cannot Tokenize!", TK.line_count, TK.err_line_idx)
-        TK.Token.append((TK_EOF, 0, 0, 0, "EOF", TK.line_count, TK.err_line_idx, i))
-        return TK.name, TK.qasm_str, TK.Token, TK.include_file_list
+        # raise Exception("Invalid character, cannot Tokenize!")
+        TK.error(i, "Invalid character, cannot Tokenize!")
+    
+    def error(self, i, error_message):
+        # Annotate the error at index i of qasm_str, which is converted to the offset in the file if qasm_str is only part of it
+        if self.source is None:
+            Token.annotate_error(self.name, self.qasm_str, i, error_message)
+        elif isinstance(self.source, Mapped_source):
+            Token.annotate_error(self.name, self.source, self.base + len(self.qasm_str[:i].encode()), error_message)
+        else:
+            Token.annotate_error(self.name, self.source, self.base + i, error_message)
     
     @staticmethod
     def make_string_red(input_string):
         return "\033[91m" + input_string + "\033[0m"
 
     @staticmethod
-    def annotate_error(string_name, input_string, error_index, error_message, line_idx, line_start):
+    def annotate_error(string_name, input_string, error_index, error_message):
+        # The bytes of a memory mapped file are decoded when they are sliced
+        if isinstance(input_string, (bytes, mmap.mmap)):
+            input_string = Mapped_source(input_string)
         # Check if the index is within the bounds of the string
         if error_index < 0 or error_index > len(input_string):
             raise ValueError("Error index out of bounds")
+        # The line is only resolved here, from the offsets of the newlines
+        line_idx, line_start = Line_index(input_string).locate(error_index)
         # Find the end index of the line containing the error
-        line_end = 0
-        while ((error_index+line_end) < len(input_string)) and (input_string[error_index+line_end] != "\n"):
-            line_end += 1
+        line_end = input_string.find("\n", error_index)
+        if line_end < 0:
+            line_end = len(input_string)
         # Prepare the error annotation
         # string_init = f"[line: "{line_idx}"] "
         string_init = f"[file: {string_name}] "+f"[line: \"{line_idx}\"] "
-        input_line = string_init + input_string[line_start:error_index+line_end]
-        hat_line = " "*(len(string_init)+error_index-line_start) + Token.make_string_red("^")
-        err_line = " "*(len(string_init)+error_index-line_start) + Token.make_string_red(error_message+"!")
+        input_line = string_init + input_string[line_start:line_end]
+        # The column is counted in characters, which differs from the offsets for the non-ASCII lines of a mapped file
+        column = len(input_string[line_start:error_index])
+        hat_line = " "*(len(string_init)+column) + Token.make_string_red("^")
+        err_line = " "*(len(string_init)+column) + Token.make_string_red(error_message+"!")
         # Combine and return the annotated string
         annotated_string = input_line + "\n" + hat_line + "\n" + err_line
         sys.exit(annotated_string)
 
 
+
+# The compact token list, where each field of the tokens is stored in its own array and the strings are interned in a table
+# The values of the numbers are kept once per distinct number string
+class Token_buffer(object):
+    def __init__(self):
+        self.kind = array('H')
+        self.len = array('L')
+        self.str = array('L') # The index of the string in the string table
+        self.idx = array('q')
+        # The string table and the index of each string in it
+        self.strings = []
+        self.string_ids = {}
+        # The (val, exp) of the number strings, with the index of the string as the key
+        self.values = {}
+        # The values val*(10**exp) of the number strings, combined when they are first used by the parser
+        self.numbers = {}
+    
+    def append(self, token):
+        kind, val, exp, length, string, idx = token
+        string_id = self.string_ids.get(string)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(string)
+            self.string_ids[string] = string_id
+            if kind == TK_NUM:
+                self.values[string_id] = (val, exp)
+        self.kind.append(kind)
+        self.len.append(length)
+        self.str.append(string_id)
+        self.idx.append(idx)
+    
+    def extend(self, other):
+        # Append the tokens of another buffer, whose string indices are mapped into the string table of this one
+        string_ids = array('L')
+        for string_id, string in enumerate(other.strings):
+            new_id = self.string_ids.get(string)
+            if new_id is None:
+                new_id = len(self.strings)
+                self.strings.append(string)
+                self.string_ids[string] = new_id
+                if string_id in other.values:
+                    self.values[new_id] = other.values[string_id]
+            string_ids.append(new_id)
+        self.kind.extend(other.kind)
+        self.len.extend(other.len)
+        self.str.extend(array('L', [string_ids[string_id] for string_id in other.str]))
+        self.idx.extend(other.idx)
+    
+    def __len__(self):
+        return len(self.kind)
+    
+    def __getitem__(self, idx):
+        # The tuple view of the token, mainly for debugging
+        return (self.kind[idx], self.get_val(idx), self.get_exp(idx), self.len[idx], self.strings[self.str[idx]], self.idx[idx])
+    
+    def get_kind(self, idx):
+        return self.kind[idx]
+    
+    def get_val(self, idx):
+        if self.kind[idx] == TK_NUM:
+            return self.values[self.str[idx]][0]
+        return 0
+    
+    def get_exp(self, idx):
+        if self.kind[idx] == TK_NUM:
+            return self.values[self.str[idx]][1]
+        return 0
+    
+    def get_number(self, idx):
+        # The value of a number token, combined once per number string
+        string_id = self.str[idx]
+        number = self.numbers.get(string_id)
+        if number is None:
+            val, exp = self.values[string_id]
+            number = self.numbers[string_id] = val*(10**exp)
+        return number
+    
+    def get_len(self, idx):
+        return self.len[idx]
+    
+    def get_str(self, idx):
+        return self.strings[self.str[idx]]
+    
+    def get_idx(self, idx):
+        return self.idx[idx]
+
+
+# The token list of a streamed file, the tokens are pulled from the generator of Token.Tokenize_stream when they are indexed
+# and dropped once they are released, so that only the tokens of the statement being parsed are kept
+class Token_stream(object):
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.buffer = []
+        # The index of the first token in the buffer
+        self.base = 0
+    
+    def __getitem__(self, idx):
+        idx -= self.base
+        while idx >= len(self.buffer):
+            token = next(self.tokens, None)
+            # Reading past the end of the file gives the EOF token, as there is nothing left to pull
+            if token is None:
+                return self.buffer[-1]
+            self.buffer.append(token)
+        return self.buffer[idx]
+    
+    def release(self, idx):
+        # Drop all the tokens before index idx
+        if idx > self.base:
+            del self.buffer[:idx-self.base]
+            self.base = idx
+    
+    # The accessors of Token_buffer, reading the fields of the token tuples
+    def get_kind(self, idx):
+        return self[idx][0]
+    
+    def get_val(self, idx):
+        return self[idx][1]
+    
+    def get_exp(self, idx):
+        return self[idx][2]
+    
+    def get_number(self, idx):
+        token = self[idx]
+        return token[1]*(10**token[2])
+    
+    def get_len(self, idx):
+        return self[idx][3]
+    
+    def get_str(self, idx):
+        return self[idx][4]
+    
+    def get_idx(self, idx):
+        return self[idx][5]
+
+
+# The sorted offsets of the newlines of a source, built once so that the line of any offset is found with a binary search
+class Line_index(object):
+    def __init__(self, source):
+        self.source = source
+        self.newlines = array('q')
+        i = source.find("\n")
+        while i >= 0:
+            self.newlines.append(i)
+            i = source.find("\n", i+1)
+    
+    def locate(self, offset):
+        # Return the line number of the offset, counting from 1, and the offset where the line starts
+        line = bisect_left(self.newlines, offset)
+        if line == 0:
+            return 1, 0
+        return line+1, self.newlines[line-1]+1
+    
+    def line_and_column(self, offset):
+        # The column is counted in characters from 1
+        line, line_start = self.locate(offset)
+        return line, len(self.source[line_start:offset])+1
+
+
+# The source string of a streamed file, which is only read when an error needs to be annotated
+class Lazy_source(object):
+    def __init__(self, filename):
+        self.name = filename
+        self.qasm_str = None
+    
+    def get_str(self):
+        if self.qasm_str is None:
+            TK = Token()
+            TK.file2str(self.name)
+            self.qasm_str = TK.qasm_str
+        return self.qasm_str
+    
+    def __len__(self):
+        return len(self.get_str())
+    
+    def __getitem__(self, idx):
+        return self.get_str()[idx]
+    
+    def find(self, sub, start=0):
+        return self.get_str().find(sub, start)
+
+
+
+# The source of a memory mapped file, whose slices are decoded to strings for the error annotation
+class Mapped_source(object):
+    def __init__(self, mapping):
+        self.mapping = mapping
+    
+    def __len__(self):
+        return len(self.mapping)
+    
+    def __getitem__(self, idx):
+        return self.mapping[idx].decode(errors="replace")
+    
+    def find(self, sub, start=0):
+        return self.mapping.find(sub.encode(), start)
+
+
 # filepath = "qsofinstr/check.qasm"
 # str, TK = Token.Tokenize(filepath)
 # # print(TK.qasm_str)
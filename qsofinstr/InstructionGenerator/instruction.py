@@ -829,37 +829,31 @@ class Instructions:
         N_qubits = len(quantumcircuit.qubits)
         # Create the instruction object
         instruction = Instructions(N_qubits)
-        # Loop through the quantum circuit to generate the instructions
+        # Loop through the occupied cells of each timeslice to generate the instructions
         for timeslice_idx in range(1, quantumcircuit.max_time_slice+1):
-            qubit_idx = 0
-            timeslice_empty = True
-            for qubit in quantumcircuit.qubits:
-                end_of_timeslice = True if qubit_idx == len(quantumcircuit.qubits)-1 else False
-                if ((f"timeslice_{timeslice_idx}" not in quantumcircuit.qubits[qubit]) and (end_of_timeslice)):
-                    # Check whether there the whole timeslice is empty
-                    if timeslice_idx not in instruction.instructions:
-                        continue
+            cells = quantumcircuit.timeslice_cells(timeslice_idx)
+            end_of_timeslice = False
+            for qubit, timeslice_node in cells:
+                qubit_idx = quantumcircuit.qubits_idx[qubit]
+                end_of_timeslice = True if qubit_idx == N_qubits-1 else False
+                # Set the remaining bits of generated instructions to 1 and set the corresponding most significant bit
+                if timeslice_node.barrier and end_of_timeslice:
                     instruction.add_instruction_single_gate_no_condition(timeslice_idx, None, None, end_of_timeslice, None)
                     instruction.add_instruction_single_gate_condition(timeslice_idx, None, None, None, None, None, None, end_of_timeslice, None)
                     instruction.add_instruction_control_gate_no_condition(timeslice_idx, None, None, None, end_of_timeslice, None)
                     instruction.add_instruction_control_gate_condition(timeslice_idx, None, None, None, None, None, None, None, end_of_timeslice, None)
                     instruction.add_instruction_decoherence(timeslice_idx, None, None, None, end_of_timeslice)
                     instruction.add_instruction_reset(timeslice_idx, None, end_of_timeslice)
-                    continue
-                if f"timeslice_{timeslice_idx}" in quantumcircuit.qubits[qubit]:
-                    # Set the remaining bits of generated instructions to 1 and set the corresponding most significant bit
-                    if quantumcircuit.qubits[qubit][f"timeslice_{timeslice_idx}"].barrier and end_of_timeslice:
-                        # print("comming into barrier")
-                        instruction.add_instruction_single_gate_no_condition(timeslice_idx, None, None, end_of_timeslice, None)
-                        instruction.add_instruction_single_gate_condition(timeslice_idx, None, None, None, None, None, None, end_of_timeslice, None)
-                        instruction.add_instruction_control_gate_no_condition(timeslice_idx, None, None, None, end_of_timeslice, None)
-                        instruction.add_instruction_control_gate_condition(timeslice_idx, None, None, None, None, None, None, None, end_of_timeslice, None)
-                        instruction.add_instruction_decoherence(timeslice_idx, None, None, None, end_of_timeslice)
-                        instruction.add_instruction_reset(timeslice_idx, None, end_of_timeslice)
-                    instruction.instruction_gen_timeslice(timeslice_idx, qubit_idx, quantumcircuit.qubits[qubit][f"timeslice_{timeslice_idx}"], end_of_timeslice, quantumcircuit)
-                    timeslice_empty = False
-                qubit_idx += 1
-            if not timeslice_empty:
+                instruction.instruction_gen_timeslice(timeslice_idx, qubit_idx, timeslice_node, end_of_timeslice, quantumcircuit)
+            # The last qubit has no operation in this timeslice, so the remaining bits are set after the operations of the other qubits
+            if (not end_of_timeslice) and (timeslice_idx in instruction.instructions):
+                instruction.add_instruction_single_gate_no_condition(timeslice_idx, None, None, True, None)
+                instruction.add_instruction_single_gate_condition(timeslice_idx, None, None, None, None, None, None, True, None)
+                instruction.add_instruction_control_gate_no_condition(timeslice_idx, None, None, None, True, None)
+                instruction.add_instruction_control_gate_condition(timeslice_idx, None, None, None, None, None, None, None, True, None)
+                instruction.add_instruction_decoherence(timeslice_idx, None, None, None, True)
+                instruction.add_instruction_reset(timeslice_idx, None, True)
+            if cells:
                 instruction.last_valid_timeslice = timeslice_idx
         # Check whether there's a remaining measurement instruction that is not used by classical conditoned operations and should be added to the last timeslice
         if not instruction.measurement.check_last_instruction_added():
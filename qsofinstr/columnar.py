@@ -0,0 +1,185 @@
+'''
+This file contains the columnar representation of the quantum circuit, where the timeslice nodes are stored as the rows of
+flat typed arrays instead of one Python object for each qubit of each timeslice. The rows are sorted by the timeslice index
+and the qubit id, and the parameters and connected qubits of the rows are stored in the compressed sparse row form, so that
+a row takes a few tens of bytes and the circuit can be traversed without touching any timeslice node. The converters to and
+from the quantum circuit let the passes over the circuit be moved to this representation one at a time.
+'''
+from array import array
+from qsofinstr.timeslice import Time_slice_node
+
+# The flags of a row, which are combined in the flags column
+FLAG_CONTROLLED = 1
+FLAG_TARGET = 2
+FLAG_WITH_PARAMETER = 4
+FLAG_MEASUREMENT = 8
+FLAG_RESET = 16
+FLAG_BARRIER = 32
+FLAG_IF = 64
+
+# The kinds of the parameters, which keep the integer parameters as integers when the circuit is converted back
+PARAMETER_FLOAT = 0
+PARAMETER_INT = 1
+
+class Columnar_circuit:
+    def __init__(self):
+        self.name = ""
+        # The columns of the rows, the names of the gates and of the condition cregs are stored once in the tables below
+        self.qubit = array('i') # The qubit id, which is the index of the qubit in qubits_idx
+        self.timeslice = array('i')
+        self.gate = array('i') # The index of the gate name in gate_names
+        self.flags = array('B')
+        self.creg = array('i') # The index of the measured classical bit in cregs_idx, -1 if the row is not a measurement
+        self.if_creg = array('i') # The index of the condition creg in if_cregs, -1 if the row is not conditioned
+        self.if_num = array('q')
+        self.if_kind = array('B')
+        # The parameters of row i are parameters[parameter_offsets[i]:parameter_offsets[i+1]]
+        self.parameter_offsets = array('q', [0])
+        self.parameters = array('d')
+        self.parameter_kinds = array('B')
+        # The ids of the connected qubits of row i are connected_qubits[connected_offsets[i]:connected_offsets[i+1]]
+        self.connected_offsets = array('q', [0])
+        self.connected_qubits = array('i')
+        # The rows of timeslice t are the rows from timeslice_offsets[t] to timeslice_offsets[t+1]
+        self.timeslice_offsets = array('q')
+        # The tables of the names, with the index of each name
+        self.gate_names = []
+        self.gate_codes = {}
+        self.if_cregs = []
+        self.if_creg_codes = {}
+        # The attributes of the quantum circuit other than the timeslice nodes
+        self.qubit_names = [] # The qubit names by the qubit id
+        self.creg_names = [] # The classical bit names by the index in cregs_idx
+        self.qreg_qubits = {}
+        self.creg_bits = {}
+        self.cregs = {} # The measured qubits of the timeslices of each classical bit, as in the quantum circuit
+        self.cregs_size = {}
+        self.qubit_max_time_slice = {}
+        self.creg_max_time_slice = {}
+        self.max_time_slice = 0
+        self.measured_max_time_slice = 0
+    
+    def __len__(self):
+        return len(self.qubit)
+    
+    # Return the index of a name in a table, the name is added to the table if it is new
+    @staticmethod
+    def code(names, codes, name):
+        if name not in codes:
+            codes[name] = len(names)
+            names.append(name)
+        return codes[name]
+    
+    # Add a timeslice node as a new row, the rows have to be added in the order of the timeslice index
+    def add_row(self, qubit, timeslice, timeslice_node, qubits_idx, cregs_idx):
+        self.qubit.append(qubit)
+        self.timeslice.append(timeslice)
+        self.gate.append(Columnar_circuit.code(self.gate_names, self.gate_codes, timeslice_node.gate_operation))
+        flags = 0
+        if timeslice_node.controlled_operation:
+            flags |= FLAG_CONTROLLED
+        if timeslice_node.target_qubit:
+            flags |= FLAG_TARGET
+        if timeslice_node.with_parameter:
+            flags |= FLAG_WITH_PARAMETER
+        if timeslice_node.measurement:
+            flags |= FLAG_MEASUREMENT
+        if timeslice_node.reset:
+            flags |= FLAG_RESET
+        if timeslice_node.barrier:
+            flags |= FLAG_BARRIER
+        if timeslice_node.if_flag:
+            flags |= FLAG_IF
+        self.flags.append(flags)
+        self.creg.append(cregs_idx[timeslice_node.connected_cregs[0]] if timeslice_node.connected_cregs else -1)
+        self.if_creg.append(Columnar_circuit.code(self.if_cregs, self.if_creg_codes, timeslice_node.if_creg) if timeslice_node.if_flag else -1)
+        self.if_num.append(timeslice_node.if_num)
+        self.if_kind.append(timeslice_node.if_kind)
+        # The symbolic parameters cannot be stored, the circuit has to be bound to the values of the free parameters first
+        for parameter in timeslice_node.parameters:
+            self.parameters.append(parameter)
+            self.parameter_kinds.append(PARAMETER_INT if isinstance(parameter, int) else PARAMETER_FLOAT)
+        self.parameter_offsets.append(len(self.parameters))
+        for connected_qubit in timeslice_node.connected_qubits:
+            self.connected_qubits.append(qubits_idx[connected_qubit])
+        self.connected_offsets.append(len(self.connected_qubits))
+    
+    # Return the timeslice node of a row, the connected qubits are interned in the table of the quantum circuit
+    def get_node(self, row, table):
+        timeslice_node = Time_slice_node(self.gate_names[self.gate[row]])
+        flags = self.flags[row]
+        timeslice_node.controlled_operation = bool(flags & FLAG_CONTROLLED)
+        timeslice_node.target_qubit = bool(flags & FLAG_TARGET)
+        timeslice_node.with_parameter = bool(flags & FLAG_WITH_PARAMETER)
+        timeslice_node.measurement = bool(flags & FLAG_MEASUREMENT)
+        timeslice_node.reset = bool(flags & FLAG_RESET)
+        timeslice_node.barrier = bool(flags & FLAG_BARRIER)
+        timeslice_node.time_slice_index = self.timeslice[row]
+        if flags & FLAG_IF:
+            timeslice_node.if_flag = True
+            timeslice_node.if_creg = self.if_cregs[self.if_creg[row]]
+        timeslice_node.if_num = self.if_num[row]
+        timeslice_node.if_kind = self.if_kind[row]
+        if self.creg[row] != -1:
+            timeslice_node.set_connected_cregs((self.creg_names[self.creg[row]],))
+        timeslice_node.parameters = tuple(int(self.parameters[i]) if self.parameter_kinds[i] == PARAMETER_INT else self.parameters[i]
+                                          for i in range(self.parameter_offsets[row], self.parameter_offsets[row+1]))
+        timeslice_node.set_connected_qubits([self.qubit_names[self.connected_qubits[i]]
+                                             for i in range(self.connected_offsets[row], self.connected_offsets[row+1])], table)
+        return timeslice_node
+    
+    # Return the range of the rows of a timeslice
+    def timeslice_rows(self, timeslice):
+        if timeslice + 1 >= len(self.timeslice_offsets):
+            return range(0)
+        return range(self.timeslice_offsets[timeslice], self.timeslice_offsets[timeslice+1])
+
+# Function to convert the quantum circuit into the columnar circuit
+def dump_to_columnar(quantumcircuit):
+    # The parameters are stored as numbers, so the circuit has to be bound first
+    unbound = quantumcircuit.free_parameters()
+    if unbound:
+        raise ValueError(f"The circuit cannot be converted into the columnar circuit before the free parameters {', '.join(sorted(unbound))} are bound")
+    columnar = Columnar_circuit()
+    columnar.name = quantumcircuit.name
+    columnar.qubit_names = sorted(quantumcircuit.qubits_idx, key=quantumcircuit.qubits_idx.get)
+    columnar.creg_names = sorted(quantumcircuit.cregs_idx, key=quantumcircuit.cregs_idx.get)
+    columnar.qreg_qubits = {qreg: list(qubits) for qreg, qubits in quantumcircuit.qreg_qubits.items()}
+    columnar.creg_bits = {creg: list(bits) for creg, bits in quantumcircuit.creg_bits.items()}
+    columnar.cregs = {creg: dict(timeslices) for creg, timeslices in quantumcircuit.cregs.items()}
+    columnar.cregs_size = dict(quantumcircuit.cregs_size)
+    columnar.qubit_max_time_slice = dict(quantumcircuit.qubit_max_time_slice)
+    columnar.creg_max_time_slice = dict(quantumcircuit.creg_max_time_slice)
+    columnar.max_time_slice = quantumcircuit.max_time_slice
+    columnar.measured_max_time_slice = quantumcircuit.measured_max_time_slice
+    # The occupied cells are already in the order of the timeslice index and the qubit id
+    for timeslice, qubit, timeslice_node in quantumcircuit.occupied_cells():
+        # Start the rows of the timeslices up to this one
+        while len(columnar.timeslice_offsets) <= timeslice:
+            columnar.timeslice_offsets.append(len(columnar))
+        columnar.add_row(quantumcircuit.qubits_idx[qubit], timeslice, timeslice_node, quantumcircuit.qubits_idx, quantumcircuit.cregs_idx)
+    columnar.timeslice_offsets.append(len(columnar))
+    return columnar
+
+# Function to convert the columnar circuit back into the quantum circuit
+def load_from_columnar(columnar, quantumcircuit):
+    quantumcircuit.name = columnar.name
+    for qubit_id in range(len(columnar.qubit_names)):
+        quantumcircuit.qubits[columnar.qubit_names[qubit_id]] = {}
+        quantumcircuit.qubits_idx[columnar.qubit_names[qubit_id]] = qubit_id
+    quantumcircuit.qubits_idx_idx = len(columnar.qubit_names)
+    for creg_id in range(len(columnar.creg_names)):
+        quantumcircuit.cregs_idx[columnar.creg_names[creg_id]] = creg_id
+    quantumcircuit.cregs = {creg: dict(timeslices) for creg, timeslices in columnar.cregs.items()}
+    quantumcircuit.cregs_idx_idx = len(columnar.creg_names)
+    quantumcircuit.qreg_qubits = {qreg: list(qubits) for qreg, qubits in columnar.qreg_qubits.items()}
+    quantumcircuit.creg_bits = {creg: list(bits) for creg, bits in columnar.creg_bits.items()}
+    quantumcircuit.cregs_size = dict(columnar.cregs_size)
+    quantumcircuit.qubit_max_time_slice = dict(columnar.qubit_max_time_slice)
+    quantumcircuit.creg_max_time_slice = dict(columnar.creg_max_time_slice)
+    quantumcircuit.max_time_slice = columnar.max_time_slice
+    quantumcircuit.measured_max_time_slice = columnar.measured_max_time_slice
+    for row in range(len(columnar)):
+        qubit = columnar.qubit_names[columnar.qubit[row]]
+        timeslice = columnar.timeslice[row]
+        quantumcircuit.add_node(qubit, timeslice, columnar.get_node(row, quantumcircuit.connected_qubits_table))
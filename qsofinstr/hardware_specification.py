@@ -226,35 +226,33 @@ class Specification:
         quantumcircuit_new.qubits_idx_idx = quantumcircuit_orig.qubits_idx_idx
         quantumcircuit_new.cregs_idx_idx = quantumcircuit_orig.cregs_idx_idx
         # Create the empty timeslice node dictionary using the same qubit names
-        quantumcircuit_new.qubits = {qubit: {} for qubit in quantumcircuit_orig.qubits}
-        # Loop through all the qubits of all timeslices to create the new timeslice node dictionary for the new quantumcircuit
-        for timeslice_idx in range(1, quantumcircuit_orig.max_time_slice+1):
-            for qubit in quantumcircuit_orig.qubits:
-                if f"timeslice_{timeslice_idx}" in quantumcircuit_orig.qubits[qubit]:
-                    idx = 0
-                    if Specification.Mode == 1:
-                        # Update the timeslice index for mode 1
-                        idx = Specification.update_timeslice_idx_mode1(timeslice_idx, spec, quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"], qubit, quantumcircuit_orig)
-                    else:
-                        idx = Specification.update_timeslice_idx_mode2(timeslice_idx, spec, quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"], qubit)
-                    # Create the new timeslice node for the new quantumcircuit
-                    new_timeslice_node = Time_slice_node(quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].gate_operation)
-                    new_timeslice_node.controlled_operation = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].controlled_operation
-                    new_timeslice_node.connected_qubits = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].connected_qubits
-                    new_timeslice_node.connected_cregs = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].connected_cregs
-                    new_timeslice_node.parameters = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].parameters
-                    new_timeslice_node.target_qubit = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].target_qubit
-                    new_timeslice_node.time_slice_index = idx
-                    new_timeslice_node.with_parameter = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].with_parameter
-                    new_timeslice_node.measurement = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].measurement
-                    new_timeslice_node.reset = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].reset
-                    new_timeslice_node.if_flag = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].if_flag
-                    new_timeslice_node.if_creg = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].if_creg
-                    new_timeslice_node.if_num = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].if_num
-                    new_timeslice_node.if_kind = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].if_kind
-                    new_timeslice_node.barrier = quantumcircuit_orig.qubits[qubit][f"timeslice_{timeslice_idx}"].barrier
-                    # Add the new timeslice node to the new quantumcircuit
-                    quantumcircuit_new.qubits[qubit][f"timeslice_{idx}"] = new_timeslice_node
+        quantumcircuit_new.reset_nodes(quantumcircuit_orig.qubits)
+        # Loop through the occupied cells of all timeslices to create the new timeslice node dictionary for the new quantumcircuit
+        for timeslice_idx, qubit, timeslice_node in quantumcircuit_orig.occupied_cells():
+            idx = 0
+            if Specification.Mode == 1:
+                # Update the timeslice index for mode 1
+                idx = Specification.update_timeslice_idx_mode1(timeslice_idx, spec, timeslice_node, qubit, quantumcircuit_orig)
+            else:
+                idx = Specification.update_timeslice_idx_mode2(timeslice_idx, spec, timeslice_node, qubit)
+            # Create the new timeslice node for the new quantumcircuit
+            new_timeslice_node = Time_slice_node(timeslice_node.gate_operation)
+            new_timeslice_node.controlled_operation = timeslice_node.controlled_operation
+            new_timeslice_node.connected_qubits = timeslice_node.connected_qubits
+            new_timeslice_node.connected_cregs = timeslice_node.connected_cregs
+            new_timeslice_node.parameters = timeslice_node.parameters
+            new_timeslice_node.target_qubit = timeslice_node.target_qubit
+            new_timeslice_node.time_slice_index = idx
+            new_timeslice_node.with_parameter = timeslice_node.with_parameter
+            new_timeslice_node.measurement = timeslice_node.measurement
+            new_timeslice_node.reset = timeslice_node.reset
+            new_timeslice_node.if_flag = timeslice_node.if_flag
+            new_timeslice_node.if_creg = timeslice_node.if_creg
+            new_timeslice_node.if_num = timeslice_node.if_num
+            new_timeslice_node.if_kind = timeslice_node.if_kind
+            new_timeslice_node.barrier = timeslice_node.barrier
+            # Add the new timeslice node to the new quantumcircuit
+            quantumcircuit_new.add_node(qubit, idx, new_timeslice_node)
         # Update the maximum timeslice index of the quantumcircuit_new
         quantumcircuit_new.max_time_slice = spec.new_max_timeslice
         # print(spec.additional_timeslice)
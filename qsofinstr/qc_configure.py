@@ -6,6 +6,13 @@ with other tools, and the quantum circuit itself can also be configured through
 import json
 from qsofinstr.timeslice import Time_slice_node
 
+# The timeslices are keyed by their indices in the quantum circuit, and by "timeslice_<index>" in the json file
+def timeslice_key(timeslice):
+    return f"timeslice_{timeslice}"
+
+def timeslice_index(key):
+    return int(key[len("timeslice_"):])
+
 # The function to transfer the timeslice node to a dictionary
 def timeslice_node_to_dict(timeslice_node):
     timeslice_node_dict = {}
@@ -26,17 +33,25 @@ def timeslice_node_to_dict(timeslice_node):
     timeslice_node_dict["barrier"] = timeslice_node.barrier
     return timeslice_node_dict
 
-# The function to transfer the dictionary to a timeslice node
-def dict_to_timeslice_node(timeslice_node_dict):
+# The function to transfer the dictionary to a timeslice node, the connected qubits are interned in the table of the quantum circuit
+def dict_to_timeslice_node(timeslice_node_dict, table):
     timeslice_node = Time_slice_node(timeslice_node_dict["gate_operation"])
     for property in timeslice_node_dict:
         if property == "gate_operation":
             continue
         setattr(timeslice_node, property, timeslice_node_dict[property])
+    # The lists of the json file are stored as tuples in the timeslice node
+    timeslice_node.set_connected_qubits(timeslice_node.connected_qubits, table)
+    timeslice_node.set_connected_cregs(timeslice_node.connected_cregs)
+    timeslice_node.set_parameters(timeslice_node.parameters)
     return timeslice_node
 
 # Function to dump the quantum circuit into a json file
 def dump_to_json(quantumcircuit):
+    # The symbolic parameters have no json representation, so the circuit has to be bound first
+    unbound = quantumcircuit.free_parameters()
+    if unbound:
+        raise ValueError(f"The circuit cannot be dumped into a json file before the free parameters {', '.join(sorted(unbound))} are bound")
     quantumcircuit_dict = {}
     quantumcircuit_dict["name"] = quantumcircuit.name
     quantumcircuit_dict["cregs_size"] = quantumcircuit.cregs_size
@@ -46,12 +61,16 @@ def dump_to_json(quantumcircuit):
     quantumcircuit_dict["creg_max_time_slice"] = quantumcircuit.creg_max_time_slice
     quantumcircuit_dict["max_time_slice"] = quantumcircuit.max_time_slice
     quantumcircuit_dict["measured_max_time_slice"] = quantumcircuit.measured_max_time_slice
-    quantumcircuit_dict["cregs"] = quantumcircuit.cregs
+    quantumcircuit_dict["cregs"] = {}
+    for creg in quantumcircuit.cregs:
+        quantumcircuit_dict["cregs"][creg] = {}
+        for timeslice in quantumcircuit.cregs[creg]:
+            quantumcircuit_dict["cregs"][creg][timeslice_key(timeslice)] = quantumcircuit.cregs[creg][timeslice]
     quantumcircuit_dict["qubits"] = {}
     for qubit in quantumcircuit.qubits:
         quantumcircuit_dict["qubits"][qubit] = {}
         for timeslice in quantumcircuit.qubits[qubit]:
-            quantumcircuit_dict["qubits"][qubit][timeslice] = timeslice_node_to_dict(quantumcircuit.qubits[qubit][timeslice])
+            quantumcircuit_dict["qubits"][qubit][timeslice_key(timeslice)] = timeslice_node_to_dict(quantumcircuit.qubits[qubit][timeslice])
     with open(quantumcircuit.name+".json", 'w') as f:
             json.dump(quantumcircuit_dict, f, indent=4)
 
@@ -60,12 +79,17 @@ def load_from_json(filename, quantumcircuit):
     with open(filename, 'r') as f:
         quantumcircuit_dict = json.load(f)
         for property in quantumcircuit_dict:
-            # Skip the qubits
-            if property == "qubits":
+            # Skip the qubits and cregs
+            if property == "qubits" or property == "cregs":
                 continue
             setattr(quantumcircuit, property, quantumcircuit_dict[property])
+        # Set the cregs and the measured qubits of their timeslices to the quantum circuit
+        for creg in quantumcircuit_dict["cregs"]:
+            quantumcircuit.cregs[creg] = {}
+            for timeslice in quantumcircuit_dict["cregs"][creg]:
+                quantumcircuit.cregs[creg][timeslice_index(timeslice)] = quantumcircuit_dict["cregs"][creg][timeslice]
         # Set the qubits and its corresponding timeslice nodes to the quantum circuit
         for qubit in quantumcircuit_dict["qubits"]:
             quantumcircuit.qubits[qubit] = {}
             for timeslice in quantumcircuit_dict["qubits"][qubit]:
-                quantumcircuit.qubits[qubit][timeslice] = dict_to_timeslice_node(quantumcircuit_dict["qubits"][qubit][timeslice])
\ No newline at end of file
+                quantumcircuit.add_node(qubit, timeslice_index(timeslice), dict_to_timeslice_node(quantumcircuit_dict["qubits"][qubit][timeslice], quantumcircuit.connected_qubits_table))
\ No newline at end of file
@@ -11,17 +11,31 @@ The quantum circuit after the segmentation would be described by a 3D graph
 '''
 from qsofinstr.InstructionGenerator.instruction import Instructions
 from qsofinstr.hardware_specification import Specification
-from qsofinstr.timeslice import Time_slice_node
+from qsofinstr.timeslice import Time_slice_node, Symbolic_parameter
 from qsofinstr.IR.QASM2.qasm2_parser import Parser
 import struct
+import copy
 import qsofinstr.qc_configure
+import qsofinstr.columnar
 
 class Quantum_circuit:
     def __init__(self):
         self.name = ""
         self.qubits = {}
+        # The interned tuples of the names of the connected qubits of the timeslice nodes, so that the nodes of the same group of qubits share one tuple
+        self.connected_qubits_table = {}
+        # The occupied cells of each timeslice as (qubit, timeslice node) keyed by the qubit index, so that the passes over the circuit only visit
+        # the operations and a cell is replaced in place
+        self.timeslices = {}
+        # The occupancy bitmap of each timeslice with one bit per qubit index, and the first and last occupied timeslices
+        self.timeslice_occupancy = {}
+        self.first_time_slice = 0
+        self.last_time_slice = 0
         self.cregs = {}
         self.cregs_size = {} # This is used to store the size of each creg, which is used for two kinds of if condition
+        # The names of the qubits and classical bits of each register, which are used to apply an operation to a whole register
+        self.qreg_qubits = {}
+        self.creg_bits = {}
         # The following two dictionaries are used to store the index of each qubit and creg mainly for instruction generation
         self.qubits_idx = {}
         self.cregs_idx = {}
@@ -47,17 +61,21 @@ class Quantum_circuit:
     
     # Add a new qubit with the given name and size to the current circuit
     def add_qubit(self, qubit_name, size):
+        self.qreg_qubits[qubit_name] = []
         for i in range(size):
-            self.qubits[qubit_name + f"[{i}]"] = {} # the value of each qubit is a dictionary, where key is timeslice and value is the timeslice node
+            self.qubits[qubit_name + f"[{i}]"] = {} # the value of each qubit is a dictionary, where key is the timeslice index and value is the timeslice node
             self.qubits_idx[qubit_name + f"[{i}]"] = self.qubits_idx_idx
             self.qubits_idx_idx += 1
+            self.qreg_qubits[qubit_name].append(qubit_name + f"[{i}]")
     
     def add_creg(self, creg_name, size):
         self.cregs_size[creg_name] = size
+        self.creg_bits[creg_name] = []
         for i in range(size):
             self.cregs[creg_name + f"[{i}]"] = {}
             self.cregs_idx[creg_name + f"[{i}]"] = self.cregs_idx_idx
             self.cregs_idx_idx += 1
+            self.creg_bits[creg_name].append(creg_name + f"[{i}]")
     
     #================================================================================================
     # The following functions are used to add the quantum operations to the circuit
@@ -71,6 +89,40 @@ class Quantum_circuit:
         else:
             self.qubit_max_time_slice[qubit_name + f"[{size}]"] = time_slice_index
     
+    # Add the timeslice node of the qubit at the timeslice to the circuit and to the cells of the timeslice
+    def add_node(self, qubit, time_slice, time_slice_node):
+        # The hardware specification can put a node on an occupied cell, the replaced node is overwritten in its cell
+        self.qubits[qubit][time_slice] = time_slice_node
+        if time_slice not in self.timeslices:
+            self.timeslices[time_slice] = {}
+            self.timeslice_occupancy[time_slice] = 0
+            if self.first_time_slice == 0 or time_slice < self.first_time_slice:
+                self.first_time_slice = time_slice
+            self.last_time_slice = max(self.last_time_slice, time_slice)
+        self.timeslices[time_slice][self.qubits_idx[qubit]] = (qubit, time_slice_node)
+        self.timeslice_occupancy[time_slice] |= 1 << self.qubits_idx[qubit]
+    
+    # Remove all the timeslice nodes from the circuit, the given qubits are kept without any operation
+    def reset_nodes(self, qubits):
+        self.qubits = {qubit: {} for qubit in qubits}
+        self.timeslices = {}
+        self.timeslice_occupancy = {}
+        self.first_time_slice = 0
+        self.last_time_slice = 0
+    
+    # Return the occupied cells of the timeslice in the order of the qubits
+    def timeslice_cells(self, time_slice):
+        if time_slice not in self.timeslices:
+            return []
+        cells = self.timeslices[time_slice]
+        return [cells[qubit_idx] for qubit_idx in sorted(cells)]
+    
+    # Iterate over the occupied cells of the circuit as (timeslice, qubit, timeslice node), in the order of the timeslices and the qubits
+    def occupied_cells(self):
+        for time_slice in sorted(self.timeslices):
+            for qubit, time_slice_node in self.timeslice_cells(time_slice):
+                yield time_slice, qubit, time_slice_node
+    
     # Add a new no parameter single qubit gate to the circuit
     def add_single_qubit_gate_no_parameter(self, gate_name, qubit_name, index=-1, if_creg=None, if_num=0, if_flag=False):
         # Check if the gate is conditioned
@@ -95,7 +147,7 @@ class Quantum_circuit:
             time_slice_node.if_num = int(if_num)
             time_slice_node.if_creg = if_creg_name
             time_slice_node.if_kind = if_kind
-        self.qubits[qubit][f"timeslice_{time_slice}"] = time_slice_node
+        self.add_node(qubit, time_slice, time_slice_node)
         self.max_time_slice = max(self.max_time_slice, time_slice)  
     
     # Add a new single qubit gate with parameter to the circuit
@@ -117,15 +169,47 @@ class Quantum_circuit:
         time_slice_node = Time_slice_node(gate_name)
         time_slice_node.with_parameter = True
         time_slice_node.time_slice_index = time_slice
-        time_slice_node.add_parameter(parameter)
+        time_slice_node.set_parameters(parameter)
         if if_flag:
             time_slice_node.if_flag = True
             time_slice_node.if_num = int(if_num)
             time_slice_node.if_creg = if_creg_name
             time_slice_node.if_kind = if_kind
-        self.qubits[qubit][f"timeslice_{time_slice}"] = time_slice_node
+        self.add_node(qubit, time_slice, time_slice_node)
         self.max_time_slice = max(self.max_time_slice, time_slice)
     
+    # Add a single qubit gate to all the qubits of a register, the gate has no parameter if the parameter is None
+    def add_single_qubit_gate_register(self, gate_name, qubit_name, parameter=None, if_creg=None, if_num=0, if_flag=False):
+        # Check if the gate is conditioned, the condition is the same for all the qubits
+        creg_time_slice = 0
+        if_kind = 0
+        if if_flag:
+            if (if_creg[1] == -1) and (self.cregs_size[if_creg[0]] > 1):
+                if_creg_name = if_creg[0]
+                if_kind = 1
+            else:
+                if_creg_name = if_creg[0] + f"[{if_creg[1]}]" if if_creg[1] != -1 else if_creg[0]+"[0]"
+            if_num = int(if_num)
+            creg_time_slice = self.measured_max_time_slice + 1
+        max_time_slice = self.max_time_slice
+        for qubit in self.qreg_qubits[qubit_name]:
+            time_slice = max(self.qubit_max_time_slice[qubit] + 1, creg_time_slice)
+            self.qubit_max_time_slice[qubit] = time_slice
+            time_slice_node = Time_slice_node(gate_name)
+            time_slice_node.time_slice_index = time_slice
+            if parameter is not None:
+                time_slice_node.with_parameter = True
+                time_slice_node.set_parameters(parameter)
+            if if_flag:
+                time_slice_node.if_flag = True
+                time_slice_node.if_num = if_num
+                time_slice_node.if_creg = if_creg_name
+                time_slice_node.if_kind = if_kind
+            self.add_node(qubit, time_slice, time_slice_node)
+            if time_slice > max_time_slice:
+                max_time_slice = time_slice
+        self.max_time_slice = max_time_slice
+    
     # Add a new controlled single qubit gate without parameter to the circuit
     def add_controlled_gate_no_parameter(self, gate_name, control_qubit, target_qubit, target_index=-1, if_creg=None, if_num=0, if_flag=False):
         if_creg_name = ""
@@ -159,7 +243,7 @@ class Quantum_circuit:
         time_slice_node_target = Time_slice_node(gate_name)
         time_slice_node_target.time_slice_index = max_time_slice
         time_slice_node_target.controlled_operation = True # Set the controlled_operation flag to True to indicate this is a controlled gate
-        time_slice_node_target.add_connected_qubit(qubit_names[1:])
+        time_slice_node_target.set_connected_qubits(qubit_names[1:], self.connected_qubits_table)
         # Add the conditioned variables to the target timeslice node
         if if_flag:
             time_slice_node_target.if_flag = True
@@ -167,7 +251,7 @@ class Quantum_circuit:
             time_slice_node_target.if_creg = if_creg_name
             time_slice_node_target.if_kind = if_kind
         # Add the new timeslice node of the target qubit to the circuit
-        self.qubits[qubit_names[0]][f"timeslice_{max_time_slice}"] = time_slice_node_target
+        self.add_node(qubit_names[0], max_time_slice, time_slice_node_target)
         # Loop through all the control qubits and add the new timeslice node to the circuit with the current timeslice index
         for i in range(1, len(qubit_names)):
             qubit = qubit_names[i]
@@ -176,15 +260,14 @@ class Quantum_circuit:
             time_slice_node_control.time_slice_index = max_time_slice
             time_slice_node_control.target_qubit = False # Set the target_qubit flag to False to indicate this is a control qubit
             time_slice_node_control.controlled_operation = True # Set the controlled_operation flag to True to indicate this is a controlled gate
-            time_slice_node_control.add_connected_qubit(qubit_names[0:i])
-            time_slice_node_control.add_connected_qubit(qubit_names[i+1:])
+            time_slice_node_control.set_connected_qubits(qubit_names[0:i]+qubit_names[i+1:], self.connected_qubits_table)
             # Add the conditioned variables to the control timeslice node
             if if_flag:
                 time_slice_node_control.if_flag = True
                 time_slice_node_control.if_num = if_creg_num
                 time_slice_node_control.if_creg = if_creg_name
                 time_slice_node_control.if_kind = if_kind
-            self.qubits[qubit][f"timeslice_{max_time_slice}"] = time_slice_node_control
+            self.add_node(qubit, max_time_slice, time_slice_node_control)
         # Update the maximum timeslice index of the circuit
         self.max_time_slice = max(self.max_time_slice, max_time_slice)
     
@@ -220,10 +303,10 @@ class Quantum_circuit:
         self.qubit_max_time_slice[qubit_names[0]] = max_time_slice
         time_slice_node_target = Time_slice_node(gate_name)
         time_slice_node_target.with_parameter = True
-        time_slice_node_target.add_parameter(parameter)
+        time_slice_node_target.set_parameters(parameter)
         time_slice_node_target.time_slice_index = max_time_slice
         time_slice_node_target.controlled_operation = True # Set the controlled_operation flag to True to indicate this is a controlled gate
-        time_slice_node_target.add_connected_qubit(qubit_names[1:])
+        time_slice_node_target.set_connected_qubits(qubit_names[1:], self.connected_qubits_table)
         # Add the conditioned variables to the target timeslice node
         if if_flag:
             time_slice_node_target.if_flag = True
@@ -231,7 +314,7 @@ class Quantum_circuit:
             time_slice_node_target.if_creg = if_creg_name
             time_slice_node_target.if_kind = if_kind
         # Add the new timeslice node of the target qubit to the circuit
-        self.qubits[qubit_names[0]][f"timeslice_{max_time_slice}"] = time_slice_node_target
+        self.add_node(qubit_names[0], max_time_slice, time_slice_node_target)
         # Loop through all the control qubits and add the new timeslice node to the circuit with the current timeslice index
         for i in range(1, len(qubit_names)):
             qubit = qubit_names[i]
@@ -239,26 +322,33 @@ class Quantum_circuit:
             time_slice_node_control = Time_slice_node(gate_name)
             time_slice_node_control.with_parameter = True
             time_slice_node_control.time_slice_index = max_time_slice
-            time_slice_node_control.add_parameter(parameter)
+            time_slice_node_control.set_parameters(parameter)
             time_slice_node_control.target_qubit = False # Set the target_qubit flag to False to indicate this is a control qubit
             time_slice_node_control.controlled_operation = True # Set the controlled_operation flag to True to indicate this is a controlled gate
-            time_slice_node_control.add_connected_qubit(qubit_names[0:i])
-            time_slice_node_control.add_connected_qubit(qubit_names[i+1:])
+            time_slice_node_control.set_connected_qubits(qubit_names[0:i]+qubit_names[i+1:], self.connected_qubits_table)
             # Add the conditioned variables to the control timeslice node
             if if_flag:
                 time_slice_node_control.if_flag = True
                 time_slice_node_control.if_num = if_creg_num
                 time_slice_node_control.if_creg = if_creg_name
                 time_slice_node_control.if_kind = if_kind
-            self.qubits[qubit][f"timeslice_{max_time_slice}"] = time_slice_node_control
+            self.add_node(qubit, max_time_slice, time_slice_node_control)
         # Update the maximum timeslice index of the circuit
         self.max_time_slice = max(self.max_time_slice, max_time_slice)
     
     # Add the measurement operation to the circuit
     def add_measurement(self, qubit, creg, if_creg=None, if_num=0, if_flag=False):
+        qubit_names = [qubit[i][0] + f"[{qubit[i][1]}]" if qubit[i][1] != -1 else qubit[i][0]+"[0]" for i in range(len(qubit))]
+        creg_names = [creg[i][0] + f"[{creg[i][1]}]" if creg[i][1] != -1 else creg[i][0]+"[0]" for i in range(len(creg))]
+        self.measure_qubits(qubit_names, creg_names, if_creg, if_num, if_flag)
+    
+    # Measure all the qubits of a register into the classical bits of a register of the same size
+    def add_measurement_register(self, qreg, creg, if_creg=None, if_num=0, if_flag=False):
+        self.measure_qubits(self.qreg_qubits[qreg], self.creg_bits[creg], if_creg, if_num, if_flag)
+    
+    # Add the measurement of the qubits into the classical bits, both given by their names
+    def measure_qubits(self, qubit_names, creg_names, if_creg=None, if_num=0, if_flag=False):
         max_time_slice = 0
-        qubit_names = []
-        creg_names = []
         creg_time_slice = 0
         if_creg_name = ""
         if_creg_num = 0
@@ -272,12 +362,7 @@ class Quantum_circuit:
             if_creg_num = int(if_num)
             # creg_time_slice = self.creg_max_time_slice[if_creg_name] + 1
             creg_time_slice = self.measured_max_time_slice + 1
-        for i in range(len(qubit)):
-            # Get the qubit name and the creg name
-            qubit_name = qubit[i][0] + f"[{qubit[i][1]}]" if qubit[i][1] != -1 else qubit[i][0]+"[0]"
-            creg_name = creg[i][0] + f"[{creg[i][1]}]" if creg[i][1] != -1 else creg[i][0]+"[0]"
-            qubit_names.append(qubit_name)
-            creg_names.append(creg_name)
+        for qubit_name in qubit_names:
             # Set the maximum timeslice index for the current qubit
             time_slice = self.qubit_max_time_slice[qubit_name] + 1
             max_time_slice = time_slice if time_slice > max_time_slice else max_time_slice
@@ -293,7 +378,7 @@ class Quantum_circuit:
             # Create a new timeslice node for the current qubit
             time_slice_node = Time_slice_node("M")
             time_slice_node.time_slice_index = max_time_slice
-            time_slice_node.connected_cregs.append(creg_names[i])
+            time_slice_node.set_connected_cregs((creg_names[i],))
             time_slice_node.measurement = True
             # Add the conditioned variables to the measurement timeslice node
             if if_flag:
@@ -302,16 +387,24 @@ class Quantum_circuit:
                 time_slice_node.if_creg = if_creg_name
                 time_slice_node.if_kind = if_kind
             # Add the new timeslice node to the circuit
-            self.qubits[qubit_names[i]][f"timeslice_{max_time_slice}"] = time_slice_node
+            self.add_node(qubit_names[i], max_time_slice, time_slice_node)
             # Add the qubit of current timeslice index to the creg
-            self.cregs[creg_names[i]][f"timeslice_{max_time_slice}"] = qubit_names[i]
+            self.cregs[creg_names[i]][max_time_slice] = qubit_names[i]
             # Set the maximum timeslice index for the circuit
         self.max_time_slice = max(self.max_time_slice, max_time_slice)
     
     # Add the reset operation to the circuit
     def add_reset(self, qubit, if_creg=None, if_num=0, if_flag=False):
+        qubit_names = [qubit[i][0] + f"[{qubit[i][1]}]" if qubit[i][1] != -1 else qubit[i][0]+"[0]" for i in range(len(qubit))]
+        self.reset_qubits(qubit_names, if_creg, if_num, if_flag)
+    
+    # Reset all the qubits of a register
+    def add_reset_register(self, qreg, if_creg=None, if_num=0, if_flag=False):
+        self.reset_qubits(self.qreg_qubits[qreg], if_creg, if_num, if_flag)
+    
+    # Add the reset of the qubits given by their names
+    def reset_qubits(self, qubit_names, if_creg=None, if_num=0, if_flag=False):
         max_time_slice = 0
-        qubit_names = []
         if_creg_name = ""
         if_creg_num = 0
         if_kind = 0
@@ -322,10 +415,7 @@ class Quantum_circuit:
             else:
                 if_creg_name = if_creg[0] + f"[{if_creg[1]}]" if if_creg[1] != -1 else if_creg[0]+"[0]"
             if_creg_num = int(if_num)
-        for i in range(len(qubit)):
-            # Get the qubit name
-            qubit_name = qubit[i][0] + f"[{qubit[i][1]}]" if qubit[i][1] != -1 else qubit[i][0]+"[0]"
-            qubit_names.append(qubit_name)
+        for qubit_name in qubit_names:
             # Set the maximum timeslice index for the current qubit
             time_slice = self.qubit_max_time_slice[qubit_name] + 1
             max_time_slice = time_slice if time_slice > max_time_slice else max_time_slice
@@ -342,7 +432,7 @@ class Quantum_circuit:
                 time_slice_node.if_creg = if_creg_name
                 time_slice_node.if_kind = if_kind
             # Add the new timeslice node to the circuit
-            self.qubits[qubit_names[i]][f"timeslice_{max_time_slice}"] = time_slice_node
+            self.add_node(qubit_names[i], max_time_slice, time_slice_node)
             # Set the maximum timeslice index for the circuit
         self.max_time_slice = max(self.max_time_slice, max_time_slice)
     
@@ -365,7 +455,7 @@ class Quantum_circuit:
             # Set the barrier flag to True to indicate this is a barrier operation
             time_slice_node.barrier = True
             # Add the new timeslice node to the circuit
-            self.qubits[qubit_names[i]][f"timeslice_{max_time_slice}"] = time_slice_node
+            self.add_node(qubit_names[i], max_time_slice, time_slice_node)
             # Set the maximum timeslice index for the circuit
         self.max_time_slice = max(self.max_time_slice, max_time_slice)
     
@@ -399,20 +489,55 @@ class Quantum_circuit:
             time_slice_node_opaque = Time_slice_node(opaque_name)
             if parameter:
                 time_slice_node_opaque.with_parameter = True
-                time_slice_node_opaque.add_parameter(parameter) 
+                time_slice_node_opaque.set_parameters(parameter) 
             time_slice_node_opaque.time_slice_index = max_time_slice
-            time_slice_node_opaque.add_connected_qubit(qubit_names[0:i])
-            time_slice_node_opaque.add_connected_qubit(qubit_names[i+1:])
+            time_slice_node_opaque.set_connected_qubits(qubit_names[0:i]+qubit_names[i+1:], self.connected_qubits_table)
             # Add the conditioned variables to the control timeslice node
             if if_flag:
                 time_slice_node_opaque.if_flag = True
                 time_slice_node_opaque.if_num = if_creg_num
                 time_slice_node_opaque.if_creg = if_creg_name
                 time_slice_node_opaque.if_kind = if_kind
-            self.qubits[qubit][f"timeslice_{max_time_slice}"] = time_slice_node_opaque
+            self.add_node(qubit, max_time_slice, time_slice_node_opaque)
         # Update the maximum timeslice index of the circuit
         self.max_time_slice = max(self.max_time_slice, max_time_slice)
     
+    # Return the names of the free parameters used by the symbolic parameters of the circuit
+    def free_parameters(self):
+        names = set()
+        for cells in self.timeslices.values():
+            for _, time_slice_node in cells.values():
+                if time_slice_node.with_parameter:
+                    for parameter in time_slice_node.parameters:
+                        if isinstance(parameter, Symbolic_parameter):
+                            names |= parameter.names
+        return names
+    
+    # Return the circuit with the symbolic parameters computed from the values of the free parameters, which is a dictionary with
+    # the names of the free parameters as the keys. The timeslices are kept, and only the nodes with symbolic parameters are copied
+    def bind(self, values):
+        unbound = self.free_parameters() - set(values)
+        if unbound:
+            raise ValueError(f"No values are given for the free parameters {', '.join(sorted(unbound))}")
+        quantumcircuit = copy.copy(self)
+        # The registers and the bookkeeping of the circuit are copied as well, so that the bound circuit can be changed on its own
+        quantumcircuit.cregs = {creg: dict(timeslices) for creg, timeslices in self.cregs.items()}
+        quantumcircuit.cregs_size = dict(self.cregs_size)
+        quantumcircuit.qreg_qubits = {qreg: list(qubits) for qreg, qubits in self.qreg_qubits.items()}
+        quantumcircuit.creg_bits = {creg: list(bits) for creg, bits in self.creg_bits.items()}
+        quantumcircuit.qubits_idx = dict(self.qubits_idx)
+        quantumcircuit.cregs_idx = dict(self.cregs_idx)
+        quantumcircuit.qubit_max_time_slice = dict(self.qubit_max_time_slice)
+        quantumcircuit.creg_max_time_slice = dict(self.creg_max_time_slice)
+        quantumcircuit.connected_qubits_table = dict(self.connected_qubits_table)
+        quantumcircuit.reset_nodes(self.qubits)
+        for timeslice, qubit, time_slice_node in self.occupied_cells():
+            if time_slice_node.with_parameter and any(isinstance(parameter, Symbolic_parameter) for parameter in time_slice_node.parameters):
+                time_slice_node = copy.copy(time_slice_node)
+                time_slice_node.parameters = tuple(parameter.bind(values) if isinstance(parameter, Symbolic_parameter) else parameter for parameter in time_slice_node.parameters)
+            quantumcircuit.add_node(qubit, timeslice, time_slice_node)
+        return quantumcircuit
+    
     #================================================================================================
     # The following functions are the decorators for hardware specification and optimization
     #================================================================================================
@@ -446,6 +571,13 @@ class Quantum_circuit:
         qsofinstr.qc_configure.load_from_json(jsonfile, QC)
         return QC
     
+    # Generate the quantum circuit from the columnar circuit
+    @staticmethod
+    def from_columnar(columnar):
+        QC = Quantum_circuit()
+        qsofinstr.columnar.load_from_columnar(columnar, QC)
+        return QC
+    
     #================================================================================================
     # The following functions are used to generate the instruction
     #================================================================================================
@@ -534,6 +666,10 @@ class Quantum_circuit:
     def to_json(self):
         qsofinstr.qc_configure.dump_to_json(self)
     
+    # Convert the quantum circuit into the columnar circuit
+    def to_columnar(self):
+        return qsofinstr.columnar.dump_to_columnar(self)
+    
     #================================================================================================
     # The following functions are used for testing
     #================================================================================================
@@ -567,10 +703,12 @@ class Quantum_circuit:
             qubit_pos.append(pos)
             pos += len(qubit+"               ")
         idx = 0
-        for i in range(1, self.max_time_slice+1):
-            idx = idx if self.check_empty_timeslice(i) else idx+1
-            if self.check_empty_timeslice(i):
+        # Only the non-empty timeslices are drawn
+        for i in sorted(self.timeslices):
+            if i < 1 or i > self.max_time_slice:
                 continue
+            idx += 1
+            cells = dict(self.timeslice_cells(i))
             circuit_str += "\n"+" "*(len(str(int(self.max_time_slice)))+2)
             circuit_str += "|"
             for j in range(1, len(qubit_pos)):
@@ -580,71 +718,72 @@ class Quantum_circuit:
             pos_idx = 0
             operation_len = 1
             for qubit in self.qubits:
-                if f"timeslice_{i}" in self.qubits[qubit]:
+                if qubit in cells:
+                    node = cells[qubit]
                     if_str = ""
                     # Check if the current qubit is under the if condition
-                    if self.qubits[qubit][f"timeslice_{i}"].if_flag:
-                        if_str = f"|{self.qubits[qubit][f'timeslice_{i}'].if_creg}={self.qubits[qubit][f'timeslice_{i}'].if_num}"
+                    if node.if_flag:
+                        if_str = f"|{node.if_creg}={node.if_num}"
                     if pos_idx == 0:
                         # Check for the reset operation
-                        if self.qubits[qubit][f"timeslice_{i}"].reset:
+                        if node.reset:
                             circuit_str += "reset"+if_str
                             operation_len = 5 + len(if_str)
                         # Check for the measurement operation
-                        elif self.qubits[qubit][f"timeslice_{i}"].measurement:
-                            creg = self.qubits[qubit][f"timeslice_{i}"].connected_cregs
+                        elif node.measurement:
+                            creg = node.connected_cregs
                             creg_names = f"{', '.join(map(str, creg))}"
                             circuit_str += "M -> "+creg_names + if_str
                             operation_len = len(creg_names)+5+len(if_str)
                         # Check for the controlled operation
-                        elif self.qubits[qubit][f"timeslice_{i}"].controlled_operation:
-                            if self.qubits[qubit][f"timeslice_{i}"].target_qubit:
-                                gate_name = self.qubits[qubit][f"timeslice_{i}"].gate_operation
-                                parameter = self.qubits[qubit][f"timeslice_{i}"].parameters
-                                name = f"{gate_name}({', '.join(map(str, parameter))})" if self.qubits[qubit][f"timeslice_{i}"].with_parameter else gate_name
+                        elif node.controlled_operation:
+                            if node.target_qubit:
+                                gate_name = node.gate_operation
+                                parameter = node.parameters
+                                name = f"{gate_name}({', '.join(map(str, parameter))})" if node.with_parameter else gate_name
                                 circuit_str += name+" o"+if_str
                                 operation_len = len(name)+2+len(if_str)
                             else:
-                                gate_name = self.qubits[qubit][f"timeslice_{i}"].gate_operation
-                                parameter = self.qubits[qubit][f"timeslice_{i}"].parameters
-                                name = f"{gate_name}({', '.join(map(str, parameter))})" if self.qubits[qubit][f"timeslice_{i}"].with_parameter else gate_name
-                                circuit_str += name+" "+self.qubits[qubit][f"timeslice_{i}"].connected_qubits[0]+if_str
-                                operation_len = len(name)+len(self.qubits[qubit][f"timeslice_{i}"].connected_qubits[0])+1+len(if_str)
+                                gate_name = node.gate_operation
+                                parameter = node.parameters
+                                name = f"{gate_name}({', '.join(map(str, parameter))})" if node.with_parameter else gate_name
+                                circuit_str += name+" "+node.connected_qubits[0]+if_str
+                                operation_len = len(name)+len(node.connected_qubits[0])+1+len(if_str)
                         else:
-                            gate_name = self.qubits[qubit][f"timeslice_{i}"].gate_operation
-                            parameter = self.qubits[qubit][f"timeslice_{i}"].parameters
-                            name = f"{gate_name}({', '.join(map(str, parameter))})" if self.qubits[qubit][f"timeslice_{i}"].with_parameter else gate_name
+                            gate_name = node.gate_operation
+                            parameter = node.parameters
+                            name = f"{gate_name}({', '.join(map(str, parameter))})" if node.with_parameter else gate_name
                             circuit_str += name+if_str
                             operation_len = len(name)+len(if_str)
                     else:
                         # Check for the reset operation
-                        if self.qubits[qubit][f"timeslice_{i}"].reset:
+                        if node.reset:
                             circuit_str += " " *(qubit_pos[pos_idx]-qubit_pos[pos_idx-1]-operation_len) + "reset"+if_str
                             operation_len = 5+len(if_str)
                         # Check for the measurement operation
-                        elif self.qubits[qubit][f"timeslice_{i}"].measurement:
-                            creg = self.qubits[qubit][f"timeslice_{i}"].connected_cregs
+                        elif node.measurement:
+                            creg = node.connected_cregs
                             creg_names = f"{', '.join(map(str, creg))}"
                             circuit_str += " " *(qubit_pos[pos_idx]-qubit_pos[pos_idx-1]-operation_len) + "M -> "+creg_names+if_str
                             operation_len = len(creg_names)+5+len(if_str)
                         # Check for the controlled operations
-                        elif self.qubits[qubit][f"timeslice_{i}"].controlled_operation:
-                            if self.qubits[qubit][f"timeslice_{i}"].target_qubit:
-                                gate_name = self.qubits[qubit][f"timeslice_{i}"].gate_operation
-                                parameter = self.qubits[qubit][f"timeslice_{i}"].parameters
-                                name = f"{gate_name}({', '.join(map(str, parameter))})" if self.qubits[qubit][f"timeslice_{i}"].with_parameter else gate_name
+                        elif node.controlled_operation:
+                            if node.target_qubit:
+                                gate_name = node.gate_operation
+                                parameter = node.parameters
+                                name = f"{gate_name}({', '.join(map(str, parameter))})" if node.with_parameter else gate_name
                                 circuit_str += " " *(qubit_pos[pos_idx]-qubit_pos[pos_idx-1]-operation_len)+name+" o"+if_str
                                 operation_len = len(name)+2+len(if_str)
                             else:
-                                gate_name = self.qubits[qubit][f"timeslice_{i}"].gate_operation
-                                parameter = self.qubits[qubit][f"timeslice_{i}"].parameters
-                                name = f"{gate_name}({', '.join(map(str, parameter))})" if self.qubits[qubit][f"timeslice_{i}"].with_parameter else gate_name
-                                circuit_str += " " *(qubit_pos[pos_idx]-qubit_pos[pos_idx-1]-operation_len)+name+" "+self.qubits[qubit][f"timeslice_{i}"].connected_qubits[0]+if_str
-                                operation_len = len(name)+len(self.qubits[qubit][f"timeslice_{i}"].connected_qubits[0])+1+len(if_str)
+                                gate_name = node.gate_operation
+                                parameter = node.parameters
+                                name = f"{gate_name}({', '.join(map(str, parameter))})" if node.with_parameter else gate_name
+                                circuit_str += " " *(qubit_pos[pos_idx]-qubit_pos[pos_idx-1]-operation_len)+name+" "+node.connected_qubits[0]+if_str
+                                operation_len = len(name)+len(node.connected_qubits[0])+1+len(if_str)
                         else:
-                            gate_name = self.qubits[qubit][f"timeslice_{i}"].gate_operation
-                            parameter = self.qubits[qubit][f"timeslice_{i}"].parameters
-                            name = f"{gate_name}({', '.join(map(str, parameter))})" if self.qubits[qubit][f"timeslice_{i}"].with_parameter else gate_name
+                            gate_name = node.gate_operation
+                            parameter = node.parameters
+                            name = f"{gate_name}({', '.join(map(str, parameter))})" if node.with_parameter else gate_name
                             circuit_str += " " *(qubit_pos[pos_idx]-qubit_pos[pos_idx-1]-operation_len) + name + if_str
                             operation_len = len(name)+len(if_str)
                 else:
@@ -659,10 +798,23 @@ class Quantum_circuit:
     
     # Helper function to check whether the current timeslice contains no operation
     def check_empty_timeslice(self, timeslice_idx):
-        for qubit in self.qubits:
-            if f"timeslice_{timeslice_idx}" in self.qubits[qubit]:
-                return False
-        return True
+        return self.timeslice_occupancy.get(timeslice_idx, 0) == 0
+    
+    # Return the occupancy bitmap of the timeslice, where the bit of each qubit index is set if the qubit has an operation
+    def get_timeslice_occupancy(self, timeslice_idx):
+        return self.timeslice_occupancy.get(timeslice_idx, 0)
+    
+    # Return the first timeslice index with an operation, which is 0 if the circuit is empty
+    def first_occupied_timeslice(self):
+        return self.first_time_slice
+    
+    # Return the last timeslice index with an operation, which is 0 if the circuit is empty
+    def last_occupied_timeslice(self):
+        return self.last_time_slice
+    
+    # Return the number of timeslices with at least one operation
+    def num_occupied_timeslices(self):
+        return len(self.timeslice_occupancy)
 
 # filepath = "IR/QASM2/Examples/test_instruction_control_condition.qasm"
 # # filepath = "IR/QASM2/Examples/iqft.qasm"
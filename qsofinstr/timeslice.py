@@ -4,6 +4,10 @@ for the specific qubit in the specific timeslice. Therefore, the timeslice node
 with the gate, its corresponding timeslice index, the qubits and classical registers that this qubit is connected to at this timeslice, and some other flags
 indicating whether the gate is under a classical condition or a measurement operation, etc.
 '''
+import math
+import operator
+import sys
+
 # The number requirement table for parameters of basic gates that need parameters
 Param_Num_Table = {
     "RTHETA": 1,
@@ -26,13 +30,106 @@ Opaque_Table = {
     "mixamp": 1,
     "mixphase": 1
 }
+
+# The symbols of the operations kept in the expressions of the symbolic parameters
+Binaryop_Table = {
+    operator.add: "+",
+    operator.sub: "-",
+    operator.mul: "*",
+    operator.truediv: "/",
+    operator.pow: "^"
+}
+Unaryop_Table = {
+    math.sin: "sin",
+    math.cos: "cos",
+    math.tan: "tan",
+    math.exp: "exp",
+    math.log: "ln",
+    math.sqrt: "sqrt"
+}
+
+# A parameter depending on the free parameters of the circuit, which is only computed when the circuit is bound to their values
+class Symbolic_parameter:
+    def __init__(self, expression, function, names=frozenset()):
+        self.expression = expression # The expression of the parameter, which is shown when drawing the circuit
+        self.function = function # The function computing the parameter from the dictionary of the values of the free parameters
+        self.names = names # The names of the free parameters in the expression
+    
+    def __repr__(self):
+        return self.expression
+    
+    def bind(self, values):
+        return self.function(values)
+    
+    # The free parameter with the given name
+    @staticmethod
+    def free(name):
+        return Symbolic_parameter(name, lambda values: values[name], frozenset((name,)))
+    
+    # Apply an operation to the operands, where some of them are symbolic parameters
+    @staticmethod
+    def apply(function, *operands):
+        if len(operands) == 1:
+            expression = f"{Unaryop_Table[function]}({operands[0]})"
+        else:
+            expression = f"({operands[0]}{Binaryop_Table[function]}{operands[1]})"
+        def bind(values):
+            return function(*[operand.bind(values) if isinstance(operand, Symbolic_parameter) else operand for operand in operands])
+        names = frozenset().union(*[operand.names for operand in operands if isinstance(operand, Symbolic_parameter)])
+        return Symbolic_parameter(expression, bind, names)
+    
+    def __add__(self, other):
+        return Symbolic_parameter.apply(operator.add, self, other)
+    
+    def __radd__(self, other):
+        return Symbolic_parameter.apply(operator.add, other, self)
+    
+    def __sub__(self, other):
+        return Symbolic_parameter.apply(operator.sub, self, other)
+    
+    def __rsub__(self, other):
+        return Symbolic_parameter.apply(operator.sub, other, self)
+    
+    def __mul__(self, other):
+        return Symbolic_parameter.apply(operator.mul, self, other)
+    
+    def __rmul__(self, other):
+        return Symbolic_parameter.apply(operator.mul, other, self)
+    
+    def __truediv__(self, other):
+        return Symbolic_parameter.apply(operator.truediv, self, other)
+    
+    def __rtruediv__(self, other):
+        return Symbolic_parameter.apply(operator.truediv, other, self)
+    
+    def __pow__(self, other):
+        return Symbolic_parameter.apply(operator.pow, self, other)
+    
+    def __rpow__(self, other):
+        return Symbolic_parameter.apply(operator.pow, other, self)
+# The empty tuple shared by the timeslice nodes without connected qubits, connected cregs or parameters
+EMPTY = ()
+
+# Return the interned tuple of the names of the connected qubits from the table, so that the nodes of the same group of qubits share one
+# tuple. The qubits are still referred to by name here, their integer ids are the qubits_idx of the quantum circuit
+# The table is kept by the quantum circuit, so the tuples are freed together with the circuit
+def intern_qubits(qubits, table):
+    if not qubits:
+        return EMPTY
+    qubits = tuple(qubits)
+    return table.setdefault(qubits, qubits)
+
 class Time_slice_node:
+    # The attributes are kept in slots instead of a dictionary, since there is one node for each qubit of each gate
+    __slots__ = ("gate_operation", "controlled_operation", "connected_qubits", "connected_cregs", "parameters", "target_qubit",
+                 "time_slice_index", "with_parameter", "measurement", "reset", "if_flag", "if_creg", "if_num", "if_kind", "barrier")
+    
     def __init__(self, gate_operation):
-        self.gate_operation = gate_operation
+        self.gate_operation = sys.intern(gate_operation)
         self.controlled_operation = False
-        self.connected_qubits = []
-        self.connected_cregs = []
-        self.parameters = []
+        self.connected_qubits = EMPTY # The tuples of connected qubits, connected cregs and parameters are replaced instead of changed
+        self.connected_cregs = EMPTY
+        self.parameters = EMPTY
         self.target_qubit = True
         self.time_slice_index = 0
         self.with_parameter = False # Flag to indicate if the gate has parameter
@@ -44,15 +141,15 @@ class Time_slice_node:
         self.if_kind = 0 # The kind of the condition, 0 for single bit == val, 1 for creg == val
         self.barrier = False # Flag to indicate if the gate is a barrier operation
     
-    def add_connected_qubit(self, qubits):
-        if isinstance(qubits, list):
-            self.connected_qubits.extend(qubits)
-        else:
-            self.connected_qubits.append(qubits)
+    # The tuples are built once from all the elements, the connected qubits are interned in the table of the quantum circuit
+    def set_connected_qubits(self, qubits, table):
+        self.connected_qubits = intern_qubits(qubits, table)
+    
+    def set_connected_cregs(self, cregs):
+        self.connected_cregs = tuple(cregs) if cregs else EMPTY
     
-    def add_parameter(self, parameter):
-        if isinstance(parameter, list):
-            self.parameters.extend(parameter)
+    def set_parameters(self, parameters):
+        if isinstance(parameters, (list, tuple)):
+            self.parameters = tuple(parameters) if parameters else EMPTY
         else:
-            self.parameters.append(parameter)
-    
\ No newline at end of file
+            self.parameters = (parameters,)
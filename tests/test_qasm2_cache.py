@@ -0,0 +1,78 @@
+import os
+import pytest
+from qsofinstr.IR.QASM2.qasm2_cache import Cache
+from qsofinstr.IR.QASM2.qasm2_token import Token
+from qsofinstr.IR.QASM2 import qasm2_token
+from qsofinstr.quantumcircuit import Quantum_circuit
+
+
+def write_program(directory, name, includes):
+    for include in includes:
+        (directory / include).write_text("OPENQASM 2.0;\ngate " + include.replace(".", "_") + " a { x a; }\n")
+    program = "OPENQASM 2.0;\n" + "".join(f"include \"{include}\";\n" for include in includes) + "qreg q[1];\n"
+    # The included files are only loaded for the gates they define
+    program += "".join(include.replace(".", "_") + " q[0];\n" for include in includes)
+    filename = directory / name
+    filename.write_text(program)
+    return str(filename)
+
+
+def test_only_included_files_are_kept(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Cache, "Entries", type(Cache.Entries)())
+    filename = write_program(tmp_path, "main.qasm", ["a.inc"])
+    Quantum_circuit.from_qasm2(filename)
+    paths = [file_key[0] for file_key in Cache.Entries]
+    assert paths == [os.path.abspath("a.inc")]
+
+
+def test_entries_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Cache, "Entries", type(Cache.Entries)())
+    monkeypatch.setattr(Cache, "Max_entries", 2)
+    filename = write_program(tmp_path, "main.qasm", ["a.inc", "b.inc", "c.inc"])
+    Quantum_circuit.from_qasm2(filename)
+    assert len(Cache.Entries) == 2
+
+
+def test_file_key_changes_with_replaced_keyword(tmp_path, monkeypatch):
+    filename = tmp_path / "a.inc"
+    filename.write_text("OPENQASM 2.0;\n")
+    monkeypatch.setattr(qasm2_token, "KEYWORDS", dict(qasm2_token.KEYWORDS))
+    file_key = Cache.file_key(str(filename))
+    # Replacing a keyword keeps the number of keywords
+    qasm2_token.KEYWORDS["h"] = (qasm2_token.TK_X, "X", 1, qasm2_token.FOLLOW_SPACE)
+    assert Cache.file_key(str(filename)) != file_key
+    Token.register_keyword("h", kind=qasm2_token.TK_H, string="H", follow=qasm2_token.FOLLOW_SPACE)
+    assert Cache.file_key(str(filename)) == file_key
+
+
+# Write the library whose gate body calls a gate it does not define, and the programs with and without that gate
+def write_programs_calling_undefined_gate(directory):
+    (directory / "lib.inc").write_text("OPENQASM 2.0;\ngate foo a { bar a; }\n")
+    (directory / "m1.qasm").write_text("OPENQASM 2.0;\ninclude \"lib.inc\";\nqreg q[1];\ngate bar a { x a; }\nfoo q[0];\n")
+    (directory / "m2.qasm").write_text("OPENQASM 2.0;\ninclude \"lib.inc\";\nqreg q[1];\nfoo q[0];\n")
+    return str(directory / "m1.qasm"), str(directory / "m2.qasm")
+
+
+def test_cached_definitions_check_called_gates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Cache, "Directory", str(tmp_path))
+    monkeypatch.setattr(Cache, "Entries", type(Cache.Entries)())
+    m1, m2 = write_programs_calling_undefined_gate(tmp_path)
+    Quantum_circuit.from_qasm2(m1)
+    # The definitions of lib.inc are loaded from the disk by the next process
+    Cache.Entries.clear()
+    with pytest.raises(SystemExit, match="gate bar not defined"):
+        Quantum_circuit.from_qasm2(m2)
+
+
+def test_shared_definitions_check_called_gates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Cache, "Entries", type(Cache.Entries)())
+    m1, m2 = write_programs_calling_undefined_gate(tmp_path)
+    Quantum_circuit.from_qasm2(m1)
+    # The entry of lib.inc is shared by the compilations in this process
+    assert len(Cache.Entries) == 1
+    with pytest.raises(SystemExit, match="gate bar not defined"):
+        Quantum_circuit.from_qasm2(m2)
@@ -0,0 +1,90 @@
+import sys
+from qsofinstr.IR.QASM2.qasm2_parser import Parser, Filesystem
+from qsofinstr.IR.QASM2.qasm2_token import Token
+from qsofinstr.IR.QASM2 import qasm2_token
+from qsofinstr.quantumcircuit import Quantum_circuit
+
+
+# Parse and generate the file, and return the parser with the circuit
+def compile_with_parser(filename):
+    quantumcircuit = Quantum_circuit()
+    parser = Parser(Parser.load_file(str(filename)))
+    parser.Recursive_Descent_Parsing()
+    parser.circuit_gen(quantumcircuit)
+    return parser, quantumcircuit
+
+
+def test_gate_expansions_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(Parser, "Max_gate_expansions", 8)
+    filename = tmp_path / "expansions.qasm"
+    calls = "".join(f"g({i}) q[0], q[1];\n" for i in range(100))
+    filename.write_text("OPENQASM 2.0;\nqreg q[2];\ngate g(a) p, r { rz(a) p; cx p, r; }\n" + calls + "g(92) q[1], q[0];\n")
+    parser, quantumcircuit = compile_with_parser(filename)
+    assert len(parser.gate_expansions) == 8
+    # The most recently used expansion is the last one
+    assert list(parser.gate_expansions)[-1] == ("g", (92,))
+    assert [node.parameters for node in quantumcircuit.qubits["q[1]"].values() if node.with_parameter] == [(92,)]
+
+
+def test_symbolic_parameters_are_not_memoized(tmp_path, monkeypatch):
+    monkeypatch.setattr(Parser, "Symbols", ["theta"])
+    filename = tmp_path / "symbolic.qasm"
+    filename.write_text("OPENQASM 2.0;\nqreg q[2];\ngate g(a) p, r { rz(a) p; cx p, r; }\n" + "g(theta) q[0], q[1];\n"*10)
+    parser, quantumcircuit = compile_with_parser(filename)
+    assert len(parser.gate_expansions) == 0
+    values = [node.parameters for node in quantumcircuit.bind({"theta": 0.5}).qubits["q[0]"].values() if node.with_parameter]
+    assert values == [(0.5,)]*10
+
+
+def test_deep_gate_chain(tmp_path):
+    # A chain of 10k gates, each calling the previous one, is expanded without raising the recursion limit
+    depth = 10000
+    recursion_limit = sys.getrecursionlimit()
+    definitions = "gate g0(t) p, r { rz(t) p; cx p, r; }\n" + "".join(f"gate g{i}(t) p, r {{ g{i-1}(t) p, r; }}\n" for i in range(1, depth))
+    filename = tmp_path / "deep_chain.qasm"
+    filename.write_text("OPENQASM 2.0;\nqreg q[2];\n" + definitions + f"g{depth-1}(0.5) q[0], q[1];\ng{depth-1}(0.25) q[1], q[0];\n")
+    quantumcircuit = Quantum_circuit.from_qasm2(str(filename))
+    assert sys.getrecursionlimit() == recursion_limit
+    cells = [(timeslice, qubit, node.gate_operation, node.parameters) for timeslice, qubit, node in quantumcircuit.occupied_cells()]
+    assert cells == [
+        (1, "q[0]", "rz", (0.5,)),
+        (2, "q[0]", "cx", ()), (2, "q[1]", "cx", ()),
+        (3, "q[1]", "rz", (0.25,)),
+        (4, "q[0]", "cx", ()), (4, "q[1]", "cx", ()),
+    ]
+
+
+# Return the sizes of the state kept by the parser after generating the statements of a streamed file
+def streamed_parser_state(filename):
+    include_dic = []
+    TK = qasm2_token.Token_stream(Token.Tokenize_stream(str(filename), include_file_list=include_dic))
+    file_node = Filesystem(str(filename), qasm2_token.Lazy_source(str(filename)), TK)
+    file_node.set_include_dict(include_dic)
+    parser = Parser(file_node)
+    quantumcircuit = Quantum_circuit()
+    parser.Recursive_Descent_Parsing(quantumcircuit)
+    return (len(parser.code), len(parser.gates), len(parser.gate_templates), len(parser.gate_expansions), len(TK.buffer)), quantumcircuit
+
+
+def test_streamed_parser_state_is_flat(tmp_path, monkeypatch):
+    # The expansions are kept across the statements, up to the bound
+    monkeypatch.setattr(Parser, "Max_gate_expansions", 8)
+    states = []
+    for n_statements in (100, 2000):
+        filename = tmp_path / f"stream_{n_statements}.qasm"
+        calls = "".join(f"g({i}) q[0], q[1];\nh q[{i % 2}];\n" for i in range(n_statements))
+        filename.write_text("OPENQASM 2.0;\nqreg q[2];\ngate g(a) p, r { rz(a) p; cx p, r; }\n" + calls)
+        state, quantumcircuit = streamed_parser_state(filename)
+        assert quantumcircuit.num_occupied_timeslices() > n_statements
+        states.append(state)
+    assert states[0] == states[1]
+
+
+def test_gate_body_uses_sibling_include(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.inc").write_text("OPENQASM 2.0;\ngate ga a { x a; }\n")
+    (tmp_path / "b.inc").write_text("OPENQASM 2.0;\ngate gb a { ga a; }\n")
+    filename = tmp_path / "main.qasm"
+    filename.write_text("OPENQASM 2.0;\ninclude \"a.inc\";\ninclude \"b.inc\";\nqreg q[1];\ngb q[0];\n")
+    parser, quantumcircuit = compile_with_parser(filename)
+    assert [(timeslice, qubit, node.gate_operation) for timeslice, qubit, node in quantumcircuit.occupied_cells()] == [(1, "q[0]", "x")]
@@ -0,0 +1,49 @@
+import pytest
+import qsofinstr.timeslice
+from qsofinstr.IR.QASM2.qasm2_parser import Parser
+from qsofinstr.IR.QASM2.qasm2_token import Token
+from qsofinstr.IR.QASM2 import qasm2_token
+from qsofinstr.quantumcircuit import Quantum_circuit
+
+
+NATIVE_GATE_QASM = """OPENQASM 2.0;
+qreg q[3];
+gate g(a) p, r { nrz(a) p; ncz p, r; nh r; }
+nh q[0];
+nrz(0.5) q[1];
+ncz q[0], q[2];
+g(0.25) q[1], q[2];
+"""
+
+
+# The tables changed by registering the native gates are replaced by copies, which are restored after the test
+@pytest.fixture
+def native_gate_tables(monkeypatch):
+    monkeypatch.setattr(qasm2_token, "KEYWORDS", dict(qasm2_token.KEYWORDS))
+    monkeypatch.setattr(qasm2_token, "KEYWORD_NAMES", dict(qasm2_token.KEYWORD_NAMES))
+    monkeypatch.setattr(Token, "Next_kind", Token.Next_kind)
+    monkeypatch.setattr(Parser, "UOP_TABLE", dict(Parser.UOP_TABLE))
+    monkeypatch.setattr(Parser, "CODE_GEN_TABLE", dict(Parser.CODE_GEN_TABLE))
+    monkeypatch.setattr(Parser, "Next_node_kind", Parser.Next_node_kind)
+    monkeypatch.setattr(qsofinstr.timeslice, "Param_Num_Table", dict(qsofinstr.timeslice.Param_Num_Table))
+
+
+def test_register_native_gate(tmp_path, native_gate_tables):
+    Parser.register_native_gate("nh", "single", "h")
+    Parser.register_native_gate("nrz", "single_parameter", "rz", 1)
+    Parser.register_native_gate("ncz", "controlled", "cz")
+    filename = tmp_path / "native_gate.qasm"
+    filename.write_text(NATIVE_GATE_QASM)
+    cells = [(timeslice, qubit, node.gate_operation, node.parameters) for timeslice, qubit, node in Quantum_circuit.from_qasm2(str(filename)).occupied_cells()]
+    assert cells == [
+        (1, "q[0]", "h", ()), (1, "q[1]", "rz", (0.5,)),
+        (2, "q[0]", "cz", ()), (2, "q[1]", "rz", (0.25,)), (2, "q[2]", "cz", ()),
+        (3, "q[1]", "cz", ()), (3, "q[2]", "cz", ()),
+        (4, "q[2]", "h", ()),
+    ]
+
+
+def test_register_keyword_kind_out_of_range():
+    with pytest.raises(ValueError):
+        Token.register_keyword("out_of_range", kind=qasm2_token.MAX_KIND+1)
+    assert "out_of_range" not in qasm2_token.KEYWORDS
@@ -0,0 +1,60 @@
+import pytest
+from qsofinstr.IR.QASM2.qasm2_parser import Parser
+from qsofinstr.quantumcircuit import Quantum_circuit
+
+
+@pytest.fixture
+def symbolic_circuit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Parser, "Symbols", ["theta", "phi"])
+    filename = tmp_path / "symbolic.qasm"
+    filename.write_text("OPENQASM 2.0;\nqreg q[2];\nrx(theta) q[0];\ncu1(2*phi) q[0], q[1];\nh q[1];\n")
+    return Quantum_circuit.from_qasm2(str(filename))
+
+
+def test_free_parameters(symbolic_circuit):
+    assert symbolic_circuit.free_parameters() == {"theta", "phi"}
+    assert symbolic_circuit.bind({"theta": 0.5, "phi": 0.25}).free_parameters() == set()
+
+
+def test_bind_missing_value(symbolic_circuit):
+    with pytest.raises(ValueError, match="phi"):
+        symbolic_circuit.bind({"theta": 0.5})
+
+
+def test_dump_unbound_circuit(symbolic_circuit):
+    with pytest.raises(ValueError, match="phi, theta"):
+        symbolic_circuit.to_json()
+    with pytest.raises(ValueError, match="phi, theta"):
+        symbolic_circuit.to_columnar()
+    columnar = symbolic_circuit.bind({"theta": 0.5, "phi": 0.25}).to_columnar()
+    assert len(columnar) == 4
+    assert 0.5 in columnar.parameters
+
+
+def test_connected_qubits_are_interned_per_circuit(tmp_path):
+    filename = tmp_path / "interned.qasm"
+    filename.write_text("OPENQASM 2.0;\nqreg q[3];\ncx q[0], q[1];\ncx q[0], q[1];\nccx q[0], q[1], q[2];\n")
+    quantumcircuit = Quantum_circuit.from_qasm2(str(filename))
+    assert quantumcircuit.qubits["q[1]"][1].connected_qubits == ("q[0]",)
+    assert quantumcircuit.qubits["q[1]"][1].connected_qubits is quantumcircuit.qubits["q[1]"][2].connected_qubits
+    assert quantumcircuit.qubits["q[2]"][3].connected_qubits == ("q[0]", "q[1]")
+    other = Quantum_circuit.from_qasm2(str(filename))
+    assert other.connected_qubits_table is not quantumcircuit.connected_qubits_table
+    assert other.qubits["q[1]"][1].connected_qubits is not quantumcircuit.qubits["q[1]"][1].connected_qubits
+
+
+def test_bound_circuit_is_independent(symbolic_circuit):
+    cells = [(timeslice, qubit, node.gate_operation) for timeslice, qubit, node in symbolic_circuit.occupied_cells()]
+    bound = symbolic_circuit.bind({"theta": 0.5, "phi": 0.25})
+    bound.add_qubit("r", 1)
+    bound.add_qubit_max_time_slice("r", 0, 1)
+    bound.add_creg("c", 1)
+    bound.add_controlled_gate_no_parameter("cx", [("q", 1)], "r", 0)
+    bound.add_measurement([("r", 0)], [("c", 0)])
+    assert "r[0]" not in symbolic_circuit.qubits_idx
+    assert "r" not in symbolic_circuit.qreg_qubits
+    assert symbolic_circuit.cregs == {} and symbolic_circuit.creg_bits == {}
+    assert "r[0]" not in symbolic_circuit.qubit_max_time_slice
+    assert ("r[0]",) not in symbolic_circuit.connected_qubits_table
+    assert [(timeslice, qubit, node.gate_operation) for timeslice, qubit, node in symbolic_circuit.occupied_cells()] == cells